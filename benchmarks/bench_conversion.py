@@ -0,0 +1,73 @@
+"""
+Conversion throughput (rows/s) of the old per-column `convert_columns_based_on_type`
+against the compiled schema plan of database.py.
+
+Run from the repository root:
+    python -m benchmarks.bench_conversion --scale 20
+"""
+import argparse
+import time
+
+import pandas as pd
+
+import database
+
+
+def clean_string(s):
+    if isinstance(s, str):
+        s = s.lower()
+    return s
+
+
+def legacy_convert(df1, df2):
+    # the implementation database.py used before the schema compiler
+    for col_name in df1.columns:
+        type_row = df2[df2['Data field'] == col_name]
+        if not type_row.empty:
+            expected_type = type_row['Data type'].values[0]
+            if expected_type == 'int':
+                df1[col_name] = pd.to_numeric(df1[col_name], errors='coerce')
+            elif expected_type == 'char' or expected_type == 'char (classification)':
+                df1[col_name] = df1[col_name].astype(str)
+                df1[col_name] = df1[col_name].apply(clean_string)
+            elif expected_type == 'bool':
+                df1[col_name] = df1[col_name].astype(bool)
+            elif expected_type == 'numeric':
+                df1[col_name] = df1[col_name].astype(float)
+            elif expected_type == 'date':
+                df1[col_name] = pd.to_datetime(df1[col_name], errors='coerce')
+            elif expected_type == 'list':
+                df1[col_name] = df1[col_name].astype(str)
+    return df1.drop_duplicates()
+
+
+def compiled_convert(df, plan):
+    return database.encode_lists(database.apply_schema(df, plan), plan).drop_duplicates()
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, default=10, help="copies of each sheet to convert")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'sheet':<12}{'rows':>10}{'before rows/s':>16}{'after rows/s':>16}{'speedup':>10}")
+    for table_name in ("startupticker_companies", "startupticker_deals"):
+        file, data_sheet, desc_sheet = database.sheets_to_process[table_name]
+        df_desc = pd.read_excel(file, sheet_name=desc_sheet)
+        df = pd.concat([pd.read_excel(file, sheet_name=data_sheet)] * args.scale, ignore_index=True)
+        plan = database.compile_schema(df_desc, database.schema_overrides.get(table_name))
+
+        before = best_of(lambda: legacy_convert(df.copy(), df_desc), args.repeat)
+        after = best_of(lambda: compiled_convert(df.copy(), plan), args.repeat)
+        print(f"{data_sheet:<12}{len(df):>10}{len(df) / before:>16,.0f}{len(df) / after:>16,.0f}"
+              f"{before / after:>9.1f}x")
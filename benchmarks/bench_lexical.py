@@ -0,0 +1,100 @@
+"""
+Query latency of lexical_index.py at 100k+ documents, against a LIKE scan and
+the FTS5 tables of startups_clean.db, and the cost of an incremental update.
+
+The companies and deals of startups_clean.db are copied `--scale` times (new
+keys) into a temporary database. Run from the repository root:
+    python -m benchmarks.bench_lexical --scale 12
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import database
+from lexical_index import LexicalIndex
+
+QUERIES = [
+    ("one term", "recycling", {}),
+    ("two terms, fr/de", "batterie medizin", {}),
+    ("prefix", "robot*", {}),
+    ("terms + facets", "software plattform", {"canton": ["zh"], "phase": ["seed"], "year_from": 2018}),
+]
+LIKE_SQL = "SELECT _key FROM startupticker_deals WHERE Comment LIKE ? OR Investors LIKE ? LIMIT 10"
+FTS_SQL = ("SELECT rowid FROM startupticker_deals_fts WHERE startupticker_deals_fts MATCH ? "
+           "ORDER BY bm25(startupticker_deals_fts) LIMIT 10")
+
+
+def scaled_db(source, path, scale):
+    conn = sqlite3.connect(path)
+    conn.execute("ATTACH DATABASE ? AS src", (source,))
+    for table_name in ("startupticker_companies", "startupticker_deals"):
+        conn.execute(f'CREATE TABLE "{table_name}" AS SELECT * FROM src."{table_name}" WHERE 0')
+        for i in range(scale):
+            conn.execute(f'INSERT INTO "{table_name}" SELECT * FROM src."{table_name}"')
+            conn.execute(f"UPDATE \"{table_name}\" SET _key = _key || '#{i}' WHERE _key NOT LIKE '%#%'")
+    conn.commit()
+    conn.execute("DETACH DATABASE src")
+    n = sum(conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0]
+            for t in ("startupticker_companies", "startupticker_deals"))
+    conn.close()
+    return n
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main(db_path, scale, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scaled.db")
+        n = scaled_db(db_path, path, scale)
+        print(f"🗄️ {n} documents ({scale} copies)")
+
+        start = time.perf_counter()
+        LexicalIndex(os.path.join(tmp, "index")).update(path)
+        print(f"full index: {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        index = LexicalIndex(os.path.join(tmp, "index"))
+        print(f"open: {(time.perf_counter() - start) * 1000:.2f} ms")
+        first = timed(lambda: index.search("recycling"), 1)
+        print(f"first query (maps the segment): {first:.1f} ms\n")
+
+        print(f"{'query':<20}{'bm25 index ms':>15}")
+        for name, query, filters in QUERIES:
+            print(f"{name:<20}{timed(lambda: index.search(query, 10, **filters), repeat):>15.2f}")
+
+        # the deals only: FTS5 is on startupticker_deals_fts of the source database
+        conn = sqlite3.connect(db_path)
+        like = timed(lambda: conn.execute(LIKE_SQL, ("%recycling%", "%recycling%")).fetchall(), repeat)
+        fts = timed(lambda: conn.execute(FTS_SQL, ("recycling",)).fetchall(), repeat)
+        conn.close()
+        print(f"\none term on the unscaled deals: LIKE {like:.2f} ms, FTS5 {fts:.2f} ms")
+
+        conn = sqlite3.connect(path)
+        conn.execute("UPDATE startupticker_deals SET Comment = 'quokkatron', _row_hash = _row_hash || 'x' "
+                     "WHERE rowid IN (SELECT rowid FROM startupticker_deals LIMIT 100)")
+        conn.commit()
+        conn.close()
+        start = time.perf_counter()
+        index.update(path)
+        print(f"update of 100 changed rows: {time.perf_counter() - start:.1f} s, "
+              f"query after: {timed(lambda: index.search('quokkatron'), repeat):.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", default=database.sqlite_db)
+    parser.add_argument("--scale", type=int, default=12, help="copies of the companies and deals")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    main(args.db, args.scale, args.repeat)
@@ -0,0 +1,105 @@
+"""
+Latency of typical peer-group lookups on startups_clean.db, before (untyped
+to_sql tables, no keys, no indexes) and after the typed schema of db_schema.py.
+
+Run from the repository root:
+    python -m benchmarks.bench_queries --scale 20
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+import database
+from bulk_loader import BulkLoader
+
+# (name, query on the untyped tables, query on the typed schema)
+QUERIES = [
+    ("join companies/deals (example query)",
+     "SELECT * FROM startupticker_companies JOIN startupticker_deals "
+     "ON startupticker_deals.Company = startupticker_companies.Title WHERE Funded = 0",
+     None),
+    ("deal history of one company",
+     "SELECT * FROM startupticker_deals WHERE Company = 'biocopy ag #3'",
+     None),
+    ("peer group canton/phase/period",
+     "SELECT Amount FROM startupticker_deals WHERE Canton = 'zh' AND Phase = 'seed' "
+     "AND \"Date of the funding round\" BETWEEN '2020-01-01' AND '2024-12-31' ORDER BY Amount",
+     None),
+    ("peer group industry/canton with deals",
+     "SELECT d.Amount, d.Valuation FROM startupticker_companies c JOIN startupticker_deals d "
+     "ON d.Company = c.Title WHERE c.Industry = 'biotech' AND c.Canton = 'vd'",
+     None),
+    ("deals per year of a phase",
+     "SELECT substr(\"Date of the funding round\", 1, 4) AS year, COUNT(*), AVG(Amount) "
+     "FROM startupticker_deals WHERE Phase = 'early stage' GROUP BY year",
+     None),
+    ("text search in comments",
+     "SELECT Id FROM startupticker_deals WHERE Comment LIKE '%series a%'",
+     "SELECT Id FROM startupticker_deals WHERE rowid IN ("
+     "SELECT rowid FROM startupticker_deals_fts WHERE startupticker_deals_fts MATCH 'Comment:\"series a\"')"),
+]
+
+
+def scaled_frames(scale):
+    frames = {}
+    for table_name in ("startupticker_companies", "startupticker_deals"):
+        df = pd.concat(list(database.read_converted_chunks(table_name)), ignore_index=True)
+        copies = []
+        for i in range(scale):
+            copy = df.copy()
+            # distinct companies and deals in every copy
+            for col in ("Title", "Company", "Id", "Code", "URL"):
+                if col in copy.columns:
+                    copy[col] = copy[col] + f" #{i}"
+            copies.append(copy)
+        frames[table_name] = pd.concat(copies, ignore_index=True)
+    return frames
+
+
+def build_before(path, frames):
+    conn = sqlite3.connect(path)
+    for table_name, df in frames.items():
+        df.to_sql(table_name, conn, if_exists="replace", index=False)
+    conn.close()
+
+
+def build_after(path, frames):
+    with BulkLoader(path) as loader:
+        for table_name, df in frames.items():
+            database.write_replace(loader, table_name, [df], database.natural_keys[table_name])
+
+
+def time_query(path, sql, repeat):
+    conn = sqlite3.connect(path)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n_rows = len(conn.execute(sql).fetchall())
+        timings.append(time.perf_counter() - start)
+    conn.close()
+    return sorted(timings)[len(timings) // 2], n_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, default=10, help="copies of the sample data")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    frames = scaled_frames(args.scale)
+    with tempfile.TemporaryDirectory() as tmp:
+        before, after = os.path.join(tmp, "before.db"), os.path.join(tmp, "after.db")
+        build_before(before, frames)
+        build_after(after, frames)
+
+        print(f"{len(frames['startupticker_companies'])} companies, {len(frames['startupticker_deals'])} deals\n")
+        print(f"{'query':<40}{'rows':>8}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name, sql_before, sql_after in QUERIES:
+            t_before, n_rows = time_query(before, sql_before, args.repeat)
+            t_after, _ = time_query(after, sql_after or sql_before, args.repeat)
+            print(f"{name:<40}{n_rows:>8}{t_before * 1000:>12.2f}{t_after * 1000:>12.2f}"
+                  f"{t_before / t_after:>9.1f}x")
@@ -0,0 +1,76 @@
+"""
+SOGC download throughput against a local stand-in of the search page
+(benchmarks/sogc_standin.html), before (a fresh Chrome for every UID, as
+download_sogc_data() does on its own) and after (web_scrapper.BrowserPool,
+N warm sessions fed from a queue).
+
+Needs Chrome and chromedriver; nothing leaves the machine.
+
+Run from the repository root:
+    python -m benchmarks.bench_scraper --uids 20 --workers 4
+"""
+import argparse
+import functools
+import os
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import web_scrapper
+
+STANDIN_PAGE = "sogc_standin.html"
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_standin():
+    """Serve the benchmarks directory on a free local port, returns (server, url of the stand-in)."""
+    handler = functools.partial(QuietHandler, directory=os.path.dirname(os.path.abspath(__file__)))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/{STANDIN_PAGE}#!/search/publications"
+
+
+def fake_uids(n):
+    return [f"CHE-{100 + i:03d}.{i % 1000:03d}.{i * 7 % 1000:03d}" for i in range(n)]
+
+
+def time_fresh_browsers(uids, url, download_dir):
+    start = time.perf_counter()
+    n_ok = 0
+    for uid in uids:
+        driver = web_scrapper.make_driver(download_dir, headless=True)
+        try:
+            n_ok += web_scrapper.download_sogc_data(uid, download_dir=download_dir, driver=driver, base_url=url) is not None
+        finally:
+            driver.quit()
+    return time.perf_counter() - start, n_ok
+
+
+def time_pool(uids, url, download_dir, workers):
+    start = time.perf_counter()
+    results = web_scrapper.download_many(uids, workers, download_dir=download_dir, base_url=url)
+    return time.perf_counter() - start, sum(path is not None for path in results.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uids", type=int, default=20, help="number of UIDs to download")
+    parser.add_argument("--workers", type=int, default=4, help="browser sessions of the pool")
+    args = parser.parse_args()
+
+    server, url = serve_standin()
+    uids = fake_uids(args.uids)
+    with tempfile.TemporaryDirectory() as tmp:
+        before, before_ok = time_fresh_browsers(uids, url, os.path.join(tmp, "fresh"))
+        after, after_ok = time_pool(uids, url, os.path.join(tmp, "pool"), args.workers)
+    server.shutdown()
+
+    print(f"\n{'engine':<28}{'downloaded':>12}{'total s':>10}{'s / UID':>10}")
+    print(f"{'fresh browser per UID':<28}{before_ok:>12}{before:>10.1f}{before / len(uids):>10.2f}")
+    print(f"{f'pool of {args.workers} warm browsers':<28}{after_ok:>12}{after:>10.1f}{after / len(uids):>10.2f}")
+    print(f"speedup: {before / after:.1f}x")
@@ -0,0 +1,122 @@
+"""
+Browserless SOGC engine (sogc_http.py) against a local mock of the shab.ch
+JSON backend, before (sequential `requests` calls, a new connection each)
+and after (one async keep-alive session, --workers requests in flight).
+
+Every UID of the mock has 1 to 3 publications; each response takes --latency
+ms. The downloaded XML files are checked against what the mock served.
+
+Run from the repository root:
+    python -m benchmarks.bench_sogc_http --uids 200 --workers 16
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import sogc_http
+
+
+def mock_publications(uid):
+    n = 1 + sum(map(ord, uid)) % 3
+    return [{"id": f"{uid}-{i}", "publicationNumber": f"HR02-{uid}-{i}", "publicationDate": "2024-01-0" + str(i + 1)}
+            for i in range(n)]
+
+
+def mock_xml(publication_id):
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<publication id="{publication_id}"><content>mock</content></publication>').encode()
+
+
+class MockApi(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    latency = 0.05
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        url = urlparse(self.path)
+        if url.path == sogc_http.SEARCH_PATH:
+            query = parse_qs(url.query)
+            hits = mock_publications(query["uid"][0])
+            page, size = int(query["pageRequest.page"][0]), int(query["pageRequest.size"][0])
+            content = [{"meta": meta} for meta in hits[page * size:(page + 1) * size]]
+            self._send(json.dumps({"content": content, "total": len(hits)}).encode(), "application/json")
+        elif url.path.endswith("/xml"):
+            self._send(mock_xml(url.path.split("/")[-2]), "application/xml")
+        else:
+            self.send_error(404)
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_mock(latency):
+    MockApi.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockApi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def sequential_download(uids, base_url, download_dir):
+    # no session: a new connection for every request
+    os.makedirs(download_dir, exist_ok=True)
+    for uid in uids:
+        params = {"uid": uid, "publicationStates": "PUBLISHED", "pageRequest.page": 0,
+                  "pageRequest.size": sogc_http.PAGE_SIZE}
+        hits = [item["meta"] for item in requests.get(base_url + sogc_http.SEARCH_PATH, params=params).json()["content"]]
+        exports = [requests.get(base_url + sogc_http.EXPORT_PATH.format(id=hit["id"], format="xml")).content
+                   for hit in hits]
+        with open(os.path.join(download_dir, f"{uid}.xml"), "wb") as f:
+            f.write(sogc_http.combine_exports(uid, exports, "xml"))
+
+
+def check(results):
+    """Every UID downloaded, with exactly the publications the mock served."""
+    for uid, path in results.items():
+        assert path is not None, uid
+        root = ET.parse(path).getroot()
+        assert root.get("uid") == uid
+        assert [p.get("id") for p in root] == [meta["id"] for meta in mock_publications(uid)], uid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uids", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=16, help="requests in flight")
+    parser.add_argument("--latency", type=float, default=50, help="ms per response of the mock")
+    args = parser.parse_args()
+
+    server, base_url = serve_mock(args.latency / 1000)
+    uids = [f"CHE-{i:03d}.{i * 7 % 1000:03d}.{i * 13 % 1000:03d}" for i in range(args.uids)]
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        sequential_download(uids, base_url, os.path.join(tmp, "sequential"))
+        before = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = sogc_http.download_many(uids, args.workers, download_dir=os.path.join(tmp, "async"),
+                                          base_url=base_url)
+        after = time.perf_counter() - start
+        check(results)
+    server.shutdown()
+
+    n_requests = sum(1 + len(mock_publications(uid)) for uid in uids)
+    print(f"\n{len(uids)} UIDs, {n_requests} requests, {args.latency:.0f} ms per response")
+    print(f"{'engine':<34}{'total s':>10}{'UIDs / s':>10}")
+    print(f"{'sequential, new connection each':<34}{before:>10.1f}{len(uids) / before:>10.1f}")
+    print(f"{f'async keep-alive, {args.workers} in flight':<34}{after:>10.1f}{len(uids) / after:>10.1f}")
+    print(f"speedup: {before / after:.1f}x")
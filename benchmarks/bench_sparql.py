@@ -0,0 +1,129 @@
+"""
+SPARQL latency on the startup graph, before (the N-Triples file parsed into
+an in-memory rdflib Graph) and after (the persistent store of triple_store.py).
+
+cold: open/parse + first run of the query, as a fresh consumer would see it.
+warm: median of the following runs on the already open graph/store.
+
+The companies and deals sheets are copied --scale times. Both sides load the
+same sources: the graph and the ontology closure of ontology.py, and must
+return the same number of rows for every query before they are timed.
+
+Run from the repository root:
+    python -m benchmarks.bench_sparql --scale 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+from rdflib import Graph
+
+import database
+import ontology
+import rdf_converter
+import triple_store
+
+# columns made distinct in every copy of the sample data
+COPY_COLUMNS = {
+    "startupticker_companies": ["Code", "Title"],
+    "startupticker_deals": ["Id", "URL", "Company"],
+}
+
+
+def scaled_frames(scale):
+    frames = {}
+    for table_name, columns in COPY_COLUMNS.items():
+        df = database.load_table_frame(table_name)
+        plan = database.load_plan(table_name)
+        copies = []
+        for i in range(scale):
+            copy = df.copy()
+            for col in columns:
+                copy[col] = copy[col] + f" #{i}"
+            copies.append(rdf_converter.keyed(table_name, copy, plan))
+        frames[table_name] = pd.concat(copies, ignore_index=True)
+    return frames
+
+
+def write_ntriples(frames, path, chunksize=database.CHUNK_SIZE):
+    interner, lookups = rdf_converter.NodeInterner(), {}
+    with open(path, "w", encoding="utf-8") as f:
+        for table_name, df in frames.items():
+            rdf_converter.update_lookups(lookups, table_name, df)
+            for offset in range(0, len(df), chunksize):
+                chunk = rdf_converter.resolve_links(table_name, df[offset:offset + chunksize], lookups)
+                triples = rdf_converter.table_triples(table_name, chunk, interner)
+                f.write("\n".join(triples["line"]) + "\n")
+
+
+def write_ontology(path):
+    edges = ontology.load_taxonomy()
+    lines = ontology.closure_triples(edges, ontology.compute_closure(edges))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def check_row_counts(nt_paths, store_path):
+    """Both sides answer every query with the same number of rows, or the timings compare different work."""
+    g = Graph()
+    for path in nt_paths:
+        g.parse(path, format="nt")
+    store = triple_store.open_store(store_path)
+    for name, sparql in triple_store.QUERIES.items():
+        n_rdflib, n_store = len(list(g.query(sparql))), len(triple_store.run_query(store, sparql))
+        assert n_rdflib == n_store, f"{name}: {n_rdflib} rows with rdflib, {n_store} in the store"
+
+
+def time_rdflib(nt_paths, sparql, repeat):
+    start = time.perf_counter()
+    g = Graph()
+    for path in nt_paths:
+        g.parse(path, format="nt")
+    n_rows = len(list(g.query(sparql)))
+    cold = time.perf_counter() - start
+    return cold, _warm(lambda: list(g.query(sparql)), repeat), n_rows
+
+
+def time_store(store_path, sparql, repeat):
+    start = time.perf_counter()
+    store = triple_store.open_store(store_path)
+    n_rows = len(triple_store.run_query(store, sparql))
+    cold = time.perf_counter() - start
+    return cold, _warm(lambda: triple_store.run_query(store, sparql), repeat), n_rows
+
+
+def _warm(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scale", type=int, default=5, help="copies of the sample data")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    frames = scaled_frames(args.scale)
+    with tempfile.TemporaryDirectory() as tmp:
+        nt_path, store_path = os.path.join(tmp, "graph.nt"), os.path.join(tmp, "graph.store")
+        ontology_path = os.path.join(tmp, "ontology.nt")
+        write_ntriples(frames, nt_path)
+        write_ontology(ontology_path)
+        triple_store.load_store(nt_path, store_path, extra_sources=[ontology_path])
+        check_row_counts([nt_path, ontology_path], store_path)
+
+        print(f"\n{len(frames['startupticker_companies'])} startups, "
+              f"{len(frames['startupticker_deals'])} deals\n")
+        print(f"{'query':<22}{'rows':>7}{'rdflib cold ms':>16}{'store cold ms':>15}"
+              f"{'rdflib warm ms':>16}{'store warm ms':>15}{'warm speedup':>14}")
+        for name, sparql in triple_store.QUERIES.items():
+            b_cold, b_warm, n_rows = time_rdflib([nt_path, ontology_path], sparql, args.repeat)
+            a_cold, a_warm, _ = time_store(store_path, sparql, args.repeat)
+            print(f"{name:<22}{n_rows:>7}{b_cold * 1000:>16.1f}{a_cold * 1000:>15.1f}"
+                  f"{b_warm * 1000:>16.2f}{a_warm * 1000:>15.2f}{b_warm / a_warm:>13.1f}x")
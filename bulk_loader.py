@@ -0,0 +1,115 @@
+"""
+High-throughput bulk loading into startups_clean.db.
+
+Everything is written inside a single transaction with WAL journaling and
+relaxed syncing, rows go through prepared `executemany` batches and the
+secondary/FTS indexes of a replaced table are built once its data is in.
+Rows per second are reported per table.
+"""
+import sqlite3
+import time
+from itertools import islice
+
+import pandas as pd
+
+import db_schema
+
+# rows per executemany() call
+BATCH_SIZE = 50_000
+
+LOAD_PRAGMAS = {
+    "journal_mode": "WAL",
+    # no fsync while loading, a crash mid-load leaves the previous state (WAL)
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    # negative = KiB, ~256 MB of page cache for the index builds
+    "cache_size": "-262144",
+}
+
+
+def frame_rows(df):
+    """Rows of `df` as tuples of plain Python values sqlite3 can bind."""
+    columns = []
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+        columns.append(s.astype(object).where(s.notna(), None).tolist())
+    return zip(*columns)
+
+
+class BulkLoader:
+    """
+    with BulkLoader("startups_clean.db") as loader:
+        loader.create_table("startupticker_deals")
+        loader.insert("startupticker_deals", df)
+        loader.finish_table("startupticker_deals")
+    """
+
+    def __init__(self, db_path, batch_size=BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.conn = None
+        self.stats = {}
+
+    def __enter__(self):
+        # autocommit mode, the transaction is opened and closed explicitly
+        self.conn = sqlite3.connect(self.db_path, isolation_level=None)
+        for pragma, value in LOAD_PRAGMAS.items():
+            self.conn.execute(f"PRAGMA {pragma} = {value}")
+        self.conn.execute("BEGIN")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.close()
+        if exc_type is None:
+            self.print_stats()
+        return False
+
+    def _stats(self, table_name):
+        return self.stats.setdefault(table_name, {"rows": 0, "insert_s": 0.0, "index_s": 0.0})
+
+    def create_table(self, table_name):
+        """(Re)create an empty table, its indexes are only built by finish_table()."""
+        db_schema.create_table(self.conn, table_name, replace=True)
+
+    def insert(self, table_name, df):
+        start = time.perf_counter()
+        db_schema.ensure_columns(self.conn, table_name, df)
+
+        cols = ", ".join(db_schema.q(c) for c in df.columns)
+        marks = ", ".join("?" * len(df.columns))
+        sql = f"INSERT INTO {db_schema.q(table_name)} ({cols}) VALUES ({marks})"
+
+        rows = frame_rows(df)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.conn.executemany(sql, batch)
+
+        stats = self._stats(table_name)
+        stats["rows"] += len(df)
+        stats["insert_s"] += time.perf_counter() - start
+
+    def finish_table(self, table_name):
+        """Build the secondary and full-text indexes after the data is inserted."""
+        start = time.perf_counter()
+        db_schema.create_indexes(self.conn, table_name)
+        db_schema.create_fts(self.conn, table_name)
+        self._stats(table_name)["index_s"] += time.perf_counter() - start
+
+    def print_stats(self):
+        if not self.stats:
+            return
+        print("\n⏱️ Load speed")
+        print(f"{'table':<28}{'rows':>10}{'insert s':>10}{'index s':>10}{'rows/s':>12}")
+        for table_name, s in self.stats.items():
+            total = s["insert_s"] + s["index_s"]
+            rate = s["rows"] / total if total else 0
+            print(f"{table_name:<28}{s['rows']:>10}{s['insert_s']:>10.2f}{s['index_s']:>10.2f}{rate:>12,.0f}")
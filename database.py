@@ -1,12 +1,27 @@
+import argparse
+import hashlib
+import json
+import os
 import pandas as pd
-from sqlalchemy import create_engine
+from openpyxl import load_workbook
 import re
 import sqlite3
+
+import db_schema
+import parse_cache
+from bulk_loader import BATCH_SIZE, BulkLoader
 # path to data
 file_crunchbase = "Data-crunchbase.xlsx"
 file_startupticker = "Data-startupticker.xlsx"
 sqlite_db = "startups_clean.db"
 
+# number of rows read, converted and inserted at once in streaming mode
+CHUNK_SIZE = 5000
+
+# strings read_excel treats as missing (pandas defaults), reused by the streaming reader
+NA_VALUES = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+             "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
 # === Mappping of the sheet to treat
 sheets_to_process = {
     "startupticker_companies": (file_startupticker, "Companies", "Company description"),
@@ -15,59 +30,393 @@ sheets_to_process = {
     "crunchbase_funding_rounds": (file_crunchbase, "funding rounds", "funding round description")
 }
 
+# Natural key of each table. The first non-empty column wins (some companies have
+# no UID yet); rows without any of them are keyed by their content hash.
+natural_keys = {
+    "startupticker_companies": ["Code", "Title"],
+    "startupticker_deals": ["Id", "URL"],
+    "crunchbase_organizations": ["uuid", "name"],
+    "crunchbase_funding_rounds": ["uuid"],
+}
+
+
+# "Data type" values of the description sheets -> conversion kernel
+type_kinds = {
+    "int": "int",
+    "numeric": "numeric",
+    "char": "char",
+    "char (classification)": "char",
+    "bool": "bool",
+    "date": "date",
+    "list": "list",
+}
+
+# Fields whose description type is not what the data really holds
+schema_overrides = {
+    # comma separated investor names, described as plain "char"
+    "startupticker_deals": {"Investors": "list"},
+}
+
+# JSON escapes applied by encode_lists, backslash first
+json_escapes = [("\\", "\\\\"), ('"', '\\"'), ("\n", "\\n"), ("\r", "\\r"), ("\t", "\\t")]
+
+
+def compile_schema(df_desc, overrides=None):
+    """
+    Turn a "Data field / Data type" description sheet into a {column: kind} plan.
+    Done once per sheet, the plan is then applied to every chunk.
+    """
+    plan = {}
+    desc = df_desc.dropna(subset=["Data field", "Data type"])
+    for field, data_type in zip(desc["Data field"], desc["Data type"]):
+        field, data_type = str(field).strip(), str(data_type).strip()
+        kind = type_kinds.get(data_type)
+        if kind is None:
+            print(f"Type non pris en charge pour {field}: {data_type}")
+            continue
+        # the first description of a field wins
+        plan.setdefault(field, kind)
+    plan.update(overrides or {})
+    return plan
+
+
+def apply_schema(df, plan):
+    """
+    Convert the columns of `df` following a compiled plan with vectorized
+    kernels. Values that can't be converted become missing; `list` columns
+    become Python lists.
+    """
+    converted = {}
+    for col_name in df.columns:
+        kind = plan.get(col_name)
+        s = df[col_name]
+
+        if kind == "int":
+            s = pd.to_numeric(s, errors="coerce")
+            s = s.where(s == s.round()).astype("Int64")
+        elif kind == "numeric":
+            s = pd.to_numeric(s, errors="coerce").astype("float64")
+        elif kind == "char":
+            s = s.astype("string").str.lower()
+        elif kind == "bool":
+            s = pd.to_numeric(s, errors="coerce").astype("boolean")
+        elif kind == "date":
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                s = pd.to_datetime(s, errors="coerce")
+        elif kind == "list":
+            s = s.astype("string").str.replace(r"\s*,\s*", ",", regex=True).str.strip()
+            s = s.mask(s == "").str.split(",")
+        converted[col_name] = s
+    return pd.DataFrame(converted, index=df.index)
+
+
+def encode_lists(df, plan):
+    """
+    SQLite has no array type: store `list` columns as JSON text (see json_each).
+    The items come from a split on commas, so the JSON is built with string
+    kernels instead of one json.dumps per row.
+    """
+    for col_name, kind in plan.items():
+        if kind == "list" and col_name in df.columns:
+            text = df[col_name].str.join("\x1f").astype("string")
+            for char, escaped in json_escapes:
+                text = text.str.replace(char, escaped, regex=False)
+            df[col_name] = '["' + text.str.replace("\x1f", '", "', regex=False) + '"]'
+    return df
 
-def clean_string(s):
-    if isinstance(s, str):
-        s = s.lower()
-        #s = re.sub(r'\s+', '', s)
-        #s = re.sub(r'[^a-z0-9]', '', s)
-    return s
 
 def convert_columns_based_on_type(df1, df2):
-    
-    for col_name in df1.columns:
-        
-        type_row = df2[df2['Data field'] == col_name]
-        
-        
-        if not type_row.empty:
-            expected_type = type_row['Data type'].values[0]  
-
-            # convert in the right data type else nan
-            if expected_type == 'int':
-                df1[col_name] = pd.to_numeric(df1[col_name], errors='coerce')  
-            elif expected_type == 'char'or expected_type == 'char (classification)' :
-                df1[col_name] = df1[col_name].astype(str)
-                
-                df1[col_name] = df1[col_name].apply(clean_string)  
-            elif expected_type == 'bool':
-                df1[col_name] = df1[col_name].astype(bool)  
-            elif expected_type == 'numeric' : 
-                df1[col_name] = df1[col_name].astype(float)
-            elif expected_type == 'date' : 
-                df1[col_name]= pd.to_datetime(df1[col_name], errors='coerce')
-            elif expected_type == 'list' : 
-                df1[col_name] = df1[col_name].astype(str)
-            else:
-                print(f"Type non pris en charge pour {col_name}: {expected_type}")
-    df1 = df1.drop_duplicates()
-    return df1
-
-engine = create_engine(f"sqlite:///{sqlite_db}")
-
-for table_name, (file, data_sheet, desc_sheet) in sheets_to_process.items():
-    print(f"🔄 Traitement de {data_sheet} -> table `{table_name}`")
-
-    df_data = pd.read_excel(file, sheet_name=data_sheet)
-    df_desc = pd.read_excel(file, sheet_name=desc_sheet)
-
-    
-
-    df_data = convert_columns_based_on_type(df_data, df_desc)
-    df_data = df_data.dropna(how="all").drop_duplicates()
-
-    df_data.to_sql(table_name, con=engine, if_exists="replace", index=False)
+    # kept for existing callers, compiles the plan on every call
+    plan = compile_schema(df2)
+    df1 = encode_lists(apply_schema(df1, plan), plan)
+    return df1.drop_duplicates()
+
+
+def iter_sheet_chunks(file, sheet_name, chunksize=CHUNK_SIZE):
+    """
+    Read a sheet row by row with openpyxl's read-only parser and yield it as
+    DataFrames of at most `chunksize` rows, so the whole sheet is never in memory.
+    """
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        # read-only sheets may report trailing empty columns, keep the named ones
+        columns = [str(c) for c in header if c is not None]
+        width = len(columns)
+
+        buffer = []
+        for row in rows:
+            # read_excel turns empty cells and "#NA"-like strings into NaN, do the same here
+            buffer.append([None if isinstance(v, str) and v in NA_VALUES else v for v in row[:width]])
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        wb.close()
+
+
+def load_converted_sheet(file, data_sheet, plan):
+    """Converted rows of a whole sheet, from the parse cache when the workbook is unchanged."""
+    # a change of the plan (overrides, description sheet) must not reuse old conversions
+    variant = hashlib.sha1(json.dumps(plan, sort_keys=True).encode()).hexdigest()[:8]
+    return parse_cache.cached_sheet(
+        file, data_sheet,
+        lambda: apply_schema(pd.read_excel(file, sheet_name=data_sheet), plan).dropna(how="all"),
+        variant=variant,
+    )
+
+
+def load_plan(table_name):
+    """Compiled conversion plan of one of `sheets_to_process`."""
+    file, _, desc_sheet = sheets_to_process[table_name]
+    df_desc = parse_cache.cached_sheet(file, desc_sheet, lambda: pd.read_excel(file, sheet_name=desc_sheet))
+    return compile_schema(df_desc, schema_overrides.get(table_name))
+
+
+def load_table_frame(table_name):
+    """
+    Converted DataFrame of one of `sheets_to_process` for analysis code, with
+    `list` columns as arrays. Loaded from the parse cache in milliseconds when
+    the workbook did not change.
+    """
+    file, data_sheet, _ = sheets_to_process[table_name]
+    return load_converted_sheet(file, data_sheet, load_plan(table_name))
+
+
+def iter_converted_frames(table_name, chunksize=CHUNK_SIZE, plan=None):
+    """
+    Converted rows of a sheet chunk by chunk, straight from the workbook, with
+    `list` columns as lists. Peak memory is bounded by `chunksize`.
+    """
+    file, data_sheet, _ = sheets_to_process[table_name]
+    plan = plan if plan is not None else load_plan(table_name)
+    for chunk in iter_sheet_chunks(file, data_sheet, chunksize):
+        yield apply_schema(chunk, plan).dropna(how="all")
+
+
+def read_converted_chunks(table_name, streaming=False, chunksize=CHUNK_SIZE):
+    """
+    Yield the converted rows of a sheet, ready for SQLite, either as one
+    DataFrame (through the parse cache) or, in streaming mode, chunk by chunk
+    straight from the workbook so peak memory is bounded by `chunksize`.
+    Duplicates are only removed inside a chunk.
+    """
+    file, data_sheet, _ = sheets_to_process[table_name]
+    # the description sheet is a few dozen rows, compile it once
+    plan = load_plan(table_name)
+
+    if streaming:
+        chunks = iter_converted_frames(table_name, chunksize, plan)
+    else:
+        chunks = [load_converted_sheet(file, data_sheet, plan)]
+
+    for chunk in chunks:
+        chunk = encode_lists(chunk, plan).drop_duplicates()
+        if not chunk.empty:
+            yield chunk
+
+
+def _hashable(df):
+    """
+    Text form of the rows used for hashing. The same data can come back with
+    other dtypes (e.g. a chunk where an int column is empty), only values count.
+    """
+    cols = {}
+    for col in sorted(df.columns):
+        s = df[col]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            s = s.astype("float64")
+        cols[col] = s.astype(str).where(s.notna(), "")
+    return pd.DataFrame(cols, index=df.index)
+
+
+def fingerprint_rows(df, key_columns):
+    """
+    Add the `_key` (natural key) and `_row_hash` (content hash) columns used to
+    detect new, changed and deleted rows between two runs.
+    """
+    row_hash = pd.util.hash_pandas_object(_hashable(df), index=False).map("{:016x}".format)
+
+    key = pd.Series(None, index=df.index, dtype=object)
+    for i, col in enumerate(key_columns):
+        if col not in df.columns:
+            continue
+        values = df[col].astype(str)
+        # the main key is kept as is (e.g. "s4126"), fallbacks are prefixed
+        if i > 0:
+            values = f"{col}:" + values
+        key = key.fillna(values.where(df[col].notna()))
+    key = key.fillna("row:" + row_hash)
+
+    df = df.assign(
+        _key=key,
+        _row_hash=row_hash,
+        _deleted_at=None,
+    )
+    # the same key twice in one drop: the last row wins
+    return df.drop_duplicates("_key", keep="last")
+
+
+class ReplaceWriter:
+    """Drop and rewrite the whole table (default mode)."""
+
+    def __init__(self, loader, table_name, key_columns):
+        self.loader = loader
+        self.table_name = table_name
+        self.key_columns = key_columns
+        self.summary = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        self.seen = set()
+
+    def begin(self):
+        self.loader.create_table(self.table_name)
+
+    def write(self, chunk):
+        if "_key" not in chunk.columns:
+            chunk = fingerprint_rows(chunk, self.key_columns)
+        # keys already written by a previous chunk
+        chunk = chunk[~chunk["_key"].isin(self.seen)]
+        self.seen.update(chunk["_key"])
+
+        self.loader.insert(self.table_name, chunk)
+        self.summary["inserted"] += len(chunk)
+        print(f"   ... {self.summary['inserted']} rows inserted in `{self.table_name}`")
+
+    def end(self):
+        # secondary indexes and full-text index once the data is in
+        self.loader.finish_table(self.table_name)
+        return self.summary
+
+
+class IncrementalWriter:
+    """
+    Upsert the rows by natural key: insert new keys, rewrite rows whose content
+    hash changed and tombstone (`_deleted_at`) the keys missing from this drop.
+    Unchanged rows are not touched, so a run costs about the size of the delta.
+    """
+
+    def __init__(self, loader, table_name, key_columns):
+        self.loader = loader
+        self.conn = loader.conn
+        self.table_name = table_name
+        self.key_columns = key_columns
+        self.summary = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        self.known_hash, self.known_deleted = {}, set()
+        self.seen = set()
+
+    def begin(self):
+        if db_schema.table_exists(self.conn, self.table_name):
+            for key, row_hash, deleted_at in self.conn.execute(
+                    f'SELECT "_key", "_row_hash", "_deleted_at" FROM {db_schema.q(self.table_name)}'):
+                self.known_hash[key] = row_hash
+                if deleted_at is not None:
+                    self.known_deleted.add(key)
+        else:
+            db_schema.create_table(self.conn, self.table_name)
+        # the FTS triggers keep the text index in sync with the delta
+        self.loader.finish_table(self.table_name)
+
+    def write(self, chunk):
+        if "_key" not in chunk.columns:
+            chunk = fingerprint_rows(chunk, self.key_columns)
+        self.seen.update(chunk["_key"])
+
+        old_hash = chunk["_key"].map(self.known_hash)
+        is_new = old_hash.isna()
+        is_changed = ~is_new & ((old_hash != chunk["_row_hash"]) | chunk["_key"].isin(self.known_deleted))
+        self.summary["unchanged"] += int((~is_new & ~is_changed).sum())
+        if not (is_new | is_changed).any():
+            return
+
+        # changed rows are rewritten as a whole, tombstone included
+        self.conn.executemany(
+            f'DELETE FROM {db_schema.q(self.table_name)} WHERE "_key" = ?',
+            [(k,) for k in chunk.loc[is_changed, "_key"]])
+        self.loader.insert(self.table_name, chunk[is_new | is_changed])
+
+        self.summary["inserted"] += int(is_new.sum())
+        self.summary["updated"] += int(is_changed.sum())
+        self.known_hash.update(zip(chunk["_key"], chunk["_row_hash"]))
+        self.known_deleted.difference_update(chunk["_key"])
+
+    def end(self):
+        # rows that disappeared from the Excel drop are kept but flagged
+        now = pd.Timestamp.now().isoformat(sep=" ", timespec="seconds")
+        gone = [(now, k) for k in self.known_hash if k not in self.seen and k not in self.known_deleted]
+        self.conn.executemany(
+            f'UPDATE {db_schema.q(self.table_name)} SET "_deleted_at" = ? WHERE "_key" = ?', gone)
+        self.summary["deleted"] = len(gone)
+        return self.summary
+
+
+def run_writer(writer, chunks):
+    writer.begin()
+    for chunk in chunks:
+        writer.write(chunk)
+    return writer.end()
+
+
+def write_replace(loader, table_name, chunks, key_columns):
+    return run_writer(ReplaceWriter(loader, table_name, key_columns), chunks)
+
+
+def write_incremental(loader, table_name, chunks, key_columns):
+    return run_writer(IncrementalWriter(loader, table_name, key_columns), chunks)
+
+
+def print_change_summary(summaries):
+    print("\n📊 Change summary")
+    print(f"{'table':<28}{'inserted':>10}{'updated':>10}{'deleted':>10}{'unchanged':>11}")
+    for table_name, s in summaries.items():
+        print(f"{table_name:<28}{s['inserted']:>10}{s['updated']:>10}{s['deleted']:>10}{s['unchanged']:>11}")
+
+
+def build_database(streaming=False, chunksize=CHUNK_SIZE, db_path=sqlite_db, incremental=False,
+                   batch_size=BATCH_SIZE):
+    write = write_incremental if incremental else write_replace
+
+    summaries = {}
+    # one transaction for the whole run, see bulk_loader.py
+    with BulkLoader(db_path, batch_size) as loader:
+        for table_name, (file, data_sheet, desc_sheet) in sheets_to_process.items():
+            if not os.path.exists(file):
+                print(f"⚠️ {file} not found, skipping table `{table_name}`")
+                continue
+            print(f"🔄 Traitement de {data_sheet} -> table `{table_name}`")
+
+            chunks = read_converted_chunks(table_name, streaming, chunksize)
+            summaries[table_name] = write(loader, table_name, chunks, natural_keys[table_name])
+
+    print_change_summary(summaries)
+    return summaries
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the Excel exports into startups_clean.db")
+    parser.add_argument("--stream", action="store_true",
+                        help="read and insert each sheet in row chunks (bounded memory)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE,
+                        help="rows per chunk in streaming mode")
+    parser.add_argument("--incremental", action="store_true",
+                        help="upsert new/changed rows and tombstone deleted ones instead of rewriting the tables")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="rows per executemany() batch")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parse and convert the sheets in a pool of N processes (see parallel_ingest.py)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        from parallel_ingest import build_database_parallel
+        build_database_parallel(workers=args.workers, streaming=args.stream, chunksize=args.chunksize,
+                                incremental=args.incremental, batch_size=args.batch_size)
+    else:
+        build_database(streaming=args.stream, chunksize=args.chunksize, incremental=args.incremental,
+                       batch_size=args.batch_size)
+
     # way to the base
     sqlite_db = 'startups_clean.db'
 
@@ -81,7 +430,7 @@ if __name__ == "__main__":
     # get the request
     resultats = cursor.fetchall()
 
-    # plot result 
+    # plot result
     for ligne in resultats:
         print(ligne)
-    conn.close()
\ No newline at end of file
+    conn.close()
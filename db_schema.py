@@ -0,0 +1,207 @@
+"""
+Typed schema of startups_clean.db.
+
+Declares the column types, the primary key, the indexes on the join and filter
+columns and the FTS5 tables over the free text of each table loaded by
+database.py. Columns that are not declared here (e.g. new fields in a
+Crunchbase export) are added on the fly with a type derived from their dtype.
+"""
+import pandas as pd
+
+# bookkeeping columns written by database.fingerprint_rows()
+META_COLUMNS = {
+    "_key": "TEXT PRIMARY KEY",
+    "_row_hash": "TEXT NOT NULL",
+    "_deleted_at": "TEXT",
+}
+
+# dates are stored as ISO text ('YYYY-MM-DD HH:MM:SS'), list columns as JSON text
+TABLES = {
+    "startupticker_companies": {
+        "columns": {
+            "Code": "TEXT",
+            "Title": "TEXT",
+            "Industry": "TEXT",
+            "Vertical": "TEXT",
+            "Canton": "TEXT",
+            "Spin-offs": "TEXT",
+            "City": "TEXT",
+            "Year": "INTEGER",
+            "Highlights": "TEXT",
+            "Gender CEO": "TEXT",
+            "OOB": "INTEGER",
+            "Funded": "INTEGER",
+            "Comment": "TEXT",
+        },
+        "indexes": [["Title"], ["Code"], ["Canton"], ["Industry", "Vertical"], ["Year"]],
+        "fts": ["Title", "Comment"],
+    },
+    "startupticker_deals": {
+        "columns": {
+            "Id": "TEXT",
+            "Investors": "TEXT",
+            "Amount": "REAL",
+            "Valuation": "REAL",
+            "Comment": "TEXT",
+            "URL": "TEXT",
+            "Confidential": "INTEGER",
+            "Amount confidential": "INTEGER",
+            "Date of the funding round": "TEXT",
+            "Type": "TEXT",
+            "Phase": "TEXT",
+            "Canton": "TEXT",
+            "Company": "TEXT",
+            "Gender CEO": "TEXT",
+        },
+        "indexes": [
+            ["Company"],
+            ["Date of the funding round"],
+            # peer groups: canton/phase/type over a period, covering the amount
+            ["Canton", "Phase", "Date of the funding round", "Amount"],
+            ["Phase", "Date of the funding round", "Amount"],
+            ["Type", "Date of the funding round"],
+        ],
+        "fts": ["Comment", "Investors"],
+    },
+    "crunchbase_organizations": {
+        "columns": {
+            "uuid": "TEXT",
+            "name": "TEXT",
+            "legal_name": "TEXT",
+            "domain": "TEXT",
+            "homepage_url": "TEXT",
+            "country_code": "TEXT",
+            "region": "TEXT",
+            "city": "TEXT",
+            "status": "TEXT",
+            "short_description": "TEXT",
+            "category_list": "TEXT",
+            "category_groups_list": "TEXT",
+            "num_funding_rounds": "INTEGER",
+            "total_funding_usd": "REAL",
+            "founded_on": "TEXT",
+            "last_funding_on": "TEXT",
+            "closed_on": "TEXT",
+            "employee_count": "TEXT",
+        },
+        "indexes": [["uuid"], ["name"], ["domain"], ["region", "city"], ["founded_on"]],
+        "fts": ["name", "short_description", "category_list"],
+    },
+    "crunchbase_funding_rounds": {
+        "columns": {
+            "uuid": "TEXT",
+            "name": "TEXT",
+            "org_uuid": "TEXT",
+            "org_name": "TEXT",
+            "investment_type": "TEXT",
+            "announced_on": "TEXT",
+            "raised_amount_usd": "REAL",
+            "post_money_valuation_usd": "REAL",
+            "investor_count": "INTEGER",
+            "region": "TEXT",
+            "city": "TEXT",
+        },
+        "indexes": [["org_uuid"], ["org_name"], ["announced_on"], ["investment_type", "announced_on"]],
+        "fts": [],
+    },
+}
+
+
+def q(name):
+    """Quote an identifier, column names contain spaces and dashes."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def table_exists(conn, table_name):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)
+    ).fetchone() is not None
+
+
+def create_table(conn, table_name, replace=False):
+    """Create the typed table (without its secondary indexes, see create_indexes)."""
+    if replace:
+        drop_fts(conn, table_name)
+        conn.execute(f"DROP TABLE IF EXISTS {q(table_name)}")
+
+    columns = dict(TABLES.get(table_name, {}).get("columns", {}))
+    columns.update(META_COLUMNS)
+    ddl = ",\n    ".join(f"{q(col)} {col_type}" for col, col_type in columns.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {q(table_name)} (\n    {ddl}\n)")
+
+
+def ensure_columns(conn, table_name, df):
+    """ALTER the table for columns of `df` it doesn't have yet."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({q(table_name)})")}
+    for col in df.columns:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE {q(table_name)} ADD COLUMN {q(col)} {sql_type(df[col].dtype)}")
+
+
+def index_name(table_name, columns):
+    return "ix_" + table_name + "__" + "__".join(c.lower().replace(" ", "_") for c in columns)
+
+
+def create_indexes(conn, table_name):
+    for columns in TABLES.get(table_name, {}).get("indexes", []):
+        cols = ", ".join(q(c) for c in columns)
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {q(index_name(table_name, columns))} ON {q(table_name)} ({cols})")
+
+
+def drop_indexes(conn, table_name):
+    for columns in TABLES.get(table_name, {}).get("indexes", []):
+        conn.execute(f"DROP INDEX IF EXISTS {q(index_name(table_name, columns))}")
+
+
+def create_fts(conn, table_name):
+    """
+    FTS5 index over the text columns, as an external-content table that points
+    at the rows of `table_name`. Triggers keep it in sync with incremental
+    writes; a new index is filled from the existing rows.
+    """
+    fts_columns = TABLES.get(table_name, {}).get("fts", [])
+    if not fts_columns:
+        return
+    fts = f"{table_name}_fts"
+    if table_exists(conn, fts):
+        return
+
+    cols = ", ".join(q(c) for c in fts_columns)
+    new_cols = ", ".join(f"new.{q(c)}" for c in fts_columns)
+    old_cols = ", ".join(f"old.{q(c)}" for c in fts_columns)
+    # one statement at a time: executescript() would commit the caller's transaction
+    statements = [
+        f"""CREATE VIRTUAL TABLE {q(fts)} USING fts5(
+            {cols}, content={q(table_name)}, content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )""",
+        f"""CREATE TRIGGER {q(fts + '_ai')} AFTER INSERT ON {q(table_name)} BEGIN
+            INSERT INTO {q(fts)} (rowid, {cols}) VALUES (new.rowid, {new_cols});
+        END""",
+        f"""CREATE TRIGGER {q(fts + '_ad')} AFTER DELETE ON {q(table_name)} BEGIN
+            INSERT INTO {q(fts)} ({q(fts)}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+        END""",
+        f"""CREATE TRIGGER {q(fts + '_au')} AFTER UPDATE OF {cols} ON {q(table_name)} BEGIN
+            INSERT INTO {q(fts)} ({q(fts)}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+            INSERT INTO {q(fts)} (rowid, {cols}) VALUES (new.rowid, {new_cols});
+        END""",
+        f"INSERT INTO {q(fts)} ({q(fts)}) VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        conn.execute(statement)
+
+
+def drop_fts(conn, table_name):
+    fts = f"{table_name}_fts"
+    for suffix in ("_ai", "_ad", "_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {q(fts + suffix)}")
+    conn.execute(f"DROP TABLE IF EXISTS {q(fts)}")
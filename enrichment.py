@@ -0,0 +1,272 @@
+"""
+LLM enrichment of the startupticker companies and deals with ontology labels.
+
+Rows are streamed out of startups_clean.db in key order, rendered into a
+tagging prompt that lists the allowed terms of ontology.json, and sent through
+`prompt | llm | JsonOutputParser` with the async batch API (abatch,
+`max_concurrency` requests in flight). The model is wrapped in with_retry
+(exponential backoff with jitter on errors such as 429 rate limits), and a
+rate limiter caps the requests per second.
+
+Every batch is written back in its own transaction:
+
+    llm_enrichment  (table_name, _key) -> row hash, prompt version, model, labels JSON
+    llm_labels      one row per (table_name, _key, dimension, label)
+
+A row is sent again only when it is new, its _row_hash changed, or the
+prompt/ontology changed (prompt_version), so an interrupted run resumes where
+it stopped. Rows tagged by the fake model (model "fake") are sent again by a
+real run. Answers also go through the on-disk cache of llm_cache.py.
+
+    python enrichment.py --table startupticker_companies --concurrency 8
+    python enrichment.py --fake --fake-latency 0.5   # local fake chat model, no API calls
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+import database
+import llm_cache
+import llmm
+import ontology
+
+# columns describing a row, and the ontology dimensions it is tagged with
+ENRICH_TABLES = {
+    "startupticker_companies": {
+        "columns": ["Title", "Industry", "Vertical", "Canton", "Year", "Highlights", "Comment"],
+        "dimensions": ["industry", "technology"],
+    },
+    "startupticker_deals": {
+        "columns": ["Company", "Phase", "Type", "Amount", "Investors", "Comment"],
+        "dimensions": ["stage", "deal_type"],
+    },
+}
+BATCH_SIZE = 64
+CONCURRENCY = 8
+MAX_ATTEMPTS = 4
+
+TAG_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You classify Swiss startups and their funding rounds into a fixed ontology. "
+            "Answer with a JSON object only, one key per dimension, each a list of terms "
+            "taken from the allowed terms (an empty list when none applies).\n\n"
+            "Allowed terms:\n{allowed_terms}",
+        ),
+        ("human", "{record}"),
+    ]
+)
+
+# answers of the fake model per table, in turn
+FAKE_RESPONSES = {
+    "startupticker_companies": [
+        '{"industry": ["cleantech", "energy"], "technology": ["advanced materials"]}',
+        '{"industry": ["ict (fintech)"], "technology": ["blockchain"]}',
+        '{"industry": ["biotech"], "technology": ["machine learning"], "note": "ignored"}',
+    ],
+    "startupticker_deals": [
+        '{"stage": ["seed"], "deal_type": ["vc"]}',
+        '{"stage": ["later stage"], "deal_type": ["m&a"]}',
+        '{"stage": ["early stage"], "deal_type": ["grant", "seed"]}',
+    ],
+}
+
+
+def allowed_terms(dimensions, taxonomy=ontology.TAXONOMY_FILE):
+    """{dimension: sorted terms} of the ontology, the dimension roots excluded."""
+    edges = ontology.load_taxonomy(taxonomy)
+    edges = edges[edges["parent"].notna() & edges["dimension"].isin(dimensions)]
+    return {d: sorted(edges.loc[edges["dimension"] == d, "term"].unique()) for d in dimensions}
+
+
+def prompt_version(table_name, terms):
+    """Changes with the prompt text or the ontology, so the rows are tagged again."""
+    h = hashlib.sha256()
+    h.update(repr(TAG_PROMPT.messages).encode())
+    h.update(json.dumps(ENRICH_TABLES[table_name], sort_keys=True).encode())
+    h.update(json.dumps(terms, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+def render_record(row, columns):
+    lines = []
+    for col in columns:
+        value = row[col]
+        if value is None or value == "":
+            continue
+        if isinstance(value, str) and value.startswith("["):
+            # list columns are stored as JSON text
+            try:
+                value = ", ".join(map(str, json.loads(value)))
+            except ValueError:
+                pass
+        lines.append(f"{col}: {value}")
+    return "\n".join(lines)
+
+
+def clean_labels(answer, terms):
+    """Keep the known dimensions and terms of a parsed answer."""
+    labels = {}
+    for dimension, allowed in terms.items():
+        values = answer.get(dimension) if isinstance(answer, dict) else None
+        if isinstance(values, str):
+            values = [values]
+        labels[dimension] = sorted({v.strip().lower() for v in values or [] if isinstance(v, str)} & set(allowed))
+    return labels
+
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_enrichment (
+            table_name TEXT,
+            _key TEXT,
+            row_hash TEXT,
+            prompt_version TEXT,
+            model TEXT,
+            labels TEXT,
+            enriched_at TEXT,
+            PRIMARY KEY (table_name, _key)
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS llm_labels (
+            table_name TEXT,
+            _key TEXT,
+            dimension TEXT,
+            label TEXT
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_labels__key ON llm_labels (table_name, _key)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_labels__label ON llm_labels (dimension, label)")
+
+
+def iter_pending(conn, table_name, version, model, batch_size=BATCH_SIZE, limit=None):
+    """
+    Batches of live rows without an up-to-date enrichment, in _key order
+    (keyset pagination: the database never returns more than a batch).
+    """
+    columns = ", ".join(f't."{c}"' for c in ENRICH_TABLES[table_name]["columns"])
+    sql = f"""
+        SELECT t._key, t._row_hash, {columns}
+        FROM "{table_name}" t
+        LEFT JOIN llm_enrichment e ON e.table_name = ? AND e._key = t._key
+        WHERE t._deleted_at IS NULL AND t._key > ?
+          AND (e._key IS NULL OR e.row_hash != t._row_hash OR e.prompt_version != ?
+               OR (e.model = 'fake' AND ? != 'fake'))
+        ORDER BY t._key
+        LIMIT ?"""
+    conn.row_factory = sqlite3.Row
+    last, sent = "", 0
+    while limit is None or sent < limit:
+        size = batch_size if limit is None else min(batch_size, limit - sent)
+        rows = conn.execute(sql, (table_name, last, version, model, size)).fetchall()
+        if not rows:
+            break
+        yield rows
+        last, sent = rows[-1]["_key"], sent + len(rows)
+    conn.row_factory = None
+
+
+def write_batch(conn, table_name, version, model, results):
+    """results: [(row, labels)] of one batch, written in one transaction."""
+    now = datetime.now(timezone.utc).isoformat()
+    with conn:
+        conn.executemany("DELETE FROM llm_labels WHERE table_name = ? AND _key = ?",
+                         [(table_name, row["_key"]) for row, _ in results])
+        conn.executemany(
+            "INSERT OR REPLACE INTO llm_enrichment VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(table_name, row["_key"], row["_row_hash"], version, model, json.dumps(labels), now)
+             for row, labels in results])
+        conn.executemany(
+            "INSERT INTO llm_labels VALUES (?, ?, ?, ?)",
+            [(table_name, row["_key"], dimension, label)
+             for row, labels in results for dimension, values in labels.items() for label in values])
+
+
+def build_chain(llm, max_attempts=MAX_ATTEMPTS):
+    # retried with exponential backoff and jitter: rate limits (429), timeouts, 5xx
+    return TAG_PROMPT | llm.with_retry(stop_after_attempt=max_attempts, wait_exponential_jitter=True) \
+        | JsonOutputParser()
+
+
+async def enrich_table(conn, table_name, llm, model, concurrency=CONCURRENCY, batch_size=BATCH_SIZE, limit=None):
+    spec = ENRICH_TABLES[table_name]
+    terms = allowed_terms(spec["dimensions"])
+    version = prompt_version(table_name, terms)
+    allowed = "\n".join(f"- {d}: {', '.join(t)}" for d, t in terms.items())
+    chain = build_chain(llm)
+
+    stats = {"tagged": 0, "failed": 0}
+    start = time.perf_counter()
+    for rows in iter_pending(conn, table_name, version, model, batch_size, limit):
+        inputs = [{"allowed_terms": allowed, "record": render_record(row, spec["columns"])} for row in rows]
+        answers = await chain.abatch(inputs, config={"max_concurrency": concurrency}, return_exceptions=True)
+        results = []
+        for row, answer in zip(rows, answers):
+            if isinstance(answer, Exception):
+                # left pending, sent again by the next run
+                stats["failed"] += 1
+                continue
+            results.append((row, clean_labels(answer, terms)))
+        write_batch(conn, table_name, version, model, results)
+        stats["tagged"] += len(results)
+        print(f"  {table_name}: {stats['tagged']} tagged, {stats['failed']} failed "
+              f"({stats['tagged'] / (time.perf_counter() - start):.1f} rows/s)")
+    return stats
+
+
+def enrich(tables=tuple(ENRICH_TABLES), db_path=database.sqlite_db, concurrency=CONCURRENCY,
+           batch_size=BATCH_SIZE, requests_per_second=None, limit=None, model=llmm.MODEL, fake=False,
+           fake_latency=0.0, cache_path=llm_cache.CACHE_DB):
+    rate_limiter = None
+    if requests_per_second:
+        # the limiter polls for a token, by default only every 0.1 s (at most 10 requests/s)
+        rate_limiter = InMemoryRateLimiter(requests_per_second=requests_per_second,
+                                           check_every_n_seconds=min(0.1, 0.5 / requests_per_second))
+    cache = llm_cache.LLMCache(cache_path) if cache_path else None
+    model_name = "fake" if fake else model
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        create_tables(conn)
+    summary = {}
+    for table_name in tables:
+        print(f"🔄 Enrichissement de `{table_name}`")
+        fake_responses = FAKE_RESPONSES[table_name] if fake else None
+        llm = llmm.get_llm(model, rate_limiter=rate_limiter, fake_responses=fake_responses,
+                           fake_latency=fake_latency, cache=cache)
+        summary[table_name] = asyncio.run(
+            enrich_table(conn, table_name, llm, model_name, concurrency, batch_size, limit))
+    conn.close()
+    for table_name, stats in summary.items():
+        print(f"✅ {table_name}: {stats['tagged']} rows tagged, {stats['failed']} failed")
+    if cache is not None:
+        llm_cache.print_stats(cache)
+        cache.close()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tag companies and deals with ontology labels through the LLM")
+    parser.add_argument("--table", choices=list(ENRICH_TABLES), action="append", help="default: all")
+    parser.add_argument("--db", default=database.sqlite_db)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="requests in flight")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per write transaction")
+    parser.add_argument("--rps", type=float, help="max requests per second")
+    parser.add_argument("--limit", type=int, help="at most N rows per table")
+    parser.add_argument("--model", default=llmm.MODEL)
+    parser.add_argument("--fake", action="store_true", help="local fake chat model, for testing")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="seconds per call of the fake model")
+    parser.add_argument("--cache", default=llm_cache.CACHE_DB, help="on-disk LLM answer cache")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    enrich(args.table or tuple(ENRICH_TABLES), args.db, args.concurrency, args.batch_size, args.rps,
+           args.limit, args.model, args.fake, args.fake_latency, None if args.no_cache else args.cache)
@@ -0,0 +1,279 @@
+"""
+Entity resolution between Startupticker companies and Crunchbase organizations.
+
+Instead of comparing every company with every organization (O(n*m)), both
+sides are split into blocks that share a key:
+    - a normalized name token ("proxeus" in "Legal Technology Switzerland AG (Proxeus)"),
+    - the Crunchbase domain stem against the company name tokens,
+    - the city together with the first letters of the name.
+Blocks that are too large (generic words such as "swiss") are skipped. The
+candidate pairs are scored with rapidfuzz in C++ (process.cpdist) and the best
+organization above the threshold is kept for each company.
+
+Links are stored in `company_links` in startups_clean.db. The fingerprints of
+the matched rows are kept in `company_link_state`, so the next runs only
+re-match companies whose row changed or whose candidates changed.
+"""
+import argparse
+import sqlite3
+import time
+
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+import database
+import db_schema
+
+LEFT_TABLE = "startupticker_companies"
+RIGHT_TABLE = "crunchbase_organizations"
+
+# minimal score to link a company to an organization
+THRESHOLD = 0.85
+# blocks pairing more candidates than this are too generic to be useful
+MAX_BLOCK_PAIRS = 2_000
+# weights of the score components, renormalized over the signals known for a pair
+NAME_WEIGHT, CITY_WEIGHT, DOMAIN_WEIGHT = 0.8, 0.1, 0.1
+
+LEGAL_FORMS = (
+    r"\b(?:ag|sa|gmbh|sarl|s a r l|sagl|ltd|limited|inc|llc|plc|bv|kg|se|corp|"
+    r"holding|in liquidation|en liquidation|i l)\b"
+)
+
+CITY_ALIASES = {
+    "geneve": "geneva", "genf": "geneva", "zuerich": "zurich", "basle": "basel",
+    "berne": "bern", "lucerne": "luzern", "bienne": "biel",
+}
+
+
+def normalize_text(s):
+    """Lower-case ASCII text without punctuation, e.g. 'Genève SA' -> 'geneve sa'."""
+    s = s.astype("string").fillna("")
+    s = s.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii").str.lower()
+    s = s.str.replace(r"[^a-z0-9]+", " ", regex=True)
+    return s.str.strip()
+
+
+def normalize_names(s):
+    s = normalize_text(s).str.replace(LEGAL_FORMS, " ", regex=True)
+    return s.str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def normalize_cities(s):
+    return normalize_text(s).replace(CITY_ALIASES)
+
+
+def domain_stems(s):
+    """'https://www.proxeus.com/en' -> 'proxeus'."""
+    s = s.astype("string").fillna("").str.lower()
+    s = s.str.replace(r"^[a-z]+://", "", regex=True).str.replace(r"^www\.", "", regex=True)
+    return s.str.split("/").str[0].str.split(".").str[0].fillna("")
+
+
+def load_left(conn):
+    df = pd.read_sql(
+        f'SELECT "_key", "_row_hash", "Title", "City" FROM {LEFT_TABLE} WHERE "_deleted_at" IS NULL', conn)
+    return pd.DataFrame({
+        "_key": df["_key"],
+        "_row_hash": df["_row_hash"],
+        "name": normalize_names(df["Title"]),
+        "city": normalize_cities(df["City"]),
+        "domain": "",
+    })
+
+
+def load_right(conn):
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({RIGHT_TABLE})")}
+
+    def col(name):
+        return f'"{name}"' if name in columns else "NULL"
+
+    df = pd.read_sql(
+        f'SELECT "_key", "_row_hash", {col("name")} AS name, {col("city")} AS city, '
+        f'COALESCE({col("domain")}, {col("homepage_url")}) AS domain '
+        f'FROM {RIGHT_TABLE} WHERE "_deleted_at" IS NULL', conn)
+    return pd.DataFrame({
+        "_key": df["_key"],
+        "_row_hash": df["_row_hash"],
+        "name": normalize_names(df["name"]),
+        "city": normalize_cities(df["city"]),
+        "domain": domain_stems(df["domain"]),
+    })
+
+
+def blocking_keys(df):
+    """One row per (record, block). `via_domain` marks blocks coming from the domain."""
+    tokens = df[["_key"]].assign(token=df["name"].str.split()).explode("token")
+    tokens = tokens[tokens["token"].str.len() >= 3]
+    parts = [pd.DataFrame({"_key": tokens["_key"], "block": "t:" + tokens["token"], "via_domain": False})]
+
+    has_domain = df["domain"].str.len() >= 3
+    parts.append(pd.DataFrame({
+        "_key": df.loc[has_domain, "_key"], "block": "t:" + df.loc[has_domain, "domain"], "via_domain": True}))
+
+    has_city = (df["city"] != "") & (df["name"].str.len() >= 4)
+    parts.append(pd.DataFrame({
+        "_key": df.loc[has_city, "_key"],
+        "block": "c:" + df.loc[has_city, "city"] + "|" + df.loc[has_city, "name"].str[:4],
+        "via_domain": False,
+    }))
+    # a domain stem that is also a name token keeps its domain flag
+    return pd.concat(parts, ignore_index=True).groupby(["_key", "block"], as_index=False)["via_domain"].max()
+
+
+def useful_blocks(left_blocks, right_blocks):
+    """Blocks shared by both sides that do not pair more than MAX_BLOCK_PAIRS records."""
+    sizes = (left_blocks["block"].value_counts()
+             .mul(right_blocks["block"].value_counts(), fill_value=0))
+    return sizes[(sizes > 0) & (sizes <= MAX_BLOCK_PAIRS)].index
+
+
+def candidate_pairs(left_blocks, right_blocks, useful=None):
+    """
+    Pairs of records sharing at least one block that is not too generic.
+    `useful` (see useful_blocks()) comes from the full tables when the blocks
+    are only those of the changed records, else it is computed here.
+    """
+    if useful is None:
+        useful = useful_blocks(left_blocks, right_blocks)
+    pairs = left_blocks[left_blocks["block"].isin(useful)].merge(
+        right_blocks[right_blocks["block"].isin(useful)], on="block", suffixes=("_l", "_r"))
+    return (pairs.groupby(["_key_l", "_key_r"], as_index=False)["via_domain_r"].max()
+            .rename(columns={"via_domain_r": "same_domain"}))
+
+
+def score_pairs(pairs, left, right):
+    left_idx = left.set_index("_key")
+    right_idx = right.set_index("_key")
+    names_l = left_idx.loc[pairs["_key_l"], "name"].to_numpy()
+    names_r = right_idx.loc[pairs["_key_r"], "name"].to_numpy()
+    cities_l = left_idx.loc[pairs["_key_l"], "city"].to_numpy()
+    cities_r = right_idx.loc[pairs["_key_r"], "city"].to_numpy()
+    domains_r = right_idx.loc[pairs["_key_r"], "domain"].to_numpy()
+
+    # element-wise pairs, computed in C++ on all cores
+    name_score = process.cpdist(names_l, names_r, scorer=fuzz.token_sort_ratio, workers=-1) / 100
+    known_city = (cities_l != "") & (cities_r != "")
+    same_city = known_city & (cities_l == cities_r)
+    # most companies have no city and none has a domain: a missing signal is
+    # left out of the score instead of counting as a mismatch
+    known_domain = pd.Series(domains_r).str.len().to_numpy() >= 3
+
+    pairs = pairs.assign(name_score=name_score, same_city=same_city)
+    weight = NAME_WEIGHT + CITY_WEIGHT * known_city + DOMAIN_WEIGHT * known_domain
+    pairs["score"] = (NAME_WEIGHT * pairs["name_score"]
+                      + CITY_WEIGHT * pairs["same_city"]
+                      + DOMAIN_WEIGHT * pairs["same_domain"]) / weight
+    return pairs
+
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS company_links (
+            startupticker_key TEXT PRIMARY KEY,
+            crunchbase_key TEXT NOT NULL,
+            score REAL,
+            name_score REAL,
+            same_city INTEGER,
+            same_domain INTEGER,
+            matched_at TEXT
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_company_links__crunchbase_key ON company_links (crunchbase_key)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS company_link_state (
+            side TEXT,
+            _key TEXT,
+            _row_hash TEXT,
+            PRIMARY KEY (side, _key)
+        )""")
+
+
+def changed_keys(conn, side, df, full):
+    """Keys of `df` that are new or changed since the last run, and keys that are gone."""
+    if full:
+        return set(df["_key"]), set()
+    state = dict(conn.execute("SELECT _key, _row_hash FROM company_link_state WHERE side = ?", (side,)))
+    current = dict(zip(df["_key"], df["_row_hash"]))
+    changed = {k for k, h in current.items() if state.get(k) != h}
+    gone = set(state) - set(current)
+    return changed, gone
+
+
+def link_companies(db_path=database.sqlite_db, threshold=THRESHOLD, full=False):
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    for table_name in (LEFT_TABLE, RIGHT_TABLE):
+        if not db_schema.table_exists(conn, table_name):
+            print(f"⚠️ table `{table_name}` not found, run database.py first")
+            conn.close()
+            return None
+    create_tables(conn)
+
+    left, right = load_left(conn), load_right(conn)
+    if full:
+        conn.execute("DELETE FROM company_links")
+        conn.execute("DELETE FROM company_link_state")
+    left_changed, left_gone = changed_keys(conn, "startupticker", left, full)
+    right_changed, right_gone = changed_keys(conn, "crunchbase", right, full)
+
+    left_blocks, right_blocks = blocking_keys(left), blocking_keys(right)
+    # sized on the full tables, a generic block stays too generic for a few changed rows
+    useful = useful_blocks(left_blocks, right_blocks)
+
+    # companies to re-match: changed ones, the ones that now share a block with a
+    # changed organization and the ones linked to a changed or removed organization
+    affected = set(left_changed)
+    if right_changed:
+        pairs = candidate_pairs(left_blocks, right_blocks[right_blocks["_key"].isin(right_changed)], useful)
+        affected.update(pairs["_key_l"])
+    stale_targets = list(right_changed | right_gone)
+    if stale_targets:
+        linked = pd.read_sql("SELECT startupticker_key, crunchbase_key FROM company_links", conn)
+        affected.update(linked.loc[linked["crunchbase_key"].isin(stale_targets), "startupticker_key"])
+
+    pairs = candidate_pairs(left_blocks[left_blocks["_key"].isin(affected)], right_blocks, useful)
+    pairs = score_pairs(pairs, left, right)
+    # ties go to the smallest organization key, the same in incremental and full runs
+    best = (pairs[pairs["score"] >= threshold]
+            .sort_values(["score", "_key_r"], ascending=[False, True], kind="stable")
+            .drop_duplicates("_key_l"))
+
+    now = pd.Timestamp.now().isoformat(sep=" ", timespec="seconds")
+    with conn:
+        conn.executemany("DELETE FROM company_links WHERE startupticker_key = ?",
+                         [(k,) for k in affected | left_gone])
+        conn.executemany(
+            "INSERT INTO company_links VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(l, r, float(s), float(n), int(c), int(d), now) for l, r, s, n, c, d in zip(
+                best["_key_l"], best["_key_r"], best["score"], best["name_score"],
+                best["same_city"], best["same_domain"])])
+
+        for side, df, changed, gone in (("startupticker", left, left_changed, left_gone),
+                                        ("crunchbase", right, right_changed, right_gone)):
+            conn.executemany("DELETE FROM company_link_state WHERE side = ? AND _key = ?",
+                             [(side, k) for k in gone])
+            rows = df[df["_key"].isin(changed)]
+            conn.executemany("INSERT OR REPLACE INTO company_link_state VALUES (?, ?, ?)",
+                             [(side, k, h) for k, h in zip(rows["_key"], rows["_row_hash"])])
+    n_links = conn.execute("SELECT COUNT(*) FROM company_links").fetchone()[0]
+    conn.close()
+
+    summary = {
+        "companies_rematched": len(affected),
+        "candidate_pairs": len(pairs),
+        "links_written": len(best),
+        "links_total": n_links,
+        "seconds": time.perf_counter() - start,
+    }
+    print(f"🔗 {summary['companies_rematched']} companies re-matched over {summary['candidate_pairs']} "
+          f"candidate pairs, {summary['links_written']} links written "
+          f"({summary['links_total']} in total) in {summary['seconds']:.1f} s")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Link Startupticker companies to Crunchbase organizations")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="minimal score of a link")
+    parser.add_argument("--full", action="store_true", help="drop the links and re-match everything")
+    args = parser.parse_args()
+
+    link_companies(threshold=args.threshold, full=args.full)
@@ -0,0 +1,419 @@
+"""
+BM25 keyword search over the text columns of startups_clean.db.
+
+An inverted index made of immutable segments under `lexical_index/`:
+
+    index.json          manifest: segments, their deletion masks, generation
+    seg-<n>/terms.npy   sorted term dictionary (binary searched)
+    seg-<n>/offsets.npy start of each term in docs/tfs
+    seg-<n>/docs.npy    posting lists (uint32 doc numbers), tfs.npy term frequencies
+    seg-<n>/keys.npy    table, _key, _row_hash per doc; lengths.npy doc lengths
+    seg-<n>/canton.npy, phase.npy, year.npy   facet columns
+    deleted-<gen>-seg-<n>.npy   deleted docs of a segment, replaced on every update that changes them
+
+Strings are stored as UTF-8 bytes, the term dictionary sorted bytewise.
+
+Everything is opened with np.load(mmap_mode="r") on the first query, so opening
+the index reads only the manifest. An update indexes the new and changed rows
+(by _row_hash) into a new segment and masks their old versions and the deleted
+rows; the manifest is swapped atomically. Past MAX_SEGMENTS the segments are
+merged into one, dropping the deleted docs.
+
+Text and the canton facet are folded to lowercase without accents (Zürich =
+zurich, société = societe), German/French/English stopwords are dropped, URLs
+split into their words. `robot*` matches every term starting with "robot".
+
+    python lexical_index.py --update
+    python lexical_index.py "batterie recycling" --canton vd --phase seed --year-from 2020
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+import unicodedata
+from collections import Counter
+from functools import cached_property
+
+import numpy as np
+
+import database
+
+INDEX_DIR = "lexical_index"
+MANIFEST = "index.json"
+MAX_SEGMENTS = 8
+TERM_LENGTH = 32  # longer terms are cut
+K1, B = 1.2, 0.75
+
+# indexed text and facet columns per table
+TEXT_COLUMNS = {
+    "startupticker_companies": ["Title", "Highlights", "Comment"],
+    "startupticker_deals": ["Company", "Comment", "Investors", "URL"],
+}
+FACETS = {
+    "startupticker_companies": {"canton": '"Canton"', "phase": "NULL", "year": '"Year"'},
+    "startupticker_deals": {"canton": '"Canton"', "phase": '"Phase"',
+                            "year": 'CAST(substr("Date of the funding round", 1, 4) AS INTEGER)'},
+}
+STOPWORDS = set("""
+a an and are as at by for from has have in is it its of on or that the this to was were with
+der die das und oder mit fur von zu den dem des ein eine einer eines im in auf ist sich bei als
+le la les et ou des du de un une pour avec dans sur par au aux en est qui que son sa ses
+https http www html htm php ch com
+""".split())
+
+
+def fold(text):
+    """Lowercase without accents, for the terms and the canton facet."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return [w[:TERM_LENGTH] for w in re.findall(r"[^\W_]+", fold(text)) if w not in STOPWORDS and len(w) > 1]
+
+
+def doc_text(row, columns):
+    parts = []
+    for col in columns:
+        value = row[col]
+        if not value:
+            continue
+        if isinstance(value, str) and value.startswith("["):
+            try:
+                value = " ".join(map(str, json.loads(value)))
+            except ValueError:
+                pass
+        parts.append(str(value))
+    return " ".join(parts)
+
+
+def utf8(values):
+    return np.array([(v or "").encode("utf-8") for v in values], dtype=bytes)
+
+
+def new_segment_dir(path):
+    # a directory of the same name is the leftover of an interrupted update
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def write_segment(path, docs):
+    """
+    docs: [(table_name, _key, _row_hash, canton, phase, year, tokens)].
+    Postings are sorted by term, then by doc number.
+    """
+    new_segment_dir(path)
+    terms, doc_ids, tfs = [], [], []
+    for doc, (*_, tokens) in enumerate(docs):
+        for term, tf in Counter(tokens).items():
+            terms.append(term.encode("utf-8"))
+            doc_ids.append(doc)
+            tfs.append(tf)
+    terms = np.array(terms, dtype=bytes)
+    doc_ids = np.array(doc_ids, dtype=np.uint32)
+    tfs = np.minimum(np.array(tfs, dtype=np.int64), 65535).astype(np.uint16)
+    save_postings(path, terms, doc_ids, tfs)
+
+    np.save(os.path.join(path, "keys.npy"), utf8(v for d in docs for v in d[:3]).reshape(-1, 3))
+    np.save(os.path.join(path, "lengths.npy"), np.array([len(d[6]) for d in docs], dtype=np.uint32))
+    np.save(os.path.join(path, "canton.npy"), utf8(d[3] for d in docs))
+    np.save(os.path.join(path, "phase.npy"), utf8(d[4] for d in docs))
+    np.save(os.path.join(path, "year.npy"), np.array([d[5] or 0 for d in docs], dtype=np.int16))
+
+
+def save_postings(path, terms, doc_ids, tfs):
+    order = np.lexsort((doc_ids, terms))
+    terms, doc_ids, tfs = terms[order], doc_ids[order], tfs[order]
+    unique, starts = np.unique(terms, return_index=True)
+    np.save(os.path.join(path, "terms.npy"), unique)
+    np.save(os.path.join(path, "offsets.npy"), np.append(starts, len(terms)).astype(np.int64))
+    np.save(os.path.join(path, "docs.npy"), doc_ids)
+    np.save(os.path.join(path, "tfs.npy"), tfs)
+
+
+class Segment:
+    """Read-only segment, its arrays memory-mapped on first access."""
+
+    def __init__(self, path, deleted_path=None):
+        self.path = path
+        self.deleted_path = deleted_path
+        self.facets = {}
+
+    def _load(self, name):
+        return np.load(os.path.join(self.path, name), mmap_mode="r")
+
+    @cached_property
+    def terms(self):
+        return self._load("terms.npy")
+
+    @cached_property
+    def offsets(self):
+        return self._load("offsets.npy")
+
+    @cached_property
+    def docs(self):
+        return self._load("docs.npy")
+
+    @cached_property
+    def tfs(self):
+        return self._load("tfs.npy")
+
+    @cached_property
+    def keys(self):
+        return self._load("keys.npy")
+
+    @cached_property
+    def lengths(self):
+        return self._load("lengths.npy")
+
+    @cached_property
+    def alive(self):
+        alive = np.ones(len(self.lengths), dtype=bool)
+        if self.deleted_path:
+            alive[np.load(self.deleted_path)] = False
+        return alive
+
+    def facet(self, name):
+        if name not in self.facets:
+            self.facets[name] = self._load(f"{name}.npy")
+        return self.facets[name]
+
+    def term_range(self, term):
+        """(first, last) term numbers of `term`, or of its prefix with a trailing '*'."""
+        if term.endswith("*"):
+            prefix = term[:-1].encode("utf-8")
+            return (int(np.searchsorted(self.terms, prefix)),
+                    int(np.searchsorted(self.terms, prefix + b"\xff")))
+        term = term.encode("utf-8")
+        i = int(np.searchsorted(self.terms, term))
+        return (i, i + 1) if i < len(self.terms) and self.terms[i] == term else (i, i)
+
+    def postings(self, term):
+        first, last = self.term_range(term)
+        start, end = self.offsets[first], self.offsets[last]
+        return np.asarray(self.docs[start:end]), np.asarray(self.tfs[start:end], dtype=np.float32)
+
+
+class LexicalIndex:
+    def __init__(self, path=INDEX_DIR):
+        self.path = path
+        manifest = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"generation": 0, "segments": []}
+        self.segments = [self._segment(entry) for entry in self.manifest["segments"]]
+
+    def _segment(self, entry):
+        deleted = os.path.join(self.path, entry["deleted"]) if entry.get("deleted") else None
+        return Segment(os.path.join(self.path, entry["name"]), deleted)
+
+    def _commit(self, segments, deleted):
+        """
+        Swap in a new manifest. `segments` are segment names, `deleted` maps a
+        name to its array of deleted doc numbers.
+        """
+        generation = self.manifest["generation"] + 1
+        entries = []
+        for name in segments:
+            entry = {"name": name, "deleted": None}
+            if len(deleted.get(name, [])):
+                entry["deleted"] = f"deleted-{generation}-{name}.npy"
+                np.save(os.path.join(self.path, entry["deleted"]), np.sort(np.asarray(deleted[name], dtype=np.uint32)))
+            entries.append(entry)
+        old = self.manifest
+        self.manifest = {"generation": generation, "segments": entries}
+        tmp = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, MANIFEST))
+
+        # files no longer referenced
+        kept = {e["name"] for e in entries} | {e["deleted"] for e in entries if e["deleted"]}
+        for entry in old["segments"]:
+            for name in (entry["name"], entry.get("deleted")):
+                if name and name not in kept:
+                    target = os.path.join(self.path, name)
+                    shutil.rmtree(target) if os.path.isdir(target) else os.remove(target)
+        self.segments = [self._segment(entry) for entry in entries]
+        self.__dict__.pop("avg_length", None)
+
+    def update(self, db_path=database.sqlite_db, tables=tuple(TEXT_COLUMNS)):
+        """Index new and changed rows into a new segment, mask old versions and deleted rows."""
+        start = time.perf_counter()
+        os.makedirs(self.path, exist_ok=True)
+        live = {}  # (table, key) -> (segment name, doc, row hash)
+        deleted = {}
+        for entry, segment in zip(self.manifest["segments"], self.segments):
+            deleted[entry["name"]] = list(np.flatnonzero(~segment.alive))
+            for doc in np.flatnonzero(segment.alive):
+                table_name, key, row_hash = (v.decode("utf-8") for v in segment.keys[doc])
+                live[(table_name, key)] = (entry["name"], int(doc), row_hash)
+
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        docs, seen = [], set()
+        for table_name in tables:
+            columns = ", ".join(f'"{c}"' for c in TEXT_COLUMNS[table_name])
+            facets = ", ".join(f"{sql} AS _{name}" for name, sql in FACETS[table_name].items())
+            for row in conn.execute(f'SELECT _key, _row_hash, {columns}, {facets} FROM "{table_name}" '
+                                    f'WHERE _deleted_at IS NULL'):
+                ident = (table_name, row["_key"])
+                seen.add(ident)
+                known = live.get(ident)
+                if known and known[2] == row["_row_hash"]:
+                    continue
+                if known:
+                    deleted[known[0]].append(known[1])
+                canton = fold(row["_canton"] or "")
+                docs.append((table_name, row["_key"], row["_row_hash"], canton, row["_phase"], row["_year"],
+                             tokenize(doc_text(row, TEXT_COLUMNS[table_name]))))
+        conn.close()
+
+        removed = 0
+        for ident, (name, doc, _) in live.items():
+            if ident[0] in tables and ident not in seen:
+                deleted[name].append(doc)
+                removed += 1
+
+        names = [entry["name"] for entry in self.manifest["segments"]]
+        if docs:
+            name = f"seg-{self.manifest['generation'] + 1}"
+            write_segment(os.path.join(self.path, name), docs)
+            names.append(name)
+        # a changed row is also a new doc; the deletions of earlier runs alone change nothing
+        if docs or removed:
+            self._commit(names, deleted)
+        if len(self.segments) > MAX_SEGMENTS:
+            self.merge()
+        print(f"✅ {len(docs)} docs indexed, {removed} deleted in {time.perf_counter() - start:.1f} s "
+              f"({self.live_docs()} docs in {len(self.segments)} segments)")
+        return len(docs), removed
+
+    def merge(self):
+        """Rewrite all the segments as one, without the deleted docs."""
+        name = f"seg-{self.manifest['generation'] + 1}"
+        path = os.path.join(self.path, name)
+        new_segment_dir(path)
+        terms, doc_ids, tfs, keep = [], [], [], {}
+        base = 0
+        for segment in self.segments:
+            alive = segment.alive
+            new_ids = np.cumsum(alive) - 1 + base
+            counts = np.diff(np.asarray(segment.offsets))
+            seg_terms = np.repeat(np.asarray(segment.terms), counts)
+            seg_docs = np.asarray(segment.docs)
+            mask = alive[seg_docs]
+            terms.append(seg_terms[mask])
+            doc_ids.append(new_ids[seg_docs[mask]].astype(np.uint32))
+            tfs.append(np.asarray(segment.tfs)[mask])
+            for column in ("keys", "lengths", "canton", "phase", "year"):
+                values = np.asarray(getattr(segment, column) if column in ("keys", "lengths")
+                                    else segment.facet(column))
+                keep.setdefault(column, []).append(values[alive])
+            base += int(alive.sum())
+        save_postings(path, np.concatenate(terms), np.concatenate(doc_ids), np.concatenate(tfs))
+        for column, parts in keep.items():
+            np.save(os.path.join(path, f"{column}.npy"), np.concatenate(parts))
+        self._commit([name], {})
+        print(f"🔄 Merged into {name}")
+
+    def live_docs(self):
+        return sum(int(s.alive.sum()) for s in self.segments)
+
+    def _filter(self, segment, table, canton, phase, year_from, year_to):
+        mask = segment.alive.copy()
+        if table:
+            mask &= np.asarray(segment.keys[:, 0]) == table.encode()
+        if canton:
+            mask &= np.isin(segment.facet("canton"), [fold(c).encode("utf-8") for c in canton])
+        if phase:
+            mask &= np.isin(segment.facet("phase"), [p.encode("utf-8") for p in phase])
+        if year_from:
+            mask &= segment.facet("year") >= year_from
+        if year_to:
+            mask &= (segment.facet("year") <= year_to) & (segment.facet("year") > 0)
+        return mask
+
+    @cached_property
+    def avg_length(self):
+        total = sum(float(s.lengths[s.alive].sum()) for s in self.segments)
+        return total / max(self.live_docs(), 1)
+
+    def search(self, query, k=10, table=None, canton=None, phase=None, year_from=None, year_to=None):
+        """
+        BM25 top k over the docs matching the filters (canton and phase are lists).
+
+        Returns:
+            list: (score, table_name, _key, canton, phase, year) by decreasing score
+        """
+        terms = [t + "*" if raw.endswith("*") else t
+                 for raw in query.split() for t in tokenize(raw)]
+        n_docs = self.live_docs()
+        filters = [self._filter(s, table, canton, phase, year_from, year_to) for s in self.segments]
+
+        # document frequencies over all the live docs
+        postings = [[s.postings(term) for term in terms] for s in self.segments]
+        df = np.zeros(len(terms))
+        for segment, seg_postings in zip(self.segments, postings):
+            for i, (docs, _) in enumerate(seg_postings):
+                df[i] += segment.alive[np.unique(docs)].sum()
+
+        hits = []
+        for segment, mask, seg_postings in zip(self.segments, filters, postings):
+            scores = np.zeros(len(mask), dtype=np.float32)
+            norm = K1 * (1 - B + B * np.asarray(segment.lengths, dtype=np.float32) / self.avg_length)
+            for (docs, tfs), term_df in zip(seg_postings, df):
+                if not len(docs):
+                    continue
+                idf = np.log(1 + (n_docs - term_df + 0.5) / (term_df + 0.5))
+                # a prefix can match several terms of the same doc
+                np.add.at(scores, docs, idf * tfs * (K1 + 1) / (tfs + norm[docs]))
+            scores[~mask] = 0
+            matched = np.flatnonzero(scores)
+            if len(matched) > k:
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            for doc in matched:
+                table_name, key, _ = (v.decode("utf-8") for v in segment.keys[doc])
+                hits.append((float(scores[doc]), table_name, key, segment.facet("canton")[doc].decode("utf-8"),
+                             segment.facet("phase")[doc].decode("utf-8"), int(segment.facet("year")[doc])))
+        return sorted(hits, reverse=True)[:k]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BM25 keyword search over companies and deals")
+    parser.add_argument("query", nargs="*")
+    parser.add_argument("--db", default=database.sqlite_db)
+    parser.add_argument("--index", default=INDEX_DIR)
+    parser.add_argument("--update", action="store_true", help="index new and changed rows")
+    parser.add_argument("--merge", action="store_true", help="merge all the segments into one")
+    parser.add_argument("--table", choices=list(TEXT_COLUMNS))
+    parser.add_argument("--canton", action="append")
+    parser.add_argument("--phase", action="append")
+    parser.add_argument("--year-from", type=int)
+    parser.add_argument("--year-to", type=int)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    index = LexicalIndex(args.index)
+    if args.update:
+        index.update(args.db)
+    if args.merge and len(index.segments) > 1:
+        index.merge()
+    if args.query:
+        start = time.perf_counter()
+        hits = index.search(" ".join(args.query), args.k, args.table, args.canton, args.phase,
+                            args.year_from, args.year_to)
+        elapsed = time.perf_counter() - start
+        conn = sqlite3.connect(args.db)
+        for score, table_name, key, canton, phase, year in hits:
+            column = "Title" if table_name == "startupticker_companies" else "Company"
+            row = conn.execute(f'SELECT "{column}" FROM "{table_name}" WHERE _key = ?', (key,)).fetchone()
+            print(f"{score:6.2f}  {table_name.replace('startupticker_', ''):<10} {canton:<8} {phase or '-':<12} "
+                  f"{year or '-':<5} {row[0] if row else key}")
+        conn.close()
+        print(f"\n🔎 {len(hits)} hits in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,229 @@
+"""
+On-disk cache of the LLM answers, in front of the chat model of llmm.py.
+
+An answer is keyed by (model, temperature, sha256 of the rendered prompt
+messages) and stored in a small SQLite file, so re-running the enrichment
+after a crash or on unchanged rows costs no request. Identical requests in
+flight at the same time (threads or coroutines) share a single call.
+
+    llm = llmm.get_llm(cache=LLMCache())     # or CachedChatModel(llm, cache, model, temperature)
+    chain = prompt | llm
+
+Entries older than `max_age_days` are dropped and, past `max_entries`, the
+least recently used ones go first. The cache keeps hit/miss counters:
+
+    python llm_cache.py --stats
+    python llm_cache.py --evict --max-age-days 30
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, convert_to_messages
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable
+
+CACHE_DB = "llm_cache.db"
+MAX_ENTRIES = 200_000
+MAX_AGE_DAYS = 90
+EVICT_EVERY = 1000  # inserts between two evictions
+
+
+def to_messages(input):
+    """Messages of a chat model input: a prompt value, a string or a list of messages."""
+    if isinstance(input, PromptValue):
+        return input.to_messages()
+    if isinstance(input, str):
+        return [HumanMessage(content=input)]
+    return convert_to_messages(input)
+
+
+def prompt_hash(messages):
+    """sha256 of the rendered messages (type and content of each)."""
+    rendered = json.dumps([(m.type, m.content) for m in messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(rendered.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite store of the answers with size/age eviction and hit/miss counters."""
+
+    def __init__(self, path=CACHE_DB, max_entries=MAX_ENTRIES, max_age_days=MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    model TEXT,
+                    temperature REAL,
+                    prompt_hash TEXT,
+                    content TEXT,
+                    created_at REAL,
+                    used_at REAL,
+                    hits INTEGER DEFAULT 0,
+                    PRIMARY KEY (model, temperature, prompt_hash)
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache__used_at ON llm_cache (used_at)")
+        self.stats = {"hits": 0, "misses": 0, "deduplicated": 0}
+        self.inserts = 0
+
+    def get(self, key):
+        """Cached content of key = (model, temperature, prompt_hash), None on a miss."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content, created_at FROM llm_cache WHERE model = ? AND temperature = ? AND prompt_hash = ?",
+                key).fetchone()
+            if row is None or now - row[1] > self.max_age_days * 86400:
+                self.stats["misses"] += 1
+                return None
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE llm_cache SET used_at = ?, hits = hits + 1 "
+                    "WHERE model = ? AND temperature = ? AND prompt_hash = ?", (now, *key))
+            self.stats["hits"] += 1
+        return json.loads(row[0])
+
+    def put(self, key, content):
+        now = time.time()
+        with self.lock:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, 0)",
+                                  (*key, json.dumps(content), now, now))
+            self.inserts += 1
+        if self.inserts % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop the expired entries, then the least recently used above max_entries."""
+        with self.lock, self.conn:
+            expired = self.conn.execute("DELETE FROM llm_cache WHERE created_at < ?",
+                                        (time.time() - self.max_age_days * 86400,)).rowcount
+            overflow = self.conn.execute(
+                "DELETE FROM llm_cache WHERE rowid IN "
+                "(SELECT rowid FROM llm_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)).rowcount
+        return expired + overflow
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM llm_cache")
+
+    def summary(self):
+        with self.lock:
+            entries, hits = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM llm_cache").fetchone()
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {"entries": entries, "stored_hits": hits, "size_mb": round(size / 1e6, 2), **self.stats}
+
+    def close(self):
+        self.conn.close()
+
+
+class CachedChatModel(Runnable):
+    """
+    Chat model answering from an LLMCache first. Misses go to `llm` (with its
+    rate limiter); concurrent identical requests wait for the first one.
+    Answers come back as AIMessage, so the rest of a chain is unchanged.
+    """
+
+    def __init__(self, llm: BaseChatModel, cache: LLMCache, model, temperature=0):
+        self.llm = llm
+        self.cache = cache
+        self.model = model
+        self.temperature = float(temperature)
+        self.lock = threading.Lock()
+        self.pending = {}  # key -> Future of the call in flight (threads)
+        self.apending = {}  # key -> asyncio.Future (coroutines)
+
+    def key(self, input):
+        return self.model, self.temperature, prompt_hash(to_messages(input))
+
+    def invoke(self, input, config=None, **kwargs):
+        key = self.key(input)
+        content = self.cache.get(key)
+        if content is not None:
+            return AIMessage(content=content)
+        with self.lock:
+            future = self.pending.get(key)
+            owner = future is None
+            if owner:
+                future = self.pending[key] = Future()
+        if not owner:
+            self.cache.stats["deduplicated"] += 1
+            return AIMessage(content=future.result())
+        try:
+            content = self.llm.invoke(input, config, **kwargs).content
+            self.cache.put(key, content)
+            future.set_result(content)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.pending[key]
+        return AIMessage(content=content)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        key = self.key(input)
+        content = self.cache.get(key)
+        if content is not None:
+            return AIMessage(content=content)
+        future = self.apending.get(key)
+        if future is not None:
+            self.cache.stats["deduplicated"] += 1
+            return AIMessage(content=await asyncio.shield(future))
+        future = self.apending[key] = asyncio.get_running_loop().create_future()
+        try:
+            content = (await self.llm.ainvoke(input, config, **kwargs)).content
+            self.cache.put(key, content)
+            future.set_result(content)
+        except Exception as e:
+            future.set_exception(e)
+            # retrieved by the waiters if any, not reported as never retrieved
+            future.exception()
+            raise
+        finally:
+            del self.apending[key]
+        return AIMessage(content=content)
+
+
+def print_stats(cache):
+    s = cache.summary()
+    # a deduplicated request is also a miss of the store
+    requests = s["hits"] + s["misses"]
+    rate = (s["hits"] + s["deduplicated"]) / requests if requests else 0
+    print(f"🗄️ LLM cache {cache.path}: {s['entries']} entries, {s['size_mb']} MB, "
+          f"{s['stored_hits']} hits since stored")
+    if requests:
+        print(f"   this run: {s['hits']} hits, {s['misses']} misses, {s['deduplicated']} deduplicated "
+              f"({rate:.0%} answered without a request)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and trim the on-disk LLM cache")
+    parser.add_argument("--db", default=CACHE_DB)
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--evict", action="store_true", help="drop expired / least recently used entries")
+    parser.add_argument("--clear", action="store_true")
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES)
+    parser.add_argument("--max-age-days", type=float, default=MAX_AGE_DAYS)
+    args = parser.parse_args()
+
+    cache = LLMCache(args.db, args.max_entries, args.max_age_days)
+    if args.clear:
+        cache.clear()
+        print("✅ Cache vidé")
+    elif args.evict:
+        print(f"✅ {cache.evict()} entries evicted")
+    print_stats(cache)
+    cache.close()
@@ -1,14 +1,55 @@
+import asyncio
+
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from dotenv import load_dotenv
 
 from langchain_core.prompts import ChatPromptTemplate
 
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash-001",
-    temperature=0,
-)
+MODEL = "gemini-2.0-flash-001"
+
+
+class FakeChatModel(FakeListChatModel):
+    """
+    FakeListChatModel whose async calls wait `latency` seconds without
+    blocking the event loop, like a remote API, so concurrent calls overlap.
+    """
+
+    latency: float = 0.0
+
+    # FakeListChatModel answers a batch one call after the other
+    batch = BaseChatModel.batch
+    abatch = BaseChatModel.abatch
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._generate(messages, stop=stop, **kwargs)
+
+
+def get_llm(model=MODEL, temperature=0, rate_limiter=None, fake_responses=None, fake_latency=0.0, cache=None):
+    """
+    Chat model of the pipeline. `rate_limiter` (langchain_core.rate_limiters)
+    caps the requests per second. With `fake_responses` a local fake model
+    answering them in turn (after `fake_latency` seconds) is returned
+    instead, no API key or network needed. With `cache` (llm_cache.LLMCache)
+    the answers are looked up there first.
+    """
+    if fake_responses is not None:
+        llm = FakeChatModel(responses=fake_responses, latency=fake_latency, rate_limiter=rate_limiter)
+        model = "fake"
+    else:
+        llm = ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            rate_limiter=rate_limiter,
+        )
+    if cache is not None:
+        from llm_cache import CachedChatModel
+        return CachedChatModel(llm, cache, model, temperature)
+    return llm
 
 
 prompt = ChatPromptTemplate.from_messages(
@@ -21,13 +62,15 @@ prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-chain = prompt | llm
-result = chain.invoke(
-    {
-        "input_language": "English",
-        "output_language": "German",
-        "input": "I love programming.",
-    }
-)
 
-print(result.content)
+if __name__ == "__main__":
+    chain = prompt | get_llm()
+    result = chain.invoke(
+        {
+            "input_language": "English",
+            "output_language": "German",
+            "input": "I love programming.",
+        }
+    )
+
+    print(result.content)
@@ -0,0 +1,381 @@
+"""
+Natural-language questions over startups_clean.db.
+
+    python nl_sql.py "median seed round in Vaud fintech since 2020"
+
+A compact summary of the schema (tables, typed columns, the values of the
+categorical columns, join keys) is rendered once per state of the database and
+put in the prompt; the chain answers with one SELECT statement. The statement runs on a
+read-only connection behind an authorizer that only lets SELECTs read the
+summarized tables, with a row cap and a time limit. A failing statement is sent
+back once with the error for a fix.
+
+Two caches in nl_sql_cache.db make repeated dashboard questions cheap:
+
+    nl_plans    normalized question (+ schema, model) -> SQL, no LLM call
+    nl_results  SQL (+ data version of the database file) -> rows, no query
+
+"Median seed round in Vaud fintech since 2020?" and "median seed round Vaud
+fintech since 2020" share a plan. A changed database file invalidates the
+results and the summary; the plans only when the summary itself changes (a new
+column or categorical value).
+
+    python nl_sql.py --fake "..."    # local stub model, no API call
+    python nl_sql.py --show-schema
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import statistics
+import time
+import unicodedata
+
+import pandas as pd
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+import database
+import db_schema
+import llmm
+from db_schema import q
+
+CACHE_DB = "nl_sql_cache.db"
+MAX_ROWS = 1000
+TIMEOUT = 10  # seconds per query
+MAX_CATEGORIES = 50  # TEXT columns with at most this many values list them in the summary
+
+# tables the questions may read, when they exist
+QUERY_TABLES = list(db_schema.TABLES) + [
+    "ontology_closure", "llm_labels",
+    "sogc_publications", "sogc_people", "sogc_address_changes", "sogc_liquidations",
+]
+SCHEMA_NOTES = [
+    "startupticker_deals.Company = startupticker_companies.Title (lowercase)",
+    "dates are ISO text 'YYYY-MM-DD HH:MM:SS'; Amount and Valuation in CHF millions",
+    "list columns (Investors, Highlights) are JSON text",
+    "rows with _deleted_at NOT NULL are deleted, always filter _deleted_at IS NULL",
+    "ontology_closure(dimension, ancestor, descendant): a term and all the terms under it",
+    "extra aggregate: median(x)",
+]
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "for", "is", "are", "was", "were", "what", "which", "please",
+    "show", "me", "give", "tell", "der", "die", "das", "le", "la", "les", "du", "des",
+}
+
+SQL_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You write SQLite queries over a database of Swiss startups and their funding rounds. "
+            "Answer with one read-only SELECT statement and nothing else.\n\n{schema}",
+        ),
+        ("human", "{question}"),
+    ]
+)
+FIX_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", "You write SQLite queries. Answer with the corrected SELECT statement only.\n\n{schema}"),
+        ("human", "Question: {question}\n\nThis query failed:\n{sql}\n\nError: {error}"),
+    ]
+)
+
+FAKE_SQL = """SELECT median(d.Amount) AS median_amount, COUNT(*) AS deals
+FROM startupticker_deals d
+JOIN startupticker_companies c ON c.Title = d.Company AND c._deleted_at IS NULL
+WHERE d._deleted_at IS NULL AND d.Canton = 'vd' AND d.Phase = 'seed'
+  AND c.Industry = 'ict (fintech)' AND d."Date of the funding round" >= '2020-01-01'"""
+
+
+class Median:
+    """median(x) aggregate, SQLite has none."""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return statistics.median(self.values) if self.values else None
+
+
+def normalize_question(question):
+    """Lowercase words without accents, punctuation and filler words."""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(w for w in re.findall(r"\w+(?:\.\d+)?", text) if w not in STOPWORDS)
+
+
+def extract_sql(answer):
+    """The statement of a model answer, without ```sql fences or a trailing ';'."""
+    fenced = re.search(r"```(?:sql)?\s*(.*?)```", answer, re.S | re.I)
+    sql = (fenced.group(1) if fenced else answer).strip()
+    return sql.rstrip(";").strip()
+
+
+def data_version(db_path):
+    """Changes with any write to the database (file and WAL size/mtime)."""
+    parts = []
+    for path in (db_path, db_path + "-wal"):
+        if os.path.exists(path):
+            st = os.stat(path)
+            parts.append(f"{st.st_size}:{st.st_mtime_ns}")
+    return "|".join(parts)
+
+
+def schema_summary(conn):
+    """Compact text of the queryable tables, one line per column."""
+    lines = []
+    existing = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table_name in QUERY_TABLES:
+        if table_name not in existing:
+            continue
+        # no row counts: they change with every write and would invalidate the plans
+        lines.append(f"TABLE {table_name}")
+        for _, col, col_type, *_ in conn.execute(f"PRAGMA table_info({q(table_name)})"):
+            if col in ("_key", "_row_hash"):
+                continue
+            line = f"  {q(col)} {col_type}"
+            if col_type == "TEXT" and col != "_deleted_at":
+                # sorted, so that the summary only changes with the set of values
+                values = conn.execute(
+                    f"SELECT DISTINCT {q(col)} FROM {q(table_name)} WHERE {q(col)} IS NOT NULL "
+                    f"ORDER BY 1 LIMIT {MAX_CATEGORIES + 1}").fetchall()
+                if 0 < len(values) <= MAX_CATEGORIES:
+                    line += ": " + ", ".join(repr(v) for v, in values)
+            lines.append(line)
+    lines.append("NOTES")
+    lines.extend(f"  {note}" for note in SCHEMA_NOTES)
+    return "\n".join(lines)
+
+
+class QueryCache:
+    """Question -> SQL plans and SQL -> result rows, in a SQLite file."""
+
+    def __init__(self, path=CACHE_DB):
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS nl_schema (
+                    db_path TEXT PRIMARY KEY,
+                    schema_version INTEGER,
+                    data_version TEXT,
+                    summary TEXT
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS nl_plans (
+                    question_key TEXT,
+                    schema_hash TEXT,
+                    model TEXT,
+                    sql TEXT,
+                    created_at REAL,
+                    hits INTEGER DEFAULT 0,
+                    PRIMARY KEY (question_key, schema_hash, model)
+                )""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS nl_results (
+                    sql_hash TEXT,
+                    data_version TEXT,
+                    columns TEXT,
+                    rows TEXT,
+                    created_at REAL,
+                    PRIMARY KEY (sql_hash, data_version)
+                )""")
+
+    def summary(self, db_path, schema_version, version):
+        # the categorical values change with the data, not only with the schema
+        row = self.conn.execute("SELECT schema_version, data_version, summary FROM nl_schema WHERE db_path = ?",
+                                (db_path,)).fetchone()
+        return row[2] if row and row[:2] == (schema_version, version) else None
+
+    def put_summary(self, db_path, schema_version, version, summary):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO nl_schema VALUES (?, ?, ?, ?)",
+                              (db_path, schema_version, version, summary))
+
+    def plan(self, key):
+        row = self.conn.execute(
+            "SELECT sql FROM nl_plans WHERE question_key = ? AND schema_hash = ? AND model = ?", key).fetchone()
+        if row:
+            with self.conn:
+                self.conn.execute("UPDATE nl_plans SET hits = hits + 1 "
+                                  "WHERE question_key = ? AND schema_hash = ? AND model = ?", key)
+        return row[0] if row else None
+
+    def put_plan(self, key, sql):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO nl_plans VALUES (?, ?, ?, ?, ?, 0)", (*key, sql, time.time()))
+
+    def result(self, sql, version):
+        row = self.conn.execute("SELECT columns, rows FROM nl_results WHERE sql_hash = ? AND data_version = ?",
+                                (sql_hash(sql), version)).fetchone()
+        return (json.loads(row[0]), json.loads(row[1])) if row else None
+
+    def put_result(self, sql, version, columns, rows):
+        with self.conn:
+            # results of an older state of the database are never valid again
+            self.conn.execute("DELETE FROM nl_results WHERE data_version != ?", (version,))
+            self.conn.execute("INSERT OR REPLACE INTO nl_results VALUES (?, ?, ?, ?, ?)",
+                              (sql_hash(sql), version, json.dumps(columns), json.dumps(rows), time.time()))
+
+    def close(self):
+        self.conn.close()
+
+
+def sql_hash(sql):
+    return hashlib.sha256(" ".join(sql.split()).encode("utf-8")).hexdigest()
+
+
+class QueryEngine:
+    """
+    Answers questions with SQL generated by the chain. `llm` defaults to
+    llmm.get_llm(); any chat model works, e.g. a FakeChatModel stub.
+    """
+
+    def __init__(self, db_path=database.sqlite_db, llm=None, model=llmm.MODEL, cache_path=CACHE_DB,
+                 max_rows=MAX_ROWS, timeout=TIMEOUT):
+        self.db_path = db_path
+        self.model = model
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.cache = QueryCache(cache_path) if cache_path else None
+        llm = llm or llmm.get_llm(model)
+        self.sql_chain = SQL_PROMPT | llm | StrOutputParser()
+        self.fix_chain = FIX_PROMPT | llm | StrOutputParser()
+
+        self.conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True, check_same_thread=False)
+        self.conn.execute("PRAGMA query_only = ON")
+        self.conn.create_aggregate("median", 1, Median)
+        self.allowed = {name for name, in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                        if any(name == t or name.startswith(t + "_fts") for t in QUERY_TABLES)}
+        for name in self.allowed:
+            if name.endswith("_fts"):
+                # FTS5 tables are connected on first use, which the authorizer would refuse
+                self.conn.execute(f"SELECT 1 FROM {q(name)} LIMIT 0").fetchall()
+        self.conn.set_authorizer(self._authorize)
+        self._load_schema(data_version(db_path))
+
+    def _load_schema(self, version):
+        """Summary of the database at data version `version`, rendered again after a write."""
+        # reads the pragmas and sqlite_master, refused to the generated SQL by the authorizer
+        self.conn.set_authorizer(None)
+        try:
+            schema_version = self.conn.execute("PRAGMA schema_version").fetchone()[0]
+            db_path = os.path.abspath(self.db_path)
+            summary = self.cache.summary(db_path, schema_version, version) if self.cache else None
+            if summary is None:
+                summary = schema_summary(self.conn)
+                if self.cache:
+                    self.cache.put_summary(db_path, schema_version, version, summary)
+        finally:
+            self.conn.set_authorizer(self._authorize)
+        self.schema = summary
+        self.schema_hash = hashlib.sha256(summary.encode("utf-8")).hexdigest()[:16]
+        self.schema_data_version = version
+
+    def _authorize(self, action, arg1, arg2, db_name, trigger):
+        if action in (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE):
+            return sqlite3.SQLITE_OK
+        # db_name is None for the columns of a WITH (RECURSIVE) table
+        if action == sqlite3.SQLITE_READ and (arg1 in self.allowed or db_name is None):
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_PRAGMA and arg1 == "data_version" and arg2 is None:
+            # read by FTS5 on every query
+            return sqlite3.SQLITE_OK
+        return sqlite3.SQLITE_DENY
+
+    def validate(self, sql):
+        """
+        Reject anything but a SELECT. execute() refuses several statements and
+        the authorizer anything that writes or reads outside QUERY_TABLES.
+        """
+        if not re.match(r"(?is)^\s*(select|with)\b", sql):
+            raise ValueError(f"only SELECT statements are allowed: {sql[:80]!r}")
+        return sql
+
+    def run_sql(self, sql):
+        """(columns, rows) of a validated statement, at most max_rows rows."""
+        self.validate(sql)
+        deadline = time.monotonic() + self.timeout
+        self.conn.set_progress_handler(lambda: time.monotonic() > deadline, 10_000)
+        try:
+            cursor = self.conn.execute(sql)
+            rows = cursor.fetchmany(self.max_rows)
+        finally:
+            self.conn.set_progress_handler(None, 0)
+        columns = [d[0] for d in cursor.description or []]
+        return columns, [list(row) for row in rows]
+
+    def generate_sql(self, question):
+        return extract_sql(self.sql_chain.invoke({"schema": self.schema, "question": question}))
+
+    def ask(self, question):
+        """
+        Returns:
+            dict: question, sql, columns, rows, cached_plan, cached_result, seconds
+        """
+        start = time.perf_counter()
+        version = data_version(self.db_path)
+        if version != self.schema_data_version:
+            self._load_schema(version)
+        key = (normalize_question(question), self.schema_hash, self.model)
+        sql = self.cache.plan(key) if self.cache else None
+        cached_plan = sql is not None
+        if sql is None:
+            sql = self.generate_sql(question)
+
+        result = self.cache.result(sql, version) if self.cache else None
+        cached_result = result is not None
+        if result is None:
+            try:
+                result = self.run_sql(sql)
+            except (sqlite3.Error, ValueError) as e:
+                if cached_plan:
+                    raise
+                # one attempt to fix the statement with the error message
+                sql = extract_sql(self.fix_chain.invoke(
+                    {"schema": self.schema, "question": question, "sql": sql, "error": str(e)}))
+                result = self.run_sql(sql)
+            if self.cache:
+                self.cache.put_result(sql, version, *result)
+        if self.cache and not cached_plan:
+            self.cache.put_plan(key, sql)
+
+        columns, rows = result
+        return {"question": question, "sql": sql, "columns": columns, "rows": rows,
+                "cached_plan": cached_plan, "cached_result": cached_result,
+                "seconds": time.perf_counter() - start}
+
+    def close(self):
+        self.conn.close()
+        if self.cache:
+            self.cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ask startups_clean.db a question in plain language")
+    parser.add_argument("question", nargs="*")
+    parser.add_argument("--db", default=database.sqlite_db)
+    parser.add_argument("--cache", default=CACHE_DB, help="plan/result cache file")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--model", default=llmm.MODEL)
+    parser.add_argument("--fake", action="store_true", help="local stub model answering a fixed query")
+    parser.add_argument("--show-schema", action="store_true", help="print the schema summary of the prompt")
+    args = parser.parse_args()
+
+    llm = llmm.get_llm(fake_responses=[f"```sql\n{FAKE_SQL}\n```"]) if args.fake else None
+    engine = QueryEngine(args.db, llm, "fake" if args.fake else args.model, None if args.no_cache else args.cache)
+    if args.show_schema:
+        print(engine.schema)
+    if args.question:
+        answer = engine.ask(" ".join(args.question))
+        source = "cached plan" if answer["cached_plan"] else "generated"
+        print(f"🔄 SQL ({source}):\n{answer['sql']}\n")
+        print(pd.DataFrame(answer["rows"], columns=answer["columns"]).to_string(index=False))
+        print(f"\n✅ {len(answer['rows'])} rows in {answer['seconds'] * 1000:.0f} ms"
+              f"{' (cached result)' if answer['cached_result'] else ''}")
+    engine.close()
@@ -0,0 +1,208 @@
+"""
+Industry / technology / stage ontology with materialized "is-a" closures.
+
+The taxonomy lives in ontology.json: one tree per dimension, a term may sit
+under several parents (e.g. "healthcare it" is both ICT and life sciences).
+The transitive closure (every ancestor of every term, the term itself
+included) is computed once and stored:
+
+    - in startups_clean.db, as the indexed tables `ontology_edges` and
+      `ontology_closure` (dimension, ancestor, descendant, depth);
+    - in the triple store, as `ex:broader` (direct parent) and
+      `ex:hasAncestor` (closure) triples on the nodes of rdf_converter.py.
+
+"All deals under cleantech and its subsectors" is then one indexed join, no
+recursive query or reasoning at query time (see deals_under()).
+"""
+import argparse
+import json
+import os
+import sqlite3
+
+import pandas as pd
+from rdflib.namespace import RDF
+
+import database
+import triple_store
+from rdf_converter import EX, RES, nt_literals, nt_lines, nt_uri, nt_uris
+
+TAXONOMY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ontology.json")
+ONTOLOGY_NT = triple_store.ONTOLOGY_NT
+
+# dimension -> node class in the graph, also the URI prefix (RES + class + "_" + term)
+DIMENSION_CLASSES = {
+    "industry": "Industry",
+    "technology": "Technology",
+    "stage": "Stage",
+    "deal_type": "DealType",
+}
+
+
+def load_taxonomy(path=TAXONOMY_FILE):
+    """Edges (dimension, term, parent) of the taxonomy; the roots hang off the dimension."""
+    with open(path, encoding="utf-8") as f:
+        taxonomy = json.load(f)
+
+    edges = []
+
+    def walk(dimension, parent, children):
+        for term, grandchildren in children.items():
+            edges.append((dimension, term, parent))
+            walk(dimension, term, grandchildren)
+
+    for dimension, tree in taxonomy.items():
+        edges.append((dimension, dimension, None))
+        walk(dimension, dimension, tree)
+    return pd.DataFrame(edges, columns=["dimension", "term", "parent"]).drop_duplicates()
+
+
+def compute_closure(edges):
+    """
+    (dimension, ancestor, descendant, depth) for every ancestor of every term,
+    depth 0 being the term itself. Paths are extended one level per pass
+    until nothing new appears; the shortest depth is kept.
+    """
+    parents = edges.dropna(subset=["parent"])[["dimension", "term", "parent"]]
+    closure = pd.DataFrame({
+        "dimension": edges["dimension"], "ancestor": edges["term"], "descendant": edges["term"], "depth": 0,
+    }).drop_duplicates(["dimension", "ancestor", "descendant"])
+    frontier = closure
+    while not frontier.empty:
+        step = frontier.merge(parents, left_on=["dimension", "ancestor"], right_on=["dimension", "term"])
+        step = pd.DataFrame({
+            "dimension": step["dimension"], "ancestor": step["parent"],
+            "descendant": step["descendant"], "depth": step["depth"] + 1,
+        })
+        known = step.merge(closure, on=["dimension", "ancestor", "descendant"], how="left", indicator=True)
+        frontier = step[(known["_merge"] == "left_only").to_numpy()].drop_duplicates(
+            ["dimension", "ancestor", "descendant"])
+        closure = pd.concat([closure, frontier], ignore_index=True)
+    return closure.sort_values(["dimension", "ancestor", "depth", "descendant"], ignore_index=True)
+
+
+def write_closure_db(edges, closure, db_path=database.sqlite_db):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS ontology_edges")
+        conn.execute("DROP TABLE IF EXISTS ontology_closure")
+        conn.execute("""
+            CREATE TABLE ontology_edges (
+                dimension TEXT,
+                term TEXT,
+                parent TEXT
+            )""")
+        conn.execute("""
+            CREATE TABLE ontology_closure (
+                dimension TEXT,
+                ancestor TEXT,
+                descendant TEXT,
+                depth INTEGER,
+                PRIMARY KEY (dimension, ancestor, descendant)
+            ) WITHOUT ROWID""")
+        conn.execute("CREATE INDEX ix_ontology_edges__term ON ontology_edges (dimension, term)")
+        # ancestors of a term (the primary key answers descendants of a term)
+        conn.execute("CREATE INDEX ix_ontology_closure__descendant ON ontology_closure (dimension, descendant)")
+        conn.executemany("INSERT INTO ontology_edges VALUES (?, ?, ?)", edges.itertuples(index=False))
+        conn.executemany("INSERT INTO ontology_closure VALUES (?, ?, ?, ?)",
+                         ((d, a, t, int(n)) for d, a, t, n in closure.itertuples(index=False)))
+    conn.close()
+
+
+def closure_triples(edges, closure):
+    """N-Triples lines of the ontology nodes, their parents and their ancestors."""
+    lines = []
+    for dimension, kind in DIMENSION_CLASSES.items():
+        base = RES + f"{kind}_"
+        terms = edges.loc[edges["dimension"] == dimension, "term"].drop_duplicates().reset_index(drop=True)
+        nodes = nt_uris(base, terms)
+        lines.append(nt_lines(nodes, RDF.type, nt_uri(EX[kind])))
+        lines.append(nt_lines(nodes, EX.name, nt_literals(terms)))
+
+        parents = edges[(edges["dimension"] == dimension) & edges["parent"].notna()]
+        lines.append(nt_lines(nt_uris(base, parents["term"]), EX.broader, nt_uris(base, parents["parent"])))
+
+        pairs = closure[closure["dimension"] == dimension]
+        lines.append(nt_lines(nt_uris(base, pairs["descendant"]), EX.hasAncestor, nt_uris(base, pairs["ancestor"])))
+    return pd.concat(lines, ignore_index=True).drop_duplicates()
+
+
+def write_closure_store(lines, output=ONTOLOGY_NT, store=triple_store.STORE_DIR):
+    """
+    Write the ontology triples to `output` and apply the difference with the
+    previous version to the store. triple_store.load_store() reloads
+    `output` with every full load of rdf_converter.py.
+    """
+    old = set()
+    if os.path.exists(output):
+        with open(output, encoding="utf-8") as f:
+            old = set(f.read().splitlines())
+    new = list(lines)
+
+    with open(output, "w", encoding="utf-8") as f:
+        f.write("\n".join(new) + "\n")
+
+    if not os.path.isdir(store):
+        print(f"⚠️ {store} not found, {output} will be loaded with the next full load")
+        return
+    added_path, removed_path = f"{output}.added", f"{output}.removed"
+    with open(added_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(line for line in new if line not in old) + "\n")
+    with open(removed_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(old - set(new)) + "\n")
+    try:
+        triple_store.apply_delta(added_path, removed_path, store)
+    finally:
+        os.remove(added_path)
+        os.remove(removed_path)
+
+
+def build_ontology(taxonomy=TAXONOMY_FILE, db_path=database.sqlite_db, store=triple_store.STORE_DIR):
+    edges = load_taxonomy(taxonomy)
+    closure = compute_closure(edges)
+    write_closure_db(edges, closure, db_path)
+    write_closure_store(closure_triples(edges, closure), store=store)
+    print(f"🌳 {edges['term'].nunique()} terms in {edges['dimension'].nunique()} dimensions, "
+          f"{len(closure)} ancestor/descendant pairs written to {db_path}")
+    return closure
+
+
+def descendants(conn, dimension, term):
+    """The term and everything under it, from the materialized closure."""
+    rows = conn.execute(
+        "SELECT descendant FROM ontology_closure WHERE dimension = ? AND ancestor = ? ORDER BY depth",
+        (dimension, term))
+    return [row[0] for row in rows]
+
+
+def ancestors(conn, dimension, term):
+    """The term and everything above it, closest first."""
+    rows = conn.execute(
+        "SELECT ancestor FROM ontology_closure WHERE dimension = ? AND descendant = ? ORDER BY depth",
+        (dimension, term))
+    return [row[0] for row in rows]
+
+
+def deals_under(conn, industry):
+    """Deals of the companies whose industry is `industry` or one of its subsectors."""
+    return pd.read_sql("""
+        SELECT d.*
+        FROM ontology_closure o
+        JOIN startupticker_companies c ON c.Industry = o.descendant
+        JOIN startupticker_deals d ON d.Company = c.Title
+        WHERE o.dimension = 'industry' AND o.ancestor = ?
+          AND c._deleted_at IS NULL AND d._deleted_at IS NULL""", conn, params=(industry,))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize the ontology closure")
+    parser.add_argument("--taxonomy", default=TAXONOMY_FILE)
+    parser.add_argument("--store", default=triple_store.STORE_DIR, help="directory of the triple store")
+    parser.add_argument("--under", metavar="INDUSTRY", help="print the number of deals under an industry")
+    args = parser.parse_args()
+
+    build_ontology(args.taxonomy, store=args.store)
+    if args.under:
+        conn = sqlite3.connect(database.sqlite_db)
+        print(f"{args.under}: {', '.join(descendants(conn, 'industry', args.under))}")
+        print(f"{len(deals_under(conn, args.under))} deals")
+        conn.close()
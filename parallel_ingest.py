@@ -0,0 +1,161 @@
+"""
+Parallel version of database.build_database().
+
+    reader processes (one per sheet)  --raw chunks-->  converter pool (N processes)
+        --converted, fingerprinted chunks-->  single writer (this process, SQLite)
+
+Sheets are parsed concurrently, their row chunks are converted by a pool of
+processes and every insert goes through one BulkLoader, so SQLite only ever
+sees one writer. Converted chunks are written in sheet order, whatever order
+they arrive in, so duplicate natural keys resolve the same way as in
+database.build_database(). The queues are bounded: readers wait when converters or the
+writer fall behind, memory stays bounded by a few chunks per worker.
+
+Each process records how long it spent per stage (read, convert, fingerprint,
+write); the breakdown is printed at the end.
+"""
+import multiprocessing as mp
+import os
+import time
+import traceback
+from collections import defaultdict
+
+import database
+from bulk_loader import BATCH_SIZE, BulkLoader
+
+
+def _reader(table_name, streaming, chunksize, raw_q):
+    """Parse one sheet and queue its rows chunk by chunk."""
+    name = f"reader-{os.getpid()}"
+    file, data_sheet, _ = database.sheets_to_process[table_name]
+    n_chunks = 0
+    try:
+        if streaming:
+            chunks, converted = database.iter_sheet_chunks(file, data_sheet, chunksize), False
+        else:
+            # whole sheet through the parse cache, already converted
+            df = database.load_converted_sheet(file, data_sheet, database.load_plan(table_name))
+            chunks, converted = (df[i:i + chunksize] for i in range(0, len(df), chunksize)), True
+
+        start = time.perf_counter()
+        for chunk in chunks:
+            timings = [(name, "read", time.perf_counter() - start)]
+            raw_q.put(("chunk", table_name, n_chunks, (chunk, converted), timings))
+            n_chunks += 1
+            # time blocked on a full queue is not reading time
+            start = time.perf_counter()
+    except Exception:
+        raw_q.put(("error", table_name, n_chunks, traceback.format_exc(), []))
+        return
+    raw_q.put(("eof", table_name, n_chunks, None, []))
+
+
+def _converter(raw_q, out_q):
+    """Convert and fingerprint raw chunks until a None sentinel arrives."""
+    name = f"converter-{os.getpid()}"
+    plans = {}
+    while True:
+        msg = raw_q.get()
+        if msg is None:
+            return
+        kind, table_name, seq, payload, timings = msg
+        if kind != "chunk":
+            out_q.put(msg)
+            continue
+        try:
+            chunk, converted = payload
+            if table_name not in plans:
+                plans[table_name] = database.load_plan(table_name)
+            plan = plans[table_name]
+
+            start = time.perf_counter()
+            if not converted:
+                chunk = database.apply_schema(chunk, plan).dropna(how="all")
+            chunk = database.encode_lists(chunk, plan).drop_duplicates()
+            timings.append((name, "convert", time.perf_counter() - start))
+
+            start = time.perf_counter()
+            chunk = database.fingerprint_rows(chunk, database.natural_keys[table_name])
+            timings.append((name, "fingerprint", time.perf_counter() - start))
+
+            out_q.put(("chunk", table_name, seq, chunk, timings))
+        except Exception:
+            out_q.put(("error", table_name, seq, traceback.format_exc(), timings))
+
+
+def print_timings(timings, wall):
+    stages = defaultdict(lambda: [0, 0.0])
+    for worker, stage, seconds in timings:
+        stages[(worker, stage)][0] += 1
+        stages[(worker, stage)][1] += seconds
+
+    print(f"\n⏱️ Stage timings per worker (wall {wall:.2f} s)")
+    print(f"{'worker':<22}{'stage':<14}{'chunks':>8}{'seconds':>10}")
+    for (worker, stage), (count, seconds) in sorted(stages.items()):
+        print(f"{worker:<22}{stage:<14}{count:>8}{seconds:>10.2f}")
+
+
+def build_database_parallel(workers=None, streaming=False, chunksize=database.CHUNK_SIZE,
+                            db_path=database.sqlite_db, incremental=False, batch_size=BATCH_SIZE):
+    workers = workers or os.cpu_count()
+    writer_class = database.IncrementalWriter if incremental else database.ReplaceWriter
+
+    tables = []
+    for table_name, (file, data_sheet, _) in database.sheets_to_process.items():
+        if not os.path.exists(file):
+            print(f"⚠️ {file} not found, skipping table `{table_name}`")
+            continue
+        print(f"🔄 Traitement de {data_sheet} -> table `{table_name}`")
+        tables.append(table_name)
+
+    raw_q = mp.Queue(maxsize=2 * workers)
+    out_q = mp.Queue(maxsize=2 * workers)
+    readers = [mp.Process(target=_reader, args=(t, streaming, chunksize, raw_q), daemon=True) for t in tables]
+    converters = [mp.Process(target=_converter, args=(raw_q, out_q), daemon=True) for _ in range(workers)]
+
+    start = time.perf_counter()
+    timings, summaries = [], {}
+    for p in readers + converters:
+        p.start()
+    try:
+        with BulkLoader(db_path, batch_size) as loader:
+            writers = {t: writer_class(loader, t, database.natural_keys[t]) for t in tables}
+            for writer in writers.values():
+                writer.begin()
+
+            # chunks that arrived before their predecessors, by table and seq
+            buffered, received, expected = defaultdict(dict), defaultdict(int), {}
+            pending = set(tables)
+            while pending:
+                kind, table_name, seq, payload, chunk_timings = out_q.get()
+                timings.extend(chunk_timings)
+                if kind == "error":
+                    raise RuntimeError(f"worker failed on `{table_name}` (chunk {seq}):\n{payload}")
+                if kind == "eof":
+                    expected[table_name] = seq
+                else:
+                    buffered[table_name][seq] = payload
+                    while received[table_name] in buffered[table_name]:
+                        t0 = time.perf_counter()
+                        writers[table_name].write(buffered[table_name].pop(received[table_name]))
+                        timings.append(("writer", "write", time.perf_counter() - t0))
+                        received[table_name] += 1
+
+                if received[table_name] == expected.get(table_name):
+                    t0 = time.perf_counter()
+                    summaries[table_name] = writers[table_name].end()
+                    timings.append(("writer", "finish", time.perf_counter() - t0))
+                    pending.discard(table_name)
+
+        for _ in converters:
+            raw_q.put(None)
+        for p in readers + converters:
+            p.join()
+    finally:
+        for p in readers + converters:
+            if p.is_alive():
+                p.terminate()
+
+    print_timings(timings, time.perf_counter() - start)
+    database.print_change_summary(summaries)
+    return summaries
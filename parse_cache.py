@@ -0,0 +1,182 @@
+"""
+Columnar cache of parsed and type-converted Excel sheets.
+
+Each sheet is stored once as a Parquet file under
+`.parse_cache/<workbook sha256>/<sheet>.parquet` and read back memory-mapped,
+so an unchanged workbook is never parsed by openpyxl twice.
+
+Invalidation: the key is the content hash of the workbook, a new Excel drop
+gets new files automatically. Eviction: only the KEEP_VERSIONS most recently
+used versions of each workbook are kept (see evict()).
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (parquet engine)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+CACHE_DIR = ".parse_cache"
+INDEX_FILE = "index.json"
+# versions of a workbook kept on disk, the current one included
+KEEP_VERSIONS = 2
+
+
+def _read_index(cache_dir):
+    path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # a broken index only costs a re-hash
+        return {}
+
+
+def _write_index(cache_dir, index):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = os.path.join(cache_dir, f"{INDEX_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, os.path.join(cache_dir, INDEX_FILE))
+
+
+def _slug(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+
+
+def workbook_hash(file, cache_dir=CACHE_DIR):
+    """
+    sha256 of the workbook. The digest is remembered with the file size and
+    mtime so an untouched workbook is not read at all.
+    """
+    path = os.path.abspath(file)
+    stat = os.stat(path)
+    index = _read_index(cache_dir)
+    entry = index.get(path, {})
+    if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["digest"]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+
+    entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, digest=digest)
+    entry.setdefault("versions", {})
+    index[path] = entry
+    _write_index(cache_dir, index)
+    return digest
+
+
+def _touch(cache_dir, file, digest):
+    index = _read_index(cache_dir)
+    entry = index.setdefault(os.path.abspath(file), {"versions": {}})
+    entry.setdefault("versions", {})[digest] = time.time()
+    _write_index(cache_dir, index)
+
+
+def cached_sheet(file, sheet_name, loader, variant="", cache_dir=CACHE_DIR):
+    """
+    Return the DataFrame of `sheet_name`, from the cache when the workbook is
+    unchanged, otherwise from `loader()` which is then cached.
+
+    `variant` separates several conversions of the same sheet (e.g. a hash of
+    the conversion plan).
+    """
+    if not HAS_PYARROW:
+        print("⚠️ pyarrow is not installed, the parse cache is disabled")
+        return loader()
+
+    digest = workbook_hash(file, cache_dir)
+    name = _slug(sheet_name) + (f"-{variant}" if variant else "")
+    path = os.path.join(cache_dir, digest[:16], f"{name}.parquet")
+
+    if os.path.exists(path):
+        df = pd.read_parquet(path, memory_map=True)
+        _touch(cache_dir, file, digest)
+        return df
+
+    df = loader()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write next to the target and rename, readers never see half a file
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+    _touch(cache_dir, file, digest)
+    evict(cache_dir=cache_dir)
+    return df
+
+
+def evict(keep_versions=KEEP_VERSIONS, max_age_days=None, cache_dir=CACHE_DIR):
+    """
+    Remove old workbook versions: everything but the `keep_versions` most
+    recently used versions of each workbook, and versions unused for more
+    than `max_age_days`. Returns the removed digests.
+    """
+    index = _read_index(cache_dir)
+    now = time.time()
+
+    removed = set()
+    for entry in index.values():
+        versions = entry.get("versions", {})
+        by_recency = sorted(versions, key=versions.get, reverse=True)
+        for i, digest in enumerate(by_recency):
+            too_old = max_age_days is not None and now - versions[digest] > max_age_days * 86400
+            if i >= keep_versions or too_old:
+                removed.add(digest)
+                del versions[digest]
+
+    # two workbooks can have the same content, keep what is still referenced
+    in_use = {d for entry in index.values() for d in entry.get("versions", {})}
+    for digest in removed - in_use:
+        shutil.rmtree(os.path.join(cache_dir, digest[:16]), ignore_errors=True)
+
+    if removed:
+        _write_index(cache_dir, index)
+    return removed - in_use
+
+
+def invalidate(file=None, cache_dir=CACHE_DIR):
+    """Drop the cached sheets of one workbook, or the whole cache."""
+    if file is None:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        return
+    index = _read_index(cache_dir)
+    entry = index.pop(os.path.abspath(file), None)
+    if entry is None:
+        return
+    in_use = {d for e in index.values() for d in e.get("versions", {})}
+    for digest in set(entry.get("versions", {})) - in_use:
+        shutil.rmtree(os.path.join(cache_dir, digest[:16]), ignore_errors=True)
+    _write_index(cache_dir, index)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the parsed sheet cache")
+    parser.add_argument("--keep", type=int, default=KEEP_VERSIONS,
+                        help="workbook versions to keep per file")
+    parser.add_argument("--max-age-days", type=float, default=None,
+                        help="also drop versions unused for this many days")
+    parser.add_argument("--clear", nargs="?", const="", default=None, metavar="WORKBOOK",
+                        help="drop the cache of a workbook, or everything without argument")
+    args = parser.parse_args()
+
+    if args.clear is not None:
+        invalidate(args.clear or None)
+        print("🗑️ cache cleared")
+    else:
+        removed = evict(args.keep, args.max_age_days)
+        print(f"🗑️ {len(removed)} old workbook version(s) removed")
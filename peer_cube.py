@@ -0,0 +1,313 @@
+"""
+Precomputed peer-benchmarking cube of the startupticker deals.
+
+Every deal becomes a fact with four dimensions and four metrics:
+
+    sector (industry of the company), canton, phase, year of the round
+    amount, valuation, days_between_rounds (since the previous round of the
+    company), age_at_funding (years since the company was founded)
+
+The cube holds, for every combination of dimension values and every rollup
+('*' = all values of a dimension, 16 grouping sets), the count, sum, min, max
+and a quantile sketch of each metric:
+
+    cube_facts       one row per live deal, its dimensions, metrics and hash
+    benchmark_cube   (sector, canton, phase, year, metric) -> n, sum, min, max, sketch
+
+The sketch is a log-bucket histogram (relative error ALPHA): percentiles and
+the rank of a value are read from one row, no scan of the deals. A refresh
+recomputes the facts, compares them with cube_facts and rebuilds only the
+cells a new, changed or deleted deal falls into.
+
+    python peer_cube.py --refresh
+    python peer_cube.py --rank amount 4.5 --sector biotech --canton vd --phase seed
+    python peer_cube.py --company "composite recycling sa"
+"""
+import argparse
+import itertools
+import json
+import math
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+import database
+
+DIMENSIONS = ["sector", "canton", "phase", "year"]
+METRICS = ["amount", "valuation", "days_between_rounds", "age_at_funding"]
+ALL = "*"  # rollup over every value of a dimension
+UNKNOWN = "-"
+ALPHA = 0.01  # relative accuracy of the quantiles
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+
+FACTS_SQL = f"""
+    SELECT d._key,
+           COALESCE(c.Industry, '{UNKNOWN}') AS sector,
+           COALESCE(d.Canton, '{UNKNOWN}') AS canton,
+           COALESCE(d.Phase, '{UNKNOWN}') AS phase,
+           COALESCE(substr(d."Date of the funding round", 1, 4), '{UNKNOWN}') AS year,
+           d.Amount AS amount,
+           d.Valuation AS valuation,
+           julianday(d."Date of the funding round") - julianday(LAG(d."Date of the funding round") OVER (
+               PARTITION BY d.Company ORDER BY d."Date of the funding round", d._key)) AS days_between_rounds,
+           CAST(substr(d."Date of the funding round", 1, 4) AS INTEGER) - c.Year AS age_at_funding
+    FROM startupticker_deals d
+    LEFT JOIN (
+        SELECT Title, MAX(Industry) AS Industry, MIN(Year) AS Year
+        FROM startupticker_companies WHERE _deleted_at IS NULL GROUP BY Title
+    ) c ON c.Title = d.Company
+    WHERE d._deleted_at IS NULL
+"""
+
+
+def bucket(values):
+    """Sketch bucket of each value: ceil(log_gamma(x)), NaN for 0 (zero bucket)."""
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    positive = values > 0
+    out[positive] = np.ceil(np.log(values[positive]) / math.log(GAMMA))
+    return out
+
+
+def bucket_value(index):
+    """Representative value of a bucket, within ALPHA of every value in it."""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+class Sketch:
+    """Counts per log bucket, `zero` for the values equal to 0 (no fact is negative)."""
+
+    def __init__(self, buckets, zero=0):
+        self.buckets = dict(sorted(buckets.items()))
+        self.zero = zero
+        self.n = zero + sum(self.buckets.values())
+
+    @classmethod
+    def loads(cls, text):
+        data = json.loads(text)
+        return cls({int(k): v for k, v in data["b"].items()}, data.get("z", 0))
+
+    def dumps(self):
+        return json.dumps({"b": {str(k): v for k, v in self.buckets.items()}, "z": self.zero},
+                          separators=(",", ":"))
+
+    def quantile(self, q):
+        if not self.n:
+            return None
+        rank = q * (self.n - 1)
+        if rank < self.zero:
+            return 0.0
+        seen = self.zero
+        for index, count in self.buckets.items():
+            seen += count
+            if seen > rank:
+                return bucket_value(index)
+        return bucket_value(index)
+
+    def rank(self, value):
+        """Share of the peers below `value` (ties count half), in [0, 1]."""
+        if not self.n:
+            return None
+        if value <= 0:
+            return self.zero / 2 / self.n
+        target = bucket([value])[0]
+        below = self.zero + sum(c for i, c in self.buckets.items() if i < target)
+        return (below + self.buckets.get(int(target), 0) / 2) / self.n
+
+
+def load_facts(conn):
+    facts = pd.read_sql(FACTS_SQL, conn)
+    facts["year"] = facts["year"].astype(str)
+    # a negative metric is bad data (e.g. a founding year after the round): dropped,
+    # it would otherwise land in the zero bucket of the sketch and read as 0
+    metrics = facts[METRICS].astype(float)
+    facts[METRICS] = metrics.where(~(metrics < 0))
+    # detects a deal whose dimensions or metrics changed, e.g. a new earlier round of the company
+    facts["facts_hash"] = pd.util.hash_pandas_object(facts[DIMENSIONS + METRICS], index=False).astype(np.int64)
+    return facts
+
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cube_facts (
+            _key TEXT PRIMARY KEY,
+            sector TEXT, canton TEXT, phase TEXT, year TEXT,
+            amount REAL, valuation REAL, days_between_rounds REAL, age_at_funding REAL,
+            facts_hash INTEGER
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS benchmark_cube (
+            sector TEXT, canton TEXT, phase TEXT, year TEXT,
+            metric TEXT,
+            n INTEGER, sum REAL, min REAL, max REAL,
+            sketch TEXT,
+            PRIMARY KEY (sector, canton, phase, year, metric)
+        ) WITHOUT ROWID""")
+
+
+def grouping_sets():
+    """The 16 subsets of the dimensions that are kept (the others are rolled up to '*')."""
+    return [kept for r in range(len(DIMENSIONS) + 1) for kept in itertools.combinations(DIMENSIONS, r)]
+
+
+def rolled_up(facts, kept):
+    cells = facts.copy()
+    for dim in DIMENSIONS:
+        if dim not in kept:
+            cells[dim] = ALL
+    return cells
+
+
+def aggregate(cells):
+    """Cube rows (dims, metric, n, sum, min, max, sketch) of facts already rolled up."""
+    rows = []
+    for metric in METRICS:
+        values = cells[DIMENSIONS + [metric]].dropna()
+        if values.empty:
+            continue
+        stats = values.groupby(DIMENSIONS)[metric].agg(["count", "sum", "min", "max"])
+        values = values.assign(_bucket=bucket(values[metric]))
+        counts = values.groupby(DIMENSIONS + ["_bucket"], dropna=False).size()
+        sketches = {}
+        for (*dims, index), count in counts.items():
+            buckets, zero = sketches.setdefault(tuple(dims), ({}, [0]))
+            if np.isnan(index):
+                zero[0] += int(count)
+            else:
+                buckets[int(index)] = int(count)
+        for dims, row in stats.iterrows():
+            buckets, zero = sketches[dims]
+            rows.append((*dims, metric, int(row["count"]), row["sum"], row["min"], row["max"],
+                         Sketch(buckets, zero[0]).dumps()))
+    return rows
+
+
+def refresh(db_path=database.sqlite_db, full=False):
+    """
+    Bring the cube up to date with startupticker_deals.
+
+    Returns:
+        dict: changed facts, rebuilt cells, seconds
+    """
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    with conn:
+        create_tables(conn)
+    facts = load_facts(conn)
+    stored = pd.read_sql("SELECT * FROM cube_facts", conn)
+
+    if full or stored.empty:
+        changed_old, changed_new = stored, facts
+    else:
+        merged = facts[["_key", "facts_hash"]].merge(stored[["_key", "facts_hash"]], on="_key", how="outer",
+                                                     suffixes=("", "_old"), indicator=True)
+        keys = merged.loc[(merged["_merge"] != "both") | (merged["facts_hash"] != merged["facts_hash_old"]), "_key"]
+        changed_old = stored[stored["_key"].isin(keys)]
+        changed_new = facts[facts["_key"].isin(keys)]
+
+    n_cells = 0
+    with conn:
+        if full:
+            conn.execute("DELETE FROM benchmark_cube")
+        for kept in grouping_sets():
+            affected = pd.concat([rolled_up(changed_old, kept), rolled_up(changed_new, kept)])[DIMENSIONS]
+            affected = affected.drop_duplicates()
+            if affected.empty:
+                continue
+            conn.executemany(
+                "DELETE FROM benchmark_cube WHERE sector = ? AND canton = ? AND phase = ? AND year = ?",
+                affected.itertuples(index=False, name=None))
+            cells = rolled_up(facts, kept).merge(affected, on=DIMENSIONS)
+            rows = aggregate(cells)
+            conn.executemany("INSERT INTO benchmark_cube VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            n_cells += len(affected)
+        conn.executemany("DELETE FROM cube_facts WHERE _key = ?", [(k,) for k in changed_old["_key"]])
+        conn.executemany(
+            f"INSERT INTO cube_facts VALUES ({', '.join('?' * 10)})",
+            changed_new[["_key"] + DIMENSIONS + METRICS + ["facts_hash"]].astype(object)
+            .where(changed_new.notna(), None).itertuples(index=False, name=None))
+    conn.close()
+
+    summary = {"facts": len(set(changed_old["_key"]) | set(changed_new["_key"])), "cells": n_cells,
+               "seconds": time.perf_counter() - start}
+    print(f"✅ Cube: {summary['facts']} deals changed, {summary['cells']} cells rebuilt "
+          f"in {summary['seconds']:.1f} s")
+    return summary
+
+
+def cell(conn, metric, sector=ALL, canton=ALL, phase=ALL, year=ALL):
+    """(n, sum, min, max, Sketch) of a peer group, None when it is empty."""
+    row = conn.execute(
+        "SELECT n, sum, min, max, sketch FROM benchmark_cube "
+        "WHERE sector = ? AND canton = ? AND phase = ? AND year = ? AND metric = ?",
+        (sector, canton, phase, str(year), metric)).fetchone()
+    return (*row[:4], Sketch.loads(row[4])) if row else None
+
+
+def peer_stats(conn, metric, **group):
+    found = cell(conn, metric, **group)
+    if found is None:
+        return None
+    n, total, lo, hi, sketch = found
+    return {"n": n, "mean": total / n, "min": lo, "p25": sketch.quantile(0.25), "p50": sketch.quantile(0.5),
+            "p75": sketch.quantile(0.75), "p90": sketch.quantile(0.9), "max": hi}
+
+
+def rank(conn, metric, value, **group):
+    """Percentile (0-100) of `value` among the peers, a single lookup."""
+    found = cell(conn, metric, **group)
+    return None if found is None else 100 * found[4].rank(value)
+
+
+def rank_company(conn, company, dimensions=("sector", "canton", "phase")):
+    """Metrics of the last round of a company, ranked against the deals sharing its dimensions."""
+    fact = conn.execute(
+        f"SELECT {', '.join('f.' + c for c in DIMENSIONS + METRICS)} FROM cube_facts f "
+        "JOIN startupticker_deals d ON d._key = f._key WHERE d.Company = ? "
+        'ORDER BY d."Date of the funding round" DESC LIMIT 1', (company,)).fetchone()
+    if fact is None:
+        return None
+    dims = dict(zip(DIMENSIONS, fact[:len(DIMENSIONS)]))
+    group = {dim: dims[dim] for dim in dimensions}
+    ranks = {metric: (value, rank(conn, metric, value, **group))
+             for metric, value in zip(METRICS, fact[len(DIMENSIONS):]) if value is not None}
+    return group, ranks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peer-benchmarking cube of the deals")
+    parser.add_argument("--db", default=database.sqlite_db)
+    parser.add_argument("--refresh", action="store_true", help="rebuild the cells of new/changed/deleted deals")
+    parser.add_argument("--full", action="store_true", help="rebuild every cell")
+    parser.add_argument("--rank", nargs=2, metavar=("METRIC", "VALUE"))
+    parser.add_argument("--stats", metavar="METRIC", choices=METRICS)
+    parser.add_argument("--company", help="rank the last round of a company against its peers")
+    for dim in DIMENSIONS:
+        parser.add_argument(f"--{dim}", default=ALL)
+    args = parser.parse_args()
+
+    if args.refresh or args.full:
+        refresh(args.db, args.full)
+    conn = sqlite3.connect(args.db)
+    group = {dim: getattr(args, dim) for dim in DIMENSIONS}
+    start = time.perf_counter()
+    if args.rank:
+        metric, value = args.rank
+        result = rank(conn, metric, float(value), **group)
+        print(f"{metric} {value}: " + ("no peers" if result is None else f"percentile {result:.0f} of {group}"))
+    if args.stats:
+        print(f"{args.stats} {group}: {peer_stats(conn, args.stats, **group)}")
+    if args.company:
+        result = rank_company(conn, args.company)
+        if result is None:
+            print(f"⚠️ No deal of {args.company}")
+        else:
+            peers, ranks = result
+            print(f"{args.company}, peers {peers}:")
+            for metric, (value, pct) in ranks.items():
+                print(f"  {metric:<20}{value:>10.2f}  " + ("no peers" if pct is None else f"percentile {pct:.0f}"))
+    if args.rank or args.stats or args.company:
+        print(f"🔎 {(time.perf_counter() - start) * 1000:.1f} ms")
+    conn.close()
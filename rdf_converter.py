@@ -1,72 +1,645 @@
+import argparse
+import multiprocessing as mp
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from urllib.parse import quote
+
 import pandas as pd
-from rdflib import Graph, URIRef, Literal, Namespace
+from rdflib import Graph, Namespace
 from rdflib.namespace import RDF, XSD
 
-def convert_to_rdf():
-    # Load cleaned dataset
-    df = pd.read_excel("Data-startupticker.xlsx")
-    df.replace("", None, inplace=True)
-
-    # Namespaces
-    EX = Namespace("http://example.org/ontology#")
-    RES = Namespace("http://example.org/resource/")
-    g = Graph()
-    g.bind("ex", EX)
-
-    for idx, row in df.iterrows():
-        # Startup URI
-        startup_uri = URIRef(RES + f"Startup_{idx}")
-        g.add((startup_uri, RDF.type, EX.Startup))
-
-        if pd.notnull(row.get("name")):
-            g.add((startup_uri, EX.name, Literal(row["name"])))
-
-        if pd.notnull(row.get("foun_date")):
-            g.add((startup_uri, EX.foun_date, Literal(str(row["foun_date"]), datatype=XSD.date)))
-
-        if pd.notnull(row.get("hghights")):
-            g.add((startup_uri, EX.hghights, Literal(row["hghights"])))
-
-        if pd.notnull(row.get("industry")):
-            industry_uri = URIRef(RES + f"{row['industry'].replace(' ', '_')}")
-            g.add((industry_uri, RDF.type, EX.Industry))
-            g.add((startup_uri, EX.hasIndustry, industry_uri))
-
-        # Location
-        if pd.notnull(row.get("canton")):
-            canton_uri = URIRef(RES + f"Canton_{row['canton'].replace(' ', '_')}")
-            g.add((canton_uri, RDF.type, EX.Canton))
-            g.add((startup_uri, EX.hasLocation, canton_uri))
-            g.add((canton_uri, EX.name, Literal(row['canton'])))
-
-        if pd.notnull(row.get("city")):
-            city_uri = URIRef(RES + f"City_{row['city'].replace(' ', '_')}")
-            g.add((city_uri, RDF.type, EX.City))
-            g.add((canton_uri, EX.hasCity, city_uri))
-            g.add((city_uri, EX.name, Literal(row['city'])))
-
-        # FundingEvent
-        if any(pd.notnull(row.get(col)) for col in ["Phase", "type", "amount", "valuation", "round_date", "investor"]):
-            fund_uri = URIRef(RES + f"FundingEvent_{idx}")
-            g.add((fund_uri, RDF.type, EX.FundingEvent))
-            g.add((fund_uri, EX.belongsTo, startup_uri))
-
-            if pd.notnull(row.get("Phase")):
-                g.add((fund_uri, EX.Phase, Literal(row["Phase"])))
-            if pd.notnull(row.get("type")):
-                g.add((fund_uri, EX.type, Literal(row["type"])))
-            if pd.notnull(row.get("amount")):
-                g.add((fund_uri, EX.amount, Literal(float(row["amount"]), datatype=XSD.decimal)))
-            if pd.notnull(row.get("valuation")):
-                g.add((fund_uri, EX.valuation, Literal(float(row["valuation"]), datatype=XSD.decimal)))
-            if pd.notnull(row.get("round_date")):
-                g.add((fund_uri, EX.round_date, Literal(str(row["round_date"]), datatype=XSD.date)))
-            if pd.notnull(row.get("investor")):
-                g.add((fund_uri, EX.investor, Literal(row["investor"])))
-
-    # Serialize the graph
-    g.serialize("startups_graph.ttl", format="turtle")
-    print("RDF conversion complete. Output saved to startups_graph.ttl")
+import database
+import db_schema
+import triple_store
+from database import (CHUNK_SIZE, encode_lists, fingerprint_rows, iter_converted_frames, load_plan,
+                      load_table_frame, natural_keys)
+
+# Namespaces
+EX = Namespace("http://example.org/ontology#")
+RES = Namespace("http://example.org/resource/")
+# loaded into the store after the graph by every full load (see ontology.py)
+STORE_EXTRAS = [triple_store.ONTOLOGY_NT]
+
+# How the rows of each source become triples:
+#   prefix    URI of a row: RES + prefix + business key
+#   class     rdf:type of a row
+#   literals  column -> (predicate, datatype), list columns give one triple per item
+#   nodes     column -> (predicate, class) of a shared node (RES + class + "_" + value)
+#   links     column -> (predicate, target source, target column): the value is
+#             resolved to the key of the target row, None when it already is the key
+MAPPINGS = {
+    "startupticker_companies": {
+        "prefix": "Startup_",
+        "class": "Startup",
+        "literals": {
+            "Title": ("name", None),
+            "Code": ("code", None),
+            "Year": ("foundingYear", XSD.gYear),
+            "Highlights": ("highlight", None),
+            "Spin-offs": ("spinOffOf", None),
+            "Gender CEO": ("genderCEO", None),
+            "OOB": ("outOfBusiness", XSD.boolean),
+            "Funded": ("funded", XSD.boolean),
+            "Comment": ("comment", None),
+        },
+        "nodes": {
+            "Industry": ("hasIndustry", "Industry"),
+            "Vertical": ("hasVertical", "Vertical"),
+            "Canton": ("hasLocation", "Canton"),
+            "City": ("hasCity", "City"),
+        },
+        "links": {},
+    },
+    "startupticker_deals": {
+        "prefix": "FundingEvent_",
+        "class": "FundingEvent",
+        "literals": {
+            "Id": ("dealId", None),
+            "Phase": ("Phase", None),
+            "Type": ("type", None),
+            "Amount": ("amount", XSD.decimal),
+            "Valuation": ("valuation", XSD.decimal),
+            "Date of the funding round": ("round_date", XSD.date),
+            "Investors": ("investor", None),
+            "Confidential": ("confidential", XSD.boolean),
+            "Amount confidential": ("amountConfidential", XSD.boolean),
+            "Gender CEO": ("genderCEO", None),
+            "URL": ("url", None),
+            "Comment": ("comment", None),
+        },
+        "nodes": {
+            "Canton": ("hasLocation", "Canton"),
+            # the nodes of the "stage" and "deal_type" trees of ontology.py
+            "Phase": ("hasStage", "Stage"),
+            "Type": ("hasDealType", "DealType"),
+        },
+        "links": {
+            "Company": ("belongsTo", "startupticker_companies", "Title"),
+        },
+    },
+    "crunchbase_organizations": {
+        "prefix": "CrunchbaseOrganization_",
+        "class": "Organization",
+        "literals": {
+            "name": ("name", None),
+            "legal_name": ("legalName", None),
+            "domain": ("domain", None),
+            "homepage_url": ("homepage", None),
+            "status": ("status", None),
+            "short_description": ("description", None),
+            "category_list": ("categories", None),
+            "num_funding_rounds": ("fundingRounds", XSD.integer),
+            "total_funding_usd": ("totalFundingUsd", XSD.decimal),
+            "founded_on": ("foundedOn", XSD.date),
+            "closed_on": ("closedOn", XSD.date),
+            "employee_count": ("employeeCount", None),
+        },
+        "nodes": {
+            "city": ("hasCity", "City"),
+        },
+        "links": {},
+    },
+    "crunchbase_funding_rounds": {
+        "prefix": "CrunchbaseRound_",
+        "class": "FundingEvent",
+        "literals": {
+            "name": ("name", None),
+            "investment_type": ("type", None),
+            "announced_on": ("round_date", XSD.date),
+            "raised_amount_usd": ("amount", XSD.decimal),
+            "post_money_valuation_usd": ("valuation", XSD.decimal),
+            "investor_count": ("investorCount", XSD.integer),
+        },
+        "nodes": {},
+        "links": {
+            "org_uuid": ("belongsTo", "crunchbase_organizations", None),
+        },
+    },
+    # links found by entity_resolution.py, read from startups_clean.db
+    "company_links": {
+        "prefix": "Startup_",
+        "class": None,
+        "literals": {},
+        "nodes": {},
+        "links": {
+            "crunchbase_key": ("sameAs", "crunchbase_organizations", None),
+        },
+    },
+}
+
+# the city of a row hangs off its canton: (parent node, predicate, child node)
+NODE_HIERARCHY = [("Canton", "hasCity", "City")]
+
+
+# ---------------------------------------------------------------------------
+# Triples are built column by column on chunks of rows, as N-Triples lines;
+# the graph is never held in memory.
+# ---------------------------------------------------------------------------
+
+# characters that are not allowed in an IRI (or would start an escape or a
+# fragment), percent-encoded
+IRI_UNSAFE = r'[\x00-\x20\x7f-\x9f\s<>"{}|^`\\%#]'
+
+
+def nt_uri(uri):
+    return f"<{uri}>"
+
+
+def nt_uris(base, values):
+    """Vectorized URIs, e.g. base + 'Canton_' + 'Basel Stadt' -> <...Canton_Basel_Stadt>."""
+    local = (values.astype("string").str.replace(" ", "_", regex=False)
+             .str.replace(IRI_UNSAFE, lambda m: quote(m.group()), regex=True))
+    return "<" + str(base) + local + ">"
+
+
+def key_uris(base, keys):
+    """URIs minted from business keys, e.g. <...Startup_che-384.775.108>."""
+    local = keys.astype("string").str.replace(IRI_UNSAFE, lambda m: quote(m.group()), regex=True)
+    return "<" + str(base) + local + ">"
+
+
+def nt_literals(values, datatype=None):
+    """Vectorized N-Triples literals, with the escapes required by the grammar."""
+    if datatype == XSD.date:
+        text = pd.to_datetime(values).dt.strftime("%Y-%m-%d")
+    elif datatype == XSD.decimal:
+        text = values.astype(float).map(repr)
+    elif datatype in (XSD.integer, XSD.gYear):
+        text = values.astype("int64").astype(str)
+    elif datatype == XSD.boolean:
+        text = values.astype(bool).map({True: "true", False: "false"})
+    else:
+        text = values.astype(str)
+    text = (text.astype("string").str.replace("\\", "\\\\", regex=False)
+                .str.replace('"', '\\"', regex=False)
+                .str.replace("\n", "\\n", regex=False)
+                .str.replace("\r", "\\r", regex=False))
+    suffix = f"^^<{datatype}>" if datatype is not None else ""
+    return '"' + text + '"' + suffix
+
+
+def nt_lines(subjects, predicate, objects):
+    return subjects + f" {nt_uri(predicate)} " + objects + " ."
+
+
+class NodeInterner:
+    """
+    Remembers the shared nodes (cantons, cities, industries...) already
+    written, so their own triples are written once. Memory grows with the
+    number of distinct values, not with the number of rows.
+    """
+
+    def __init__(self, seen=()):
+        self.seen = set(seen)
+        # (kind, value) interned since the last flush, see ExportState
+        self.added = []
+
+    def new(self, kind, values):
+        """The values of `values` not seen yet for `kind`, marked as seen."""
+        fresh = [v for v in pd.unique(values.dropna()) if (kind, v) not in self.seen]
+        self.seen.update((kind, v) for v in fresh)
+        self.added.extend((kind, v) for v in fresh)
+        return pd.Series(fresh, dtype=object)
+
+
+def _column(chunk, col):
+    return chunk[col] if col in chunk.columns else pd.Series(index=chunk.index, dtype=object)
+
+
+def resolve_links(table_name, chunk, lookups):
+    """
+    Add a `_link_<column>` column with the key of the target row of each
+    link, and fold the targets into `_row_hash`: a row whose target changed
+    key is exported again.
+    """
+    links = MAPPINGS[table_name]["links"]
+    if not links:
+        return chunk
+    resolved = {}
+    for col, (_, target, via) in links.items():
+        values = _column(chunk, col).astype("string")
+        if via is None:
+            resolved[f"_link_{col}"] = values
+        else:
+            # e.g. the company of a deal is a title; a company without a UID is
+            # keyed by its title as well, see database.natural_keys
+            lookup = lookups.get((target, via), {})
+            resolved[f"_link_{col}"] = values.map(lookup).fillna(f"{via}:" + values)
+    resolved = pd.DataFrame(resolved, index=chunk.index)
+    targets = pd.util.hash_pandas_object(resolved.fillna(""), index=False).map("{:016x}".format)
+    return chunk.assign(**resolved, _row_hash=chunk["_row_hash"] + targets)
+
+
+def update_lookups(lookups, table_name, chunk):
+    """Remember value -> key of the columns other sources link through."""
+    for mapping in MAPPINGS.values():
+        for _, target, via in mapping["links"].values():
+            if target == table_name and via is not None and via in chunk.columns:
+                values = chunk[via].dropna()
+                lookups.setdefault((target, via), {}).update(zip(values, chunk.loc[values.index, "_key"]))
+
+
+def keyed(table_name, chunk, plan):
+    """`chunk` with the `_key` and `_row_hash` of database.fingerprint_rows(), lists kept as lists."""
+    # encode_lists() works in place, the triples need the lists
+    fingerprints = fingerprint_rows(encode_lists(chunk.copy(), plan), natural_keys[table_name])
+    return chunk.loc[fingerprints.index].assign(
+        _key=fingerprints["_key"], _row_hash=fingerprints["_row_hash"]).reset_index(drop=True)
+
+
+def company_link_frame(db_path=database.sqlite_db):
+    """Links of entity_resolution.py, keyed by the Startupticker company."""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        if not db_schema.table_exists(conn, "company_links"):
+            return None
+        df = pd.read_sql("SELECT startupticker_key, crunchbase_key FROM company_links", conn)
+    finally:
+        conn.close()
+    return df.assign(
+        _key=df["startupticker_key"],
+        _row_hash=pd.util.hash_pandas_object(df, index=False).map("{:016x}".format))
+
+
+def iter_source(table_name, chunksize=CHUNK_SIZE, streaming=True):
+    """
+    Keyed chunks of one source. Sheets are read chunk by chunk from the
+    workbook in streaming mode, otherwise from the parse cache.
+    """
+    if table_name == "company_links":
+        df = company_link_frame()
+        if df is not None:
+            for start in range(0, len(df), chunksize):
+                yield df[start:start + chunksize].reset_index(drop=True)
+        return
+
+    file, _, _ = database.sheets_to_process[table_name]
+    if not os.path.exists(file):
+        print(f"⚠️ {file} not found, skipping `{table_name}`")
+        return
+    plan = load_plan(table_name)
+    if streaming:
+        chunks = iter_converted_frames(table_name, chunksize, plan)
+    else:
+        df = load_table_frame(table_name)
+        chunks = (df[start:start + chunksize] for start in range(0, len(df), chunksize))
+    for chunk in chunks:
+        yield keyed(table_name, chunk, plan)
+
+
+def table_triples(table_name, chunk, interner):
+    """
+    N-Triples lines of a chunk of keyed (and link-resolved) rows, as a frame
+    of (_key, line). The triples of shared nodes have an empty `_key`.
+    """
+    mapping = MAPPINGS[table_name]
+    chunk = chunk.reset_index(drop=True)
+    subjects = key_uris(RES + mapping["prefix"], chunk["_key"])
+    rows, shared = [], []
+
+    if mapping["class"]:
+        rows.append(nt_lines(subjects, RDF.type, nt_uri(EX[mapping["class"]])))
+
+    for col, (predicate, datatype) in mapping["literals"].items():
+        values = _column(chunk, col).dropna()
+        if values.dtype == object:
+            # list columns: one triple per item
+            values = values.explode().dropna()
+        rows.append(nt_lines(subjects[values.index], EX[predicate], nt_literals(values, datatype)))
+
+    for col, (predicate, kind) in mapping["nodes"].items():
+        values = _column(chunk, col).dropna()
+        rows.append(nt_lines(subjects[values.index], EX[predicate], nt_uris(RES + f"{kind}_", values)))
+        new = interner.new(kind, values)
+        nodes = nt_uris(RES + f"{kind}_", new)
+        shared.append(nt_lines(nodes, RDF.type, nt_uri(EX[kind])))
+        shared.append(nt_lines(nodes, EX.name, nt_literals(new)))
+
+    kinds = {kind: col for col, (_, kind) in mapping["nodes"].items()}
+    for parent, predicate, child in NODE_HIERARCHY:
+        if parent not in kinds or child not in kinds:
+            continue
+        pairs = pd.DataFrame({"parent": _column(chunk, kinds[parent]), "child": _column(chunk, kinds[child])}).dropna()
+        new = interner.new(f"{parent}>{child}", pairs["parent"].astype(str) + "\x1f" + pairs["child"].astype(str))
+        if len(new):
+            pairs = new.str.split("\x1f", n=1, expand=True)
+            shared.append(nt_lines(nt_uris(RES + f"{parent}_", pairs[0]), EX[predicate],
+                                   nt_uris(RES + f"{child}_", pairs[1])))
+
+    for col, (predicate, target, _) in mapping["links"].items():
+        values = _column(chunk, f"_link_{col}").dropna()
+        rows.append(nt_lines(subjects[values.index], EX[predicate],
+                             key_uris(RES + MAPPINGS[target]["prefix"], values)))
+
+    rows = pd.concat(rows).astype(object) if rows else pd.Series(dtype=object)
+    shared = pd.concat(shared, ignore_index=True).astype(object) if shared else pd.Series(dtype=object)
+    return pd.DataFrame({
+        "_key": pd.concat([chunk["_key"].loc[rows.index], pd.Series("", index=shared.index)], ignore_index=True),
+        "line": pd.concat([rows, shared], ignore_index=True),
+    })
+
+
+def _write_lines(f, lines):
+    if len(lines):
+        f.write("\n".join(lines))
+        f.write("\n")
+
+
+def convert_to_rdf_streaming(output="startups_graph.nt", chunksize=CHUNK_SIZE, store=None):
+    """
+    Convert every source to N-Triples chunk by chunk, in one process and
+    constant memory. N-Triples is a subset of Turtle, every Turtle parser
+    reads the file. With `store`, the file is then bulk-loaded into the
+    persistent triple store at that path (see triple_store.py).
+    """
+    interner = NodeInterner()
+    lookups = {}
+    n_rows = n_triples = 0
+    tmp = f"{output}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for table_name in MAPPINGS:
+            for chunk in iter_source(table_name, chunksize):
+                update_lookups(lookups, table_name, chunk)
+                triples = table_triples(table_name, resolve_links(table_name, chunk, lookups), interner)
+                _write_lines(f, triples["line"])
+                n_rows += len(chunk)
+                n_triples += len(triples)
+    os.replace(tmp, output)
+    print(f"RDF conversion complete. {n_triples} triples for {n_rows} rows saved to {output}")
+    if store:
+        triple_store.load_store(output, store, extra_sources=STORE_EXTRAS)
+    return n_triples
+
+
+# ---------------------------------------------------------------------------
+# Parallel conversion: the rows of every source are split in shards, each
+# worker process converts one shard into its own N-Triples file and the
+# parent merges the files, writing the shared nodes once.
+# ---------------------------------------------------------------------------
+
+_worker_lookups = {}
+_worker_frames = {}
+
+
+def _init_worker(lookups):
+    _worker_lookups.update(lookups)
+
+
+def _source_frame(table_name):
+    """Whole keyed source, once per worker process (memory-mapped from the parse cache)."""
+    if table_name not in _worker_frames:
+        chunks = list(iter_source(table_name, chunksize=1 << 62, streaming=False))
+        _worker_frames[table_name] = chunks[0] if chunks else pd.DataFrame()
+    return _worker_frames[table_name]
+
+
+def _convert_shard(task):
+    table_name, start, stop, path = task
+    t0 = time.perf_counter()
+    chunk = resolve_links(table_name, _source_frame(table_name)[start:stop], _worker_lookups)
+    triples = table_triples(table_name, chunk, NodeInterner())
+    is_shared = triples["_key"] == ""
+    with open(path, "w", encoding="utf-8") as f:
+        _write_lines(f, triples.loc[~is_shared, "line"])
+    with open(f"{path}.shared", "w", encoding="utf-8") as f:
+        _write_lines(f, triples.loc[is_shared, "line"])
+    return table_name, len(chunk), int((~is_shared).sum()), time.perf_counter() - t0
+
+
+def merge_shards(paths, output):
+    """Concatenate the shard files into `output`, each shared node triple once."""
+    shared = {}
+    for path in paths:
+        with open(f"{path}.shared", encoding="utf-8") as f:
+            shared.update(dict.fromkeys(f.read().splitlines()))
+    tmp = f"{output}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as out:
+        _write_lines(out, list(shared))
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                shutil.copyfileobj(f, out)
+    os.replace(tmp, output)
+    return len(shared)
+
+
+def convert_to_rdf_parallel(output="startups_graph.nt", workers=None, shard_size=CHUNK_SIZE, store=None):
+    """
+    Convert every source to N-Triples with `workers` processes. Sheets are
+    read once through the parse cache, workers memory-map them.
+    """
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+
+    # the keys other sources link to, and the shards of every source
+    lookups, tasks = {}, []
+    tmp_dir = tempfile.mkdtemp(prefix="rdf_shards_", dir=os.path.dirname(os.path.abspath(output)))
+    for table_name in MAPPINGS:
+        df = _source_frame(table_name)
+        if df.empty:
+            continue
+        update_lookups(lookups, table_name, df)
+        for i, first in enumerate(range(0, len(df), shard_size)):
+            tasks.append((table_name, first, first + shard_size, os.path.join(tmp_dir, f"{table_name}-{i:05d}.nt")))
+
+    try:
+        stats = {}
+        with mp.Pool(workers, initializer=_init_worker, initargs=(lookups,)) as pool:
+            for table_name, n_rows, n_triples, seconds in pool.imap_unordered(_convert_shard, tasks):
+                s = stats.setdefault(table_name, [0, 0, 0.0])
+                s[0] += n_rows
+                s[1] += n_triples
+                s[2] += seconds
+        n_shared = merge_shards([path for *_, path in tasks], output)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for table_name, (n_rows, n_triples, seconds) in stats.items():
+        print(f"  {table_name:<28}{n_rows:>9} rows{n_triples:>11} triples{seconds:>8.1f} s cpu")
+    print(f"RDF conversion complete. {len(tasks)} shards on {workers} workers, "
+          f"{n_shared} shared node triples, saved to {output} in {time.perf_counter() - start:.1f} s")
+    if store:
+        triple_store.load_store(output, store, extra_sources=STORE_EXTRAS)
+    return stats
+
+
+def convert_to_rdf(output="startups_graph.ttl", workers=None):
+    """Convert every source and serialize the graph as Turtle (loads the graph in memory)."""
+    nt_path = f"{output}.{os.getpid()}.nt"
+    try:
+        convert_to_rdf_parallel(nt_path, workers)
+        g = Graph()
+        g.bind("ex", EX)
+        g.bind("res", RES)
+        g.parse(nt_path, format="nt")
+    finally:
+        if os.path.exists(nt_path):
+            os.remove(nt_path)
+    g.serialize(output, format="turtle")
+    print(f"RDF conversion complete. Output saved to {output}")
+
+
+# ---------------------------------------------------------------------------
+# Incremental export: the triples written for each business key are kept in
+# a small SQLite file, the next export only converts the rows whose hash
+# changed and writes the added and removed triples.
+# ---------------------------------------------------------------------------
+
+STATE_DB = "startups_graph.state.db"
+
+
+class ExportState:
+    """Row hashes, triples per key and interned nodes of the last export."""
+
+    def __init__(self, path=STATE_DB, full=False):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS rows (_key TEXT PRIMARY KEY, _row_hash TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS triples (_key TEXT, line TEXT)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_triples__key ON triples (_key)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS nodes (kind TEXT, value TEXT, PRIMARY KEY (kind, value))")
+        self.conn.execute("CREATE TEMP TABLE touched (_key TEXT PRIMARY KEY)")
+        if full:
+            for table in ("rows", "triples", "nodes"):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    def known_hashes(self):
+        return dict(self.conn.execute("SELECT _key, _row_hash FROM rows"))
+
+    def interner(self):
+        return NodeInterner(self.conn.execute("SELECT kind, value FROM nodes"))
+
+    def replace(self, keys, triples, hashes):
+        """Store the triples of `keys` (new or changed rows), return (added, removed) lines."""
+        self.conn.execute("DELETE FROM touched")
+        self.conn.executemany("INSERT OR IGNORE INTO touched VALUES (?)", ((k,) for k in keys))
+        old = pd.read_sql("SELECT _key, line FROM triples WHERE _key IN (SELECT _key FROM touched)", self.conn)
+        self.conn.execute("DELETE FROM triples WHERE _key IN (SELECT _key FROM touched)")
+        self.conn.executemany("INSERT INTO triples VALUES (?, ?)", zip(triples["_key"], triples["line"]))
+        self.conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?)", hashes)
+
+        # triples that stay the same for a key are not part of the delta
+        merged = triples.merge(old, on=["_key", "line"], how="outer", indicator=True)
+        return (merged.loc[merged["_merge"] == "left_only", "line"],
+                merged.loc[merged["_merge"] == "right_only", "line"])
+
+    def remove(self, keys):
+        """Forget the rows of `keys`, return their triples."""
+        self.conn.execute("DELETE FROM touched")
+        self.conn.executemany("INSERT INTO touched VALUES (?)", ((k,) for k in keys))
+        old = pd.read_sql("SELECT line FROM triples WHERE _key IN (SELECT _key FROM touched)", self.conn)
+        self.conn.execute("DELETE FROM triples WHERE _key IN (SELECT _key FROM touched)")
+        self.conn.execute("DELETE FROM rows WHERE _key IN (SELECT _key FROM touched)")
+        return old["line"]
+
+    def save_nodes(self, interner):
+        self.conn.executemany("INSERT OR IGNORE INTO nodes VALUES (?, ?)", interner.added)
+        interner.added = []
+
+    def dump(self, f):
+        for (line,) in self.conn.execute("SELECT line FROM triples ORDER BY rowid"):
+            f.write(line)
+            f.write("\n")
+
+    def commit(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def delta_paths(output):
+    stem = os.path.splitext(output)[0]
+    return f"{stem}.added.nt", f"{stem}.removed.nt"
+
+
+def export_rdf_incremental(output="startups_graph.nt", chunksize=CHUNK_SIZE, store=None,
+                           state_path=STATE_DB, full=False):
+    """
+    Convert only the rows that changed since the last export. The added and
+    removed triples are written next to `output` (startups_graph.added.nt /
+    .removed.nt) and applied to the triple store; `output` is rewritten from
+    the state without converting anything again.
+
+    Shared nodes (cantons, cities, industries) are only ever added.
+    """
+    start = time.perf_counter()
+    state = ExportState(state_path, full)
+    known = state.known_hashes()
+    interner = state.interner()
+    lookups = {}
+    added_path, removed_path = delta_paths(output)
+
+    seen = set()
+    n_changed = n_added = n_removed = 0
+    with open(added_path, "w", encoding="utf-8") as added_f, open(removed_path, "w", encoding="utf-8") as removed_f:
+        for table_name in MAPPINGS:
+            for chunk in iter_source(table_name, chunksize):
+                update_lookups(lookups, table_name, chunk)
+                chunk = resolve_links(table_name, chunk, lookups)
+                # the same key can exist in several sources
+                state_keys = table_name + ":" + chunk["_key"]
+                seen.update(state_keys)
+                changed = (chunk["_row_hash"] != state_keys.map(known)).to_numpy()
+                if not changed.any():
+                    continue
+                triples = table_triples(table_name, chunk[changed], interner)
+                triples["_key"] = (table_name + ":" + triples["_key"]).where(triples["_key"] != "", "")
+                added, removed = state.replace(
+                    state_keys[changed], triples, zip(state_keys[changed], chunk.loc[changed, "_row_hash"]))
+                state.save_nodes(interner)
+                _write_lines(added_f, added)
+                _write_lines(removed_f, removed)
+                n_changed += int(changed.sum())
+                n_added += len(added)
+                n_removed += len(removed)
+
+        gone = [k for k in known if k not in seen]
+        removed = state.remove(gone)
+        _write_lines(removed_f, removed)
+        n_removed += len(removed)
+
+    tmp = f"{output}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        state.dump(f)
+    state.commit()
+    os.replace(tmp, output)
+
+    if store:
+        if os.path.isdir(store) and not full:
+            triple_store.apply_delta(added_path, removed_path, store)
+        else:
+            triple_store.load_store(output, store, extra_sources=STORE_EXTRAS)
+
+    print(f"RDF export: {n_changed} rows changed, {len(gone)} removed -> "
+          f"+{n_added} / -{n_removed} triples in {time.perf_counter() - start:.1f} s "
+          f"({added_path}, {removed_path})")
+    return n_added, n_removed
+
 
 if __name__ == "__main__":
-    convert_to_rdf() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convert Startupticker and Crunchbase data to RDF")
+    parser.add_argument("--stream", action="store_true",
+                        help="write N-Triples chunk by chunk in one process and constant memory")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="write N-Triples with this many processes (default: all cores)")
+    parser.add_argument("--output", default=None, help="output file (startups_graph.ttl, or .nt for N-Triples)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE, help="rows per chunk or shard")
+    parser.add_argument("--store", nargs="?", const=triple_store.STORE_DIR, default=None,
+                        help="also load the triples into the persistent triple store")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only convert the rows changed since the last export and write the delta")
+    parser.add_argument("--full", action="store_true", help="with --incremental, forget the last export")
+    args = parser.parse_args()
+
+    nt_output = args.output or "startups_graph.nt"
+    if args.incremental:
+        export_rdf_incremental(nt_output, args.chunksize, args.store, full=args.full)
+    elif args.stream:
+        convert_to_rdf_streaming(nt_output, args.chunksize, args.store)
+    elif args.workers or args.store:
+        convert_to_rdf_parallel(nt_output, args.workers, args.chunksize, args.store)
+    else:
+        convert_to_rdf(args.output or "startups_graph.ttl")
@@ -0,0 +1,132 @@
+"""
+Per-phase timings and fallback counters of the SOGC scraper.
+
+download_sogc_data() goes through fixed phases (driver_start, page_load,
+uid_search, result_wait, pdf_button, pdf_dialog, download_wait) and many
+fallback paths (selectors, JavaScript clicks, WebDriver actions). With a
+MetricsLog, every UID appends JSONL records:
+
+    {"uid": ..., "engine": "browser", "kind": "span", "phase": "page_load", "seconds": 1.92, "at": ...}
+    {"uid": ..., "engine": "browser", "kind": "fallback", "phase": "result_wait", "path": "search_button", ...}
+    {"uid": ..., "engine": "browser", "kind": "span", "phase": "total", "seconds": 9.41, "ok": true, ...}
+
+sogc_http.py records its search/export/write phases the same way. The report
+gives p50/p95 per phase and how often each fallback path fired:
+
+    python sogc_crawl.py --engine browser --metrics sogc_downloads/metrics.jsonl
+    python scraper_metrics.py sogc_downloads/metrics.jsonl
+"""
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+
+class MetricsLog:
+    """JSONL file shared by all the sessions of a pool."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        record["at"] = datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Trace:
+    """
+    Timeline of one UID. phase() closes the running phase and opens the next
+    one, so the scraper only marks where each phase begins. Without a log the
+    calls cost nothing but a clock read.
+    """
+
+    def __init__(self, log, uid, engine="browser"):
+        self.log = log
+        self.uid = uid
+        self.engine = engine
+        self.start = self.phase_start = time.perf_counter()
+        self.current = None
+
+    def _write(self, **record):
+        if self.log is not None:
+            self.log.write({"uid": self.uid, "engine": self.engine, **record})
+
+    def phase(self, name):
+        now = time.perf_counter()
+        if self.current is not None:
+            self._write(kind="span", phase=self.current, seconds=round(now - self.phase_start, 4))
+        self.current, self.phase_start = name, now
+
+    def fallback(self, path):
+        """A fallback path fired (selector, JavaScript click, retry, timeout...)."""
+        self._write(kind="fallback", phase=self.current, path=path)
+
+    def finish(self, ok):
+        self.phase(None)
+        self._write(kind="span", phase="total", seconds=round(time.perf_counter() - self.start, 4), ok=bool(ok))
+
+
+def load_records(path):
+    with open(path, encoding="utf-8") as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def phase_report(records):
+    """count, p50, p95, max and share of the total time per engine and phase."""
+    spans = records[records["kind"] == "span"]
+    report = spans.groupby(["engine", "phase"])["seconds"].agg(
+        count="count",
+        p50=lambda s: s.quantile(0.5),
+        p95=lambda s: s.quantile(0.95),
+        max="max",
+        total="sum",
+    ).reset_index()
+    engine_totals = report[report["phase"] == "total"].set_index("engine")["total"]
+    report["share"] = report["total"] / report["engine"].map(engine_totals)
+    return report.sort_values(["engine", "total"], ascending=[True, False], ignore_index=True)
+
+
+def fallback_report(records):
+    """How many UIDs went through each fallback path, per phase."""
+    if "path" not in records:
+        return pd.DataFrame(columns=["engine", "phase", "path", "uids", "fired"])
+    fallbacks = records[records["kind"] == "fallback"]
+    return (fallbacks.groupby(["engine", "phase", "path"], dropna=False)
+            .agg(uids=("uid", "nunique"), fired=("uid", "size"))
+            .reset_index()
+            .sort_values("fired", ascending=False))
+
+
+def print_report(records):
+    spans = records[(records["kind"] == "span") & (records["phase"] == "total")]
+    n_ok = int(spans["ok"].sum()) if "ok" in spans else 0
+    print(f"\n⏱️ {len(spans)} UIDs, {n_ok} downloaded")
+    print(f"{'engine':<9}{'phase':<16}{'count':>7}{'p50 s':>9}{'p95 s':>9}{'max s':>9}{'share':>8}")
+    for row in phase_report(records).itertuples(index=False):
+        print(f"{row.engine:<9}{row.phase:<16}{row.count:>7}{row.p50:>9.2f}{row.p95:>9.2f}{row.max:>9.2f}"
+              f"{row.share:>8.0%}")
+
+    fallbacks = fallback_report(records)
+    if not fallbacks.empty:
+        print(f"\n{'engine':<9}{'phase':<16}{'fallback path':<34}{'UIDs':>7}{'fired':>7}")
+        for row in fallbacks.itertuples(index=False):
+            phase = row.phase if isinstance(row.phase, str) else "-"
+            print(f"{row.engine:<9}{phase:<16}{row.path:<34}{row.uids:>7}{row.fired:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="p50/p95 per phase and fallback counts of the SOGC scraper")
+    parser.add_argument("metrics", help="JSONL file written with --metrics")
+    args = parser.parse_args()
+
+    print_report(load_records(args.metrics))
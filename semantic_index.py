@@ -0,0 +1,364 @@
+"""
+Semantic search over the company descriptions and deal comments.
+
+The texts of startups_clean.db are encoded in batches and stored under
+`semantic_index/`:
+
+    vectors.bin   N x dim matrix (float16 or float32), read memory-mapped
+    ids.tsv       table, _key and _row_hash of every row of the matrix
+    alive.u8      1 byte per row, 0 once the source row changed or was deleted
+    meta.json     encoder, dim, dtype, row count (written last, atomically)
+    ann.npz       optional approximate index (IVF: k-means lists)
+
+Vectors are L2-normalized, a query is one dot product over the matrix (in
+chunks, so the index never has to fit in memory). An update only encodes the
+new and changed rows: they are appended, the old versions are marked dead.
+With an approximate index, only the `nprobe` closest lists are scored, plus
+the rows appended after it was built.
+
+The encoder is pluggable: a sentence-transformers model when installed
+(multilingual by default), else a dependency-free hashing encoder of words and
+character trigrams.
+
+    python semantic_index.py --update
+    python semantic_index.py "drone delivery for hospitals" --table startupticker_companies
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+
+import database
+
+try:
+    from sentence_transformers import SentenceTransformer
+    HAS_SENTENCE_TRANSFORMERS = True
+except ImportError:
+    HAS_SENTENCE_TRANSFORMERS = False
+
+INDEX_DIR = "semantic_index"
+DEFAULT_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+BATCH_SIZE = 256
+CHUNK_ROWS = 65536  # rows of the matrix scored at once
+NPROBE = 8
+ANN_SAMPLE = 65536  # rows the k-means of the approximate index is trained on
+
+# text of a row per table, the columns are joined with ". "
+TEXT_COLUMNS = {
+    "startupticker_companies": ["Title", "Highlights", "Comment"],
+    "startupticker_deals": ["Company", "Comment"],
+}
+
+
+class HashingEncoder:
+    """Feature hashing of words and character trigrams, no model to download."""
+
+    def __init__(self, dim=512):
+        self.name = f"hashing-{dim}"
+        self.dim = dim
+
+    def tokens(self, text):
+        text = unicodedata.normalize("NFKD", text.lower())
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        for word in re.findall(r"\w+", text):
+            yield word
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3]
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(t.encode()) for t in self.tokens(text)), dtype=np.uint32)
+            # the top bit gives the sign, so colliding tokens tend to cancel out
+            np.add.at(vectors[row], hashes % self.dim, np.where(hashes >> 31, -1.0, 1.0))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEncoder:
+    def __init__(self, model_name=DEFAULT_MODEL):
+        self.name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts):
+        return self.model.encode(texts, batch_size=BATCH_SIZE, normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+
+
+def get_encoder(name=None):
+    """`hashing` / `hashing-<dim>`, a sentence-transformers model name, or the best available."""
+    if name is None:
+        name = DEFAULT_MODEL if HAS_SENTENCE_TRANSFORMERS else "hashing"
+    if name.startswith("hashing"):
+        return HashingEncoder(int(name.split("-")[1]) if "-" in name else 512)
+    if not HAS_SENTENCE_TRANSFORMERS:
+        raise ImportError("sentence-transformers is not installed (pip install sentence-transformers), "
+                          "use --encoder hashing")
+    return SentenceTransformerEncoder(name)
+
+
+def row_text(row, columns):
+    parts = []
+    for col in columns:
+        value = row[col]
+        if not value:
+            continue
+        if isinstance(value, str) and value.startswith("["):
+            try:
+                value = ", ".join(map(str, json.loads(value)))
+            except ValueError:
+                pass
+        parts.append(str(value))
+    return ". ".join(parts)
+
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """Spherical k-means: centroids normalized, assignment by dot product."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(k):
+            members = vectors[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+class SemanticIndex:
+    def __init__(self, path=INDEX_DIR, encoder=None, dtype="float16"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self.meta = json.load(f)
+            if encoder is not None and encoder.name != self.meta["encoder"]:
+                raise ValueError(f"index built with {self.meta['encoder']}, not {encoder.name} (use --rebuild)")
+            self.encoder = encoder or get_encoder(self.meta["encoder"])
+        else:
+            self.encoder = encoder or get_encoder()
+            self.meta = {"encoder": self.encoder.name, "dim": self.encoder.dim, "dtype": dtype, "count": 0}
+        self.dim, self.dtype = self.meta["dim"], np.dtype(self.meta["dtype"])
+        self._truncate_to_meta()
+        self.ids = self._read_ids()
+        self.ann = self._read_ann()
+        self.vectors = self.alive = self._tables = None
+        self._map()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _truncate_to_meta(self):
+        """Drop what an interrupted update wrote after the last meta.json."""
+        n = self.meta["count"]
+        for name, size in (("vectors.bin", n * self.dim * self.dtype.itemsize), ("alive.u8", n)):
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+        if os.path.exists(self._file("ids.tsv")):
+            with open(self._file("ids.tsv"), encoding="utf-8") as f:
+                lines = f.readlines()
+            if len(lines) > n:
+                with open(self._file("ids.tsv"), "w", encoding="utf-8") as f:
+                    f.writelines(lines[:n])
+
+    def _read_ids(self):
+        if not os.path.exists(self._file("ids.tsv")):
+            return []
+        with open(self._file("ids.tsv"), encoding="utf-8") as f:
+            return [tuple(line.rstrip("\n").split("\t")) for line in f]
+
+    def _read_ann(self):
+        if not os.path.exists(self._file("ann.npz")):
+            return None
+        ann = np.load(self._file("ann.npz"))
+        return {"centroids": ann["centroids"], "order": ann["order"], "offsets": ann["offsets"],
+                "count": int(ann["count"])}
+
+    def _map(self):
+        n = self.meta["count"]
+        if n:
+            self.vectors = np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r", shape=(n, self.dim))
+            self.alive = np.memmap(self._file("alive.u8"), dtype=np.uint8, mode="r+", shape=(n,))
+
+    def _write_meta(self):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def add(self, entries, texts):
+        """Append the vectors of `texts`; entries are (table_name, _key, _row_hash)."""
+        for start in range(0, len(texts), BATCH_SIZE):
+            batch = self.encoder.encode(texts[start:start + BATCH_SIZE]).astype(self.dtype)
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(batch.tobytes())
+            with open(self._file("alive.u8"), "ab") as f:
+                f.write(b"\x01" * len(batch))
+            with open(self._file("ids.tsv"), "a", encoding="utf-8") as f:
+                f.writelines("\t".join(e) + "\n" for e in entries[start:start + BATCH_SIZE])
+            self.ids.extend(entries[start:start + BATCH_SIZE])
+            self.meta["count"] += len(batch)
+            self._write_meta()
+        self._map()
+
+    def remove(self, positions):
+        if len(positions):
+            self.alive[np.asarray(positions)] = 0
+            self.alive.flush()
+
+    def update(self, db_path=database.sqlite_db, tables=tuple(TEXT_COLUMNS)):
+        """Encode the new and changed rows, retire the changed and deleted ones."""
+        # (table, key) -> live positions, oldest first; several after an update
+        # interrupted between add() and remove()
+        live = {}
+        for i, (table_name, key, row_hash) in enumerate(self.ids):
+            if self.alive[i]:
+                live.setdefault((table_name, key), []).append((i, row_hash))
+
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        entries, texts, seen, changed = [], [], set(), set()
+        for table_name in tables:
+            columns = ", ".join(f'"{c}"' for c in TEXT_COLUMNS[table_name])
+            for row in conn.execute(
+                    f'SELECT _key, _row_hash, {columns} FROM "{table_name}" WHERE _deleted_at IS NULL'):
+                seen.add((table_name, row["_key"]))
+                known = live.get((table_name, row["_key"]))
+                if known and known[-1][1] == row["_row_hash"]:
+                    continue
+                # retired even when its text is now empty
+                changed.add((table_name, row["_key"]))
+                text = row_text(row, TEXT_COLUMNS[table_name])
+                if text:
+                    entries.append((table_name, row["_key"], row["_row_hash"]))
+                    texts.append(text)
+        conn.close()
+
+        stale = []
+        for ident, positions in live.items():
+            if ident[0] not in tables:
+                continue
+            if ident not in seen or ident in changed:
+                stale.extend(i for i, _ in positions)
+            else:
+                # the up-to-date vector is the last one
+                stale.extend(i for i, _ in positions[:-1])
+        start = time.perf_counter()
+        self.add(entries, texts)
+        self.remove(stale)
+        print(f"✅ {len(texts)} rows encoded, {len(stale)} retired in {time.perf_counter() - start:.1f} s "
+              f"({self.meta['count']} vectors, {int(self.alive.sum()) if self.alive is not None else 0} live)")
+        return len(texts), len(stale)
+
+    def build_ann(self, n_lists=None, iterations=10):
+        """Approximate index over the current rows (vectors appended later are scanned exactly).
+
+        k-means is trained on a sample of ANN_SAMPLE rows, the rows are then
+        assigned to the lists chunk by chunk.
+        """
+        n = self.meta["count"]
+        if not n:
+            print("⚠️ Empty index, no approximate index built")
+            return
+        n_lists = n_lists or max(1, int(np.sqrt(n)))
+        sample = np.sort(np.random.default_rng(0).choice(n, min(n, ANN_SAMPLE), replace=False))
+        n_lists = min(n_lists, len(sample))
+        centroids, _ = kmeans(np.asarray(self.vectors[sample], dtype=np.float32), n_lists, iterations)
+        assign = np.concatenate([
+            np.argmax(np.asarray(self.vectors[start:start + CHUNK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+            for start in range(0, n, CHUNK_ROWS)])
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(n_lists + 1))
+        np.savez(self._file("ann.npz"), centroids=centroids.astype(np.float32), order=order,
+                 offsets=offsets, count=n)
+        self.ann = self._read_ann()
+        print(f"✅ Approximate index: {n_lists} lists over {n} vectors")
+
+    def _candidates(self, query, nprobe):
+        """Positions to score with the approximate index, None for a full scan."""
+        if self.ann is None:
+            return None
+        lists = np.argsort(-(self.ann["centroids"] @ query))[:nprobe]
+        offsets = self.ann["offsets"]
+        parts = [self.ann["order"][offsets[c]:offsets[c + 1]] for c in lists]
+        parts.append(np.arange(self.ann["count"], self.meta["count"]))
+        return np.sort(np.concatenate(parts))
+
+    def search(self, text, k=10, table=None, approximate=True, nprobe=NPROBE):
+        """[(score, table_name, _key)] of the k closest live rows."""
+        if not self.meta["count"]:
+            return []
+        query = self.encoder.encode([text])[0].astype(np.float32)
+        candidates = self._candidates(query, nprobe) if approximate else None
+        scores_parts, positions_parts = [], []
+        if candidates is None:
+            for start in range(0, self.meta["count"], CHUNK_ROWS):
+                block = np.asarray(self.vectors[start:start + CHUNK_ROWS], dtype=np.float32)
+                scores_parts.append(block @ query)
+                positions_parts.append(np.arange(start, start + len(block)))
+        else:
+            scores_parts.append(np.asarray(self.vectors[candidates], dtype=np.float32) @ query)
+            positions_parts.append(candidates)
+        scores, positions = np.concatenate(scores_parts), np.concatenate(positions_parts)
+
+        mask = self.alive[positions].astype(bool)
+        if table:
+            if self._tables is None or len(self._tables) != len(self.ids):
+                self._tables = np.array([e[0] for e in self.ids])
+            mask &= self._tables[positions] == table
+        scores, positions = scores[mask], positions[mask]
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.ids[positions[i]][0], self.ids[positions[i]][1]) for i in top]
+
+
+def describe(conn, table_name, key):
+    column = "Title" if table_name == "startupticker_companies" else "Company"
+    row = conn.execute(f'SELECT "{column}", Comment FROM "{table_name}" WHERE _key = ?', (key,)).fetchone()
+    return f"{row[0]} - {(row[1] or '')[:90]}" if row else key
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Semantic search over companies and deals")
+    parser.add_argument("query", nargs="*")
+    parser.add_argument("--db", default=database.sqlite_db)
+    parser.add_argument("--index", default=INDEX_DIR)
+    parser.add_argument("--encoder", help=f"'hashing' or a sentence-transformers model (default: {DEFAULT_MODEL} "
+                                          "when installed)")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    parser.add_argument("--update", action="store_true", help="encode new and changed rows")
+    parser.add_argument("--rebuild", action="store_true", help="drop the index and encode everything")
+    parser.add_argument("--ann", action="store_true", help="(re)build the approximate index")
+    parser.add_argument("--exact", action="store_true", help="score every vector, ignore the approximate index")
+    parser.add_argument("--table", choices=list(TEXT_COLUMNS))
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.isdir(args.index):
+        shutil.rmtree(args.index)
+    index = SemanticIndex(args.index, get_encoder(args.encoder) if args.encoder else None, args.dtype)
+    if args.update or args.rebuild:
+        index.update(args.db)
+    if args.ann:
+        index.build_ann()
+    if args.query:
+        start = time.perf_counter()
+        hits = index.search(" ".join(args.query), args.k, args.table, approximate=not args.exact)
+        elapsed = time.perf_counter() - start
+        conn = sqlite3.connect(args.db)
+        for score, table_name, key in hits:
+            print(f"{score:.3f}  {table_name.replace('startupticker_', ''):<10} {describe(conn, table_name, key)}")
+        conn.close()
+        print(f"\n🔎 {len(hits)} hits in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,208 @@
+"""
+Resumable batch crawl of the SOGC publications of many companies.
+
+UIDs come from startups_clean.db (the CHE codes of the startupticker
+companies) or from a file, one per line. Every outcome is appended to a JSONL
+manifest as soon as it is known:
+
+    {"uid": "CHE-236.101.881", "status": "ok", "path": "...", "attempt": 1, "at": "..."}
+    {"uid": "CHE-...", "status": "failed", "attempt": 1, "at": "..."}
+
+A restarted crawl skips the UIDs with a fresh file (younger than
+--max-age-days) in the download directory, so a crash half way through
+resumes where it stopped, while old or deleted downloads are fetched again. Failures are retried in rounds with
+exponential backoff; all requests share one global rate limit.
+
+    python sogc_crawl.py --engine http --workers 8 --rate 5
+    python sogc_crawl.py --file uids.txt --engine browser --workers 4
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import database
+import scraper_metrics
+
+DOWNLOAD_DIR = "sogc_downloads"
+MANIFEST_NAME = "manifest.jsonl"  # in the download directory
+UID_PATTERN = re.compile(r"^CHE-\d{3}\.\d{3}\.\d{3}$")
+DEFAULT_FORMATS = {"http": "xml", "browser": "pdf"}
+
+
+class RateLimiter:
+    """
+    At most `rate` requests per second over all workers, as evenly spaced
+    slots. reserve() books the next slot and returns how long to wait for it,
+    so threads can sleep and coroutines await on the same limiter.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+            return slot - now
+
+
+class Manifest:
+    """Append-only JSONL log of the crawl, flushed to disk after every line."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.last = {}  # uid -> last record
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a line cut short by a crash
+                        continue
+                    self.last[record["uid"]] = record
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def done(self, uid, path):
+        return self.last.get(uid, {}).get("status") == "ok" and self.last[uid].get("path") == path
+
+    def record(self, uid, status, **fields):
+        record = {"uid": uid, "status": status, **fields, "at": datetime.now(timezone.utc).isoformat()}
+        with self.lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.last[uid] = record
+
+    def close(self):
+        self.file.close()
+
+
+def normalize_uid(value):
+    """'che-236.101.881' -> 'CHE-236.101.881', None when it is not a UID."""
+    if not isinstance(value, str):
+        return None
+    uid = value.strip().upper()
+    return uid if UID_PATTERN.match(uid) else None
+
+
+def uids_from_db(db_path=database.sqlite_db):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT DISTINCT Code FROM startupticker_companies WHERE _deleted_at IS NULL ORDER BY Code").fetchall()
+    conn.close()
+    return [uid for uid in (normalize_uid(code) for code, in rows) if uid]
+
+
+def uids_from_file(path):
+    with open(path, encoding="utf-8") as f:
+        return [uid for uid in (normalize_uid(line) for line in f) if uid]
+
+
+def fresh_output(uid, download_dir, output_format, max_age_days):
+    """Path of an existing download of the UID younger than max_age_days, else None."""
+    path = os.path.join(download_dir, f"{uid}.{output_format}")
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age_days * 86400:
+        return path
+    return None
+
+
+def make_engine(engine, workers, download_dir, limiter, base_url=None, metrics=None):
+    if engine == "http":
+        import sogc_http
+        return sogc_http.HttpEngine(workers, download_dir, base_url or sogc_http.SOGC_API, limiter, metrics)
+    import web_scrapper
+    return web_scrapper.BrowserPool(workers, download_dir, headless=True,
+                                    base_url=base_url or web_scrapper.SOGC_URL, limiter=limiter, metrics=metrics)
+
+
+def crawl(uids, engine="http", workers=8, output_format=None, download_dir=DOWNLOAD_DIR,
+          manifest_path=None, rate=5, retries=4, backoff=2.0, max_age_days=30, base_url=None, metrics_path=None):
+    """
+    Download the SOGC data of every UID not done yet. With `metrics_path`,
+    the per-phase timings are appended there (see scraper_metrics.py).
+
+    Returns:
+        dict: counts of the UIDs per outcome (ok, skipped, failed)
+    """
+    output_format = output_format or DEFAULT_FORMATS[engine]
+    manifest_path = manifest_path or os.path.join(download_dir, MANIFEST_NAME)
+    manifest = Manifest(manifest_path)
+    todo, skipped = [], 0
+    for uid in dict.fromkeys(uids):
+        # the manifest alone is not trusted: the file may be too old or gone
+        path = fresh_output(uid, download_dir, output_format, max_age_days)
+        if path:
+            if not manifest.done(uid, path):
+                manifest.record(uid, "ok", path=path, attempt=0)
+            skipped += 1
+            continue
+        todo.append(uid)
+    print(f"🔄 {len(todo)} UIDs to crawl, {skipped} already done")
+
+    start = time.perf_counter()
+    attempt, failed, counts = 1, [], {"ok": 0, "skipped": skipped, "failed": 0}
+    metrics = scraper_metrics.MetricsLog(metrics_path) if metrics_path else None
+    with make_engine(engine, workers, download_dir, RateLimiter(rate), base_url, metrics) as pool:
+        while todo:
+            failed = []
+
+            def on_result(uid, path):
+                if path:
+                    manifest.record(uid, "ok", path=path, attempt=attempt)
+                    counts["ok"] += 1
+                else:
+                    manifest.record(uid, "failed", attempt=attempt)
+                    failed.append(uid)
+
+            pool.download(todo, output_format, on_result=on_result)
+            if not failed or attempt > retries:
+                break
+            delay = backoff * 2 ** (attempt - 1) * (1 + random.random() / 2)
+            print(f"⚠️ {len(failed)} UIDs failed, retry {attempt}/{retries} in {delay:.0f} s")
+            time.sleep(delay)
+            todo, attempt = failed, attempt + 1
+    manifest.close()
+    if metrics is not None:
+        metrics.close()
+
+    counts["failed"] = len(failed)
+    print(f"✅ {counts['ok']} downloaded, {counts['skipped']} skipped, {counts['failed']} failed "
+          f"in {time.perf_counter() - start:.1f} s (manifest: {manifest_path})")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resumable batch crawl of SOGC publications")
+    parser.add_argument("--file", help="file with one UID per line (default: the companies of startups_clean.db)")
+    parser.add_argument("--db", default=database.sqlite_db)
+    parser.add_argument("--engine", choices=["http", "browser"], default="http")
+    parser.add_argument("--workers", type=int, default=8, help="requests in flight / browser sessions")
+    parser.add_argument("--format", dest="output_format", help="xml for http, pdf for browser by default")
+    parser.add_argument("--output", default=DOWNLOAD_DIR, help="download directory")
+    parser.add_argument("--manifest", help=f"default: {MANIFEST_NAME} in the download directory")
+    parser.add_argument("--rate", type=float, default=5, help="max requests per second, 0 for no limit")
+    parser.add_argument("--retries", type=int, default=4)
+    parser.add_argument("--max-age-days", type=float, default=30, help="downloads younger than this are kept")
+    parser.add_argument("--limit", type=int, help="only the first N UIDs")
+    parser.add_argument("--base-url", help="search page / API root, e.g. a local mock")
+    parser.add_argument("--metrics", help="JSONL file for the per-phase timings (report: scraper_metrics.py)")
+    args = parser.parse_args()
+
+    uids = uids_from_file(args.file) if args.file else uids_from_db(args.db)
+    if args.limit:
+        uids = uids[:args.limit]
+    crawl(uids, args.engine, args.workers, args.output_format, args.output, args.manifest,
+          args.rate, args.retries, max_age_days=args.max_age_days, base_url=args.base_url,
+          metrics_path=args.metrics)
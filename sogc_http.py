@@ -0,0 +1,209 @@
+"""
+Browserless SOGC engine.
+
+The shab.ch search page is a single page app on top of a JSON backend (see the
+network requests captured by the performance log of web_scrapper.py):
+
+    GET /api/v1/publications?uid=<UID>&pageRequest.page=<n>&pageRequest.size=<n>
+        -> {"content": [{"meta": {"id", "publicationNumber", "publicationDate", ...}}],
+            "total": <hits>}
+    GET /api/v1/publications/<id>/xml   (or /pdf)
+        -> the export of one publication
+
+This engine calls it directly with one pooled aiohttp session (keep-alive
+connections, at most `concurrency` requests in flight), no browser at all.
+It has the interface of the browser engine of web_scrapper.py:
+
+    download_sogc_data(uid, output_format, download_dir)  -> path or None
+    download_many(uids, workers, output_format, download_dir) -> {uid: path or None}
+    HttpEngine(...).download(uids)                        ~ BrowserPool(...).download(uids)
+
+One file is written per UID: <UID>.xml wraps the XML of all its publications
+in a <publications uid="..."> element (empty when it has none), <UID>.pdf
+concatenates the PDFs (an empty file when it has none, so the crawl does not
+retry the UID).
+"""
+import asyncio
+import io
+import os
+import re
+import time
+
+from scraper_metrics import Trace
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+SOGC_API = "https://www.shab.ch"
+SEARCH_PATH = "/api/v1/publications"
+EXPORT_PATH = "/api/v1/publications/{id}/{format}"
+PAGE_SIZE = 100
+TIMEOUT = 60  # seconds per request
+
+XML_DECLARATION = re.compile(rb"^\s*<\?xml[^>]*\?>\s*")
+
+
+def _require_aiohttp():
+    if not HAS_AIOHTTP:
+        raise ImportError("aiohttp is not installed: pip install aiohttp")
+
+
+async def search_publications(session, uid, base_url=SOGC_API):
+    """Metadata of every published SOGC publication of a UID, all pages."""
+    hits, page = [], 0
+    while True:
+        params = {
+            "uid": uid,
+            "publicationStates": "PUBLISHED",
+            "pageRequest.page": page,
+            "pageRequest.size": PAGE_SIZE,
+        }
+        async with session.get(base_url + SEARCH_PATH, params=params) as response:
+            response.raise_for_status()
+            result = await response.json()
+        content = result.get("content") or []
+        hits.extend(item["meta"] for item in content)
+        if not content or len(hits) >= result.get("total", 0):
+            return hits
+        page += 1
+
+
+async def fetch_export(session, publication_id, output_format="xml", base_url=SOGC_API):
+    url = base_url + EXPORT_PATH.format(id=publication_id, format=output_format)
+    async with session.get(url) as response:
+        response.raise_for_status()
+        return await response.read()
+
+
+def combine_exports(uid, exports, output_format):
+    """Bytes of the single per-UID file from the exports of its publications."""
+    if output_format == "xml":
+        parts = [XML_DECLARATION.sub(b"", export) for export in exports]
+        return (b'<?xml version="1.0" encoding="UTF-8"?>\n<publications uid="' + uid.encode() + b'">\n'
+                + b"\n".join(parts) + b"\n</publications>\n")
+    if output_format == "pdf":
+        if not exports:
+            return b""
+        if len(exports) == 1:
+            return exports[0]
+        from pypdf import PdfWriter
+        writer = PdfWriter()
+        for export in exports:
+            writer.append(io.BytesIO(export))
+        out = io.BytesIO()
+        writer.write(out)
+        return out.getvalue()
+    raise ValueError(f"Unsupported output format for the HTTP engine: {output_format}")
+
+
+class HttpEngine:
+    """
+    SOGC downloads over one keep-alive HTTP session.
+
+    `concurrency` bounds the requests in flight (searches and exports
+    together) and the size of the connection pool. `limiter` (see
+    sogc_crawl.RateLimiter) spaces out the requests when given, `metrics`
+    (scraper_metrics.MetricsLog) receives the search/export/write timings.
+
+        with HttpEngine(concurrency=8) as engine:
+            results = engine.download(uids)
+    """
+
+    def __init__(self, concurrency=8, download_dir=None, base_url=SOGC_API, limiter=None, metrics=None):
+        _require_aiohttp()
+        self.concurrency = concurrency
+        self.download_dir = download_dir or os.path.join(os.getcwd(), "sogc_downloads")
+        self.base_url = base_url.rstrip("/")
+        self.limiter = limiter
+        self.metrics = metrics
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def download(self, uids, output_format="xml", on_result=None):
+        """
+        Download every UID, calling on_result(uid, path) as soon as each one is done.
+
+        Returns:
+            dict: UID -> path of the downloaded file (None when it failed)
+        """
+        os.makedirs(self.download_dir, exist_ok=True)
+        start = time.perf_counter()
+        results = asyncio.run(self._download_all(list(uids), output_format, on_result))
+        n_ok = sum(path is not None for path in results.values())
+        print(f"✅ {n_ok}/{len(results)} UIDs downloaded in {time.perf_counter() - start:.1f} s")
+        return results
+
+    async def _download_all(self, uids, output_format, on_result):
+        limit = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            paths = await asyncio.gather(*(
+                self._download_uid(session, limit, uid, output_format, on_result) for uid in uids))
+        return dict(zip(uids, paths))
+
+    async def _throttle(self):
+        if self.limiter is not None:
+            await asyncio.sleep(self.limiter.reserve())
+
+    async def _download_uid(self, session, limit, uid, output_format, on_result):
+        path = await self._fetch_uid(session, limit, uid, output_format)
+        if on_result is not None:
+            on_result(uid, path)
+        return path
+
+    async def _fetch_uid(self, session, limit, uid, output_format):
+        trace = Trace(self.metrics, uid, engine="http")
+        try:
+            trace.phase("search")
+            async with limit:
+                await self._throttle()
+                hits = await search_publications(session, uid, self.base_url)
+            if not hits:
+                print(f"No publication found for UID: {uid}")
+
+            async def export(hit):
+                async with limit:
+                    await self._throttle()
+                    return await fetch_export(session, hit["id"], output_format, self.base_url)
+
+            trace.phase("export")
+            exports = await asyncio.gather(*(export(hit) for hit in hits))
+            data = combine_exports(uid, exports, output_format)
+        except Exception as e:
+            print(f"Error for UID {uid}: {e!r}")
+            trace.fallback(f"error: {type(e).__name__}")
+            trace.finish(False)
+            return None
+
+        trace.phase("write")
+        path = os.path.join(self.download_dir, f"{uid}.{output_format}")
+        # written next to the target and renamed, a crash never leaves half a file
+        with open(path + ".part", "wb") as f:
+            f.write(data)
+        os.replace(path + ".part", path)
+        print(f"{uid}: {len(hits)} publications -> {os.path.basename(path)}")
+        trace.finish(True)
+        return path
+
+
+def download_sogc_data(uid="CHE-236.101.881", output_format="xml", download_dir=None, base_url=SOGC_API):
+    """Download the SOGC publications of one UID, returns the path of the file or None."""
+    return HttpEngine(1, download_dir, base_url).download([uid], output_format)[uid]
+
+
+def download_many(uids, workers=8, output_format="xml", download_dir=None, base_url=SOGC_API):
+    """Download the SOGC publications of many UIDs with at most `workers` requests in flight."""
+    with HttpEngine(workers, download_dir, base_url) as engine:
+        return engine.download(uids, output_format)
+
+
+if __name__ == "__main__":
+    download_sogc_data(uid="CHE-215.350.964", output_format="xml")
@@ -0,0 +1,468 @@
+"""
+Structured extraction of the SOGC downloads into startups_clean.db.
+
+One document per UID is parsed from sogc_downloads/, the structured export
+first: <UID>.xml (sogc_http.py), then <UID>.csv, then the PDF text
+(web_scrapper.py) as a fallback. Every commercial registry publication is
+split into normalized rows:
+
+    sogc_publications     one row per publication (kind, journal number/date, text)
+    sogc_people           people and legal entities registered or removed, with
+                          their role; `founder` marks those of the new entry
+    sogc_address_changes  new seat / domicile
+    sogc_liquidations     dissolution, bankruptcy, deletion
+
+Documents are parsed by a process pool, the single writer is this process.
+sogc_documents remembers size, mtime and sha256 of every parsed file: an
+unchanged document is skipped, a changed one replaces the rows of its UID.
+
+    python sogc_parser.py --workers 4
+"""
+import argparse
+import csv
+import hashlib
+import multiprocessing as mp
+import os
+import re
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+import database
+
+DOWNLOAD_DIR = "sogc_downloads"
+# preferred first
+FORMATS = ["xml", "csv", "pdf"]
+UID_FILE = re.compile(r"^(CHE-\d{3}\.\d{3}\.\d{3})\.(xml|csv|pdf)$")
+
+# subRubric of the XML/CSV exports and first word of a PDF publication header
+KINDS = {
+    "HR01": "new entry", "HR02": "change", "HR03": "deletion",
+    "new entry": "new entry", "neueintragung": "new entry", "nouvelle inscription": "new entry",
+    "change": "change", "mutation": "change", "modification": "change",
+    "deletion": "deletion", "löschung": "deletion", "radiation": "deletion",
+}
+# a change of name wraps: 'Change Saiba GmbH, Freienbach, new' + newline + 'Saiba AG'
+PDF_HEADER = re.compile(
+    r"^(New entry|Change|Deletion|Neueintragung|Mutation|Löschung)[ \t]+(\S.*?)"
+    r"(?:,[ \t]*(?:new|neu|nouveau)[ \t]*\n[ \t]*(\S.*?))?[ \t]*$", re.MULTILINE)
+PDF_JOURNAL = re.compile(r"Journal Number (\d+) from (\d{2}\.\d{2}\.\d{4})")
+
+PEOPLE_SECTIONS = re.compile(
+    r"(Ausgeschiedene Personen und erloschene Unterschriften"
+    r"|Eingetragene Personen neu oder mutierend"
+    r"|Eingetragene Personen"
+    r"|Personnes et signatures radiées"
+    r"|Personnes inscrites ou modifications"
+    r"|Personnes inscrites)\s*:")
+REMOVED_SECTIONS = ("Ausgeschiedene", "Personnes et signatures radiées")
+ADDRESS = re.compile(r"\b(Sitz|Domizil|Siège|Domicile)(?: neu| nouveau)?:\s*(.+?)(?<!\bSt)\.(?=\s+[A-ZÄÖÜ\[]|\s*$)")
+LIQUIDATION_EVENTS = [
+    ("bankruptcy", re.compile(r"Konkurs|faillite", re.IGNORECASE)),
+    # not "in Liquidation", which stays in the company name until the deletion
+    ("dissolution", re.compile(r"aufgelöst|dissoute", re.IGNORECASE)),
+    ("deletion", re.compile(r"wird im Handelsregister gelöscht|ist erloschen|est radiée", re.IGNORECASE)),
+]
+# role keyword -> role type, first match wins
+ROLE_TYPES = [
+    ("liquidator", ("liquidator",)),
+    ("board", ("präsident", "mitglied", "verwaltungsrat", "président", "membre", "administrat")),
+    ("management", ("geschäftsführer", "direktor", "geschäftsleitung", "gérant", "directeur")),
+    ("owner", ("inhaber", "titulaire")),
+    ("partner", ("gesellschafter", "associé")),
+    ("auditor", ("revisionsstelle", "organe de révision")),
+    ("signatory", ("prokurist", "zeichnungsberechtigt", "fondé de procuration")),
+]
+TITLES = re.compile(r"\b(Prof|Dr|PD|med|iur|phil|oec|lic|dipl|Ing)\.\s*")
+CHE_IN_NAME = re.compile(r"\s*\((CHE-\d{3}\.\d{3}\.\d{3})\)")
+
+TABLE_COLUMNS = {
+    "sogc_publications": ["uid", "publication_id", "kind", "journal_number", "journal_date", "company", "text"],
+    "sogc_people": ["uid", "publication_id", "journal_date", "action", "name", "entity_uid", "origin",
+                    "residence", "role", "role_type", "signature", "founder"],
+    "sogc_address_changes": ["uid", "publication_id", "journal_date", "address"],
+    "sogc_liquidations": ["uid", "publication_id", "journal_date", "event", "detail"],
+}
+
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sogc_documents (
+            uid TEXT PRIMARY KEY,
+            path TEXT,
+            format TEXT,
+            size INTEGER,
+            mtime_ns INTEGER,
+            digest TEXT,
+            n_publications INTEGER,
+            parsed_at TEXT
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sogc_publications (
+            uid TEXT,
+            publication_id TEXT,
+            kind TEXT,
+            journal_number TEXT,
+            journal_date TEXT,
+            company TEXT,
+            text TEXT,
+            PRIMARY KEY (uid, publication_id)
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sogc_people (
+            uid TEXT,
+            publication_id TEXT,
+            journal_date TEXT,
+            action TEXT,
+            name TEXT,
+            entity_uid TEXT,
+            origin TEXT,
+            residence TEXT,
+            role TEXT,
+            role_type TEXT,
+            signature TEXT,
+            founder INTEGER
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sogc_address_changes (
+            uid TEXT,
+            publication_id TEXT,
+            journal_date TEXT,
+            address TEXT
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sogc_liquidations (
+            uid TEXT,
+            publication_id TEXT,
+            journal_date TEXT,
+            event TEXT,
+            detail TEXT
+        )""")
+    for table in ["sogc_people", "sogc_address_changes", "sogc_liquidations"]:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}__uid ON {table} (uid)")
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_sogc_people__name ON sogc_people (name)")
+
+
+# --- text of one publication -> rows ---
+
+def clean_text(text):
+    """Join the lines of a PDF column: hyphenated words, wrapped UIDs, spaces."""
+    text = re.sub(r"(?<=[a-zäöüéèà])-\s*\n\s*(?=[a-zäöüéèà])", "", text)
+    text = re.sub(r"\s+", " ", text)
+    return re.sub(r"CHE-\s+(?=\d)", "CHE-", text).strip()
+
+
+def iso_date(value):
+    """'06.04.2020' or '2020-04-06[T...]' -> '2020-04-06'."""
+    if not value:
+        return None
+    value = value.strip()
+    match = re.match(r"(\d{2})\.(\d{2})\.(\d{4})$", value)
+    if match:
+        return f"{match[3]}-{match[2]}-{match[1]}"
+    return value[:10]
+
+
+def split_top_level(text, sep=";"):
+    """Split on `sep` outside of [...] and (...)."""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char in "[(":
+            depth += 1
+        elif char in "])":
+            depth = max(depth - 1, 0)
+        if char == sep and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def role_type(role):
+    role = (role or "").lower()
+    for kind, keywords in ROLE_TYPES:
+        if any(k in role for k in keywords):
+            return kind
+    return None
+
+
+def parse_person(entry):
+    """
+    'Bachmann, Prof. Dr. Martin Fabian, von Matzingen, in Zell (ZH), Präsident, mit Einzelunterschrift'
+    -> name, origin, residence, role, signature. Legal entities keep their own UID.
+    """
+    entry = re.sub(r"\[[^\]]*\]", "", entry).strip().rstrip(".")
+    parts = split_top_level(entry, ",")
+    if not parts:
+        return None
+    person = {"name": None, "entity_uid": None, "origin": None, "residence": None, "role": None, "signature": None}
+    entity = CHE_IN_NAME.search(parts[0])
+    if entity:
+        person["entity_uid"] = entity[1]
+        person["name"] = CHE_IN_NAME.sub("", parts[0]).strip()
+        rest = parts[1:]
+    else:
+        first = TITLES.sub("", parts[1]).strip() if len(parts) > 1 else ""
+        person["name"] = f"{parts[0]}, {first}" if first else parts[0]
+        rest = parts[2:]
+
+    for part in rest:
+        lower = part.lower()
+        if lower.startswith(("von ", "de ", "d'")) and person["origin"] is None:
+            person["origin"] = part.split(" ", 1)[1] if " " in part else part
+        elif "staatsangehörig" in lower or "ressortissant" in lower or "citoyen" in lower:
+            person["origin"] = part
+        elif lower.startswith(("in ", "à ")) and person["residence"] is None:
+            person["residence"] = part.split(" ", 1)[1]
+        elif "unterschrift" in lower or "zeichnungsberechtigung" in lower or "signature" in lower:
+            person["signature"] = part
+        elif lower.startswith(("mit ", "ohne ", "avec ", "sans ")):
+            continue  # shares, capital contributions
+        elif person["role"] is None:
+            person["role"] = part
+    person["role_type"] = role_type(person["role"])
+    return person
+
+
+def parse_publication_text(text):
+    """People, address changes and liquidation events of one publication text."""
+    people = []
+    sections = list(PEOPLE_SECTIONS.finditer(text))
+    for i, section in enumerate(sections):
+        end = sections[i + 1].start() if i + 1 < len(sections) else len(text)
+        action = "removed" if section[1].startswith(REMOVED_SECTIONS) else "registered"
+        for entry in split_top_level(text[section.end():end]):
+            person = parse_person(entry)
+            if person and person["name"]:
+                people.append({"action": action, **person})
+
+    # the people sections come last, an address inside them is someone's residence
+    head = text[:sections[0].start()] if sections else text
+    addresses = [match[2].strip() for match in ADDRESS.finditer(head)]
+
+    events = []
+    for event, pattern in LIQUIDATION_EVENTS:
+        match = pattern.search(head)
+        if match:
+            events.append((event, sentence_around(head, match.start(), match.end())))
+    return people, addresses, events
+
+
+def sentence_around(text, start, end):
+    sentence_start = text.rfind(". ", 0, start)
+    sentence_end = text.find(". ", end)
+    return text[sentence_start + 2 if sentence_start >= 0 else 0:
+                sentence_end + 1 if sentence_end >= 0 else len(text)].strip()
+
+
+# --- documents -> publications ---
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _find_text(element, name):
+    for child in element.iter():
+        if _local(child.tag) == name and child.text and child.text.strip():
+            return child.text.strip()
+    return None
+
+
+def publications_from_xml(path):
+    root = ET.parse(path).getroot()
+    # one export, or the <publications> wrapper of sogc_http.py
+    elements = list(root) if _local(root.tag) == "publications" else [root]
+    publications = []
+    for element in elements:
+        text = _find_text(element, "publicationText")
+        if not text:
+            continue
+        publications.append({
+            "publication_id": _find_text(element, "publicationNumber") or element.get("id"),
+            "kind": KINDS.get(_find_text(element, "subRubric") or "", None),
+            "journal_number": _find_text(element, "journalNumber"),
+            "journal_date": iso_date(_find_text(element, "journalDate") or _find_text(element, "publicationDate")),
+            "company": _find_text(element, "name"),
+            "text": clean_text(text),
+        })
+    return publications
+
+
+def publications_from_csv(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        rows = [{k.strip().lower(): (v or "").strip() for k, v in row.items() if k} for row in csv.DictReader(f)]
+    publications = []
+    for row in rows:
+        text = row.get("publicationtext") or row.get("text")
+        if not text:
+            continue
+        publications.append({
+            "publication_id": row.get("publicationnumber") or row.get("id"),
+            "kind": KINDS.get(row.get("subrubric", ""), None),
+            "journal_number": row.get("journalnumber"),
+            "journal_date": iso_date(row.get("journaldate") or row.get("publicationdate")),
+            "company": row.get("name") or row.get("company"),
+            "text": clean_text(text),
+        })
+    return publications
+
+
+def publications_from_pdf(path):
+    """Publications of a "Hits as PDF" export: '<Kind> <Company>' ... 'Journal Number N from DD.MM.YYYY'."""
+    if os.path.getsize(path) == 0:
+        # written by sogc_http for a UID without publications
+        return []
+    from pypdf import PdfReader
+    raw = "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    publications, start = [], 0
+    for journal in PDF_JOURNAL.finditer(raw):
+        block = raw[start:journal.start()]
+        start = journal.end()
+        headers = list(PDF_HEADER.finditer(block))
+        if not headers:
+            continue
+        header = headers[-1]
+        publications.append({
+            "publication_id": f"{journal[1]}/{iso_date(journal[2])}",
+            "kind": KINDS.get(header[1].lower()),
+            "journal_number": journal[1],
+            "journal_date": iso_date(journal[2]),
+            # the new name when the publication renames the company
+            "company": (header[3] or header[2].split(",")[0]).strip(),
+            "text": clean_text(block[header.end():]),
+        })
+    return publications
+
+
+READERS = {"xml": publications_from_xml, "csv": publications_from_csv, "pdf": publications_from_pdf}
+
+
+def parse_document(job):
+    """Rows of every table for one document (runs in the pool)."""
+    uid, path, fmt = job
+    try:
+        publications = READERS[fmt](path)
+    except Exception as e:
+        return uid, None, f"{type(e).__name__}: {e}"
+
+    rows = {table: [] for table in TABLE_COLUMNS}
+    for n, pub in enumerate(publications):
+        pub_id = pub["publication_id"] or str(n)
+        rows["sogc_publications"].append((uid, pub_id, pub["kind"], pub["journal_number"], pub["journal_date"],
+                                          pub["company"], pub["text"]))
+        people, addresses, events = parse_publication_text(pub["text"])
+        founder = int(pub["kind"] == "new entry")
+        for p in people:
+            rows["sogc_people"].append((uid, pub_id, pub["journal_date"], p["action"], p["name"], p["entity_uid"],
+                                        p["origin"], p["residence"], p["role"], p["role_type"], p["signature"],
+                                        founder if p["action"] == "registered" else 0))
+        for address in addresses:
+            rows["sogc_address_changes"].append((uid, pub_id, pub["journal_date"], address))
+        for event, detail in events:
+            rows["sogc_liquidations"].append((uid, pub_id, pub["journal_date"], event, detail))
+    # a publication listed twice in one export
+    rows["sogc_publications"] = list({row[1]: row for row in rows["sogc_publications"]}.values())
+    return uid, rows, None
+
+
+# --- documents on disk <-> sogc_documents ---
+
+def find_documents(download_dir=DOWNLOAD_DIR):
+    """{uid: (path, format)} with the preferred format of every downloaded UID."""
+    found = {}
+    for name in os.listdir(download_dir):
+        match = UID_FILE.match(name)
+        if match:
+            found.setdefault(match[1], {})[match[2]] = os.path.join(download_dir, name)
+    return {uid: next((paths[fmt], fmt) for fmt in FORMATS if fmt in paths) for uid, paths in found.items()}
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def changed_documents(conn, documents, full=False):
+    """Documents not parsed yet or whose content changed, with their stat/digest."""
+    known = {uid: (path, size, mtime_ns, digest)
+             for uid, path, size, mtime_ns, digest in conn.execute(
+                 "SELECT uid, path, size, mtime_ns, digest FROM sogc_documents")}
+    todo = []
+    for uid, (path, fmt) in sorted(documents.items()):
+        stat = os.stat(path)
+        previous = known.get(uid)
+        if not full and previous and previous[:3] == (path, stat.st_size, stat.st_mtime_ns):
+            continue
+        digest = file_digest(path)
+        if not full and previous and previous[0] == path and previous[3] == digest:
+            # touched, not changed
+            conn.execute("UPDATE sogc_documents SET size = ?, mtime_ns = ? WHERE uid = ?",
+                         (stat.st_size, stat.st_mtime_ns, uid))
+            continue
+        todo.append((uid, path, fmt, stat.st_size, stat.st_mtime_ns, digest))
+    return todo
+
+
+def write_document(conn, uid, path, fmt, size, mtime_ns, digest, rows):
+    for table in TABLE_COLUMNS:
+        conn.execute(f"DELETE FROM {table} WHERE uid = ?", (uid,))
+    for table, columns in TABLE_COLUMNS.items():
+        if rows[table]:
+            placeholders = ", ".join("?" * len(columns))
+            conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows[table])
+    conn.execute("INSERT OR REPLACE INTO sogc_documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                 (uid, path, fmt, size, mtime_ns, digest, len(rows["sogc_publications"]),
+                  datetime.now(timezone.utc).isoformat()))
+
+
+def parse_downloads(download_dir=DOWNLOAD_DIR, db_path=database.sqlite_db, workers=None, full=False):
+    """
+    Parse the new and changed documents of `download_dir` into `db_path`.
+
+    Returns:
+        dict: documents parsed, skipped (unchanged) and failed
+    """
+    start = time.perf_counter()
+    documents = find_documents(download_dir)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        create_tables(conn)
+        todo = changed_documents(conn, documents, full)
+    print(f"🔄 {len(todo)} of {len(documents)} SOGC documents to parse")
+
+    stats = {"parsed": 0, "skipped": len(documents) - len(todo), "failed": 0}
+    if todo:
+        by_uid = {job[0]: job for job in todo}
+        workers = min(workers or os.cpu_count(), len(todo))
+        with mp.Pool(workers) as pool:
+            results = pool.imap_unordered(parse_document, [job[:3] for job in todo], chunksize=8)
+            # one transaction per document, an interrupted run keeps what is written
+            for uid, rows, error in results:
+                if error:
+                    print(f"⚠️ {by_uid[uid][1]}: {error}")
+                    stats["failed"] += 1
+                    continue
+                with conn:
+                    write_document(conn, *by_uid[uid], rows)
+                stats["parsed"] += 1
+    conn.close()
+    print(f"✅ {stats['parsed']} parsed, {stats['skipped']} unchanged, {stats['failed']} failed "
+          f"in {time.perf_counter() - start:.1f} s")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse the SOGC downloads into startups_clean.db")
+    parser.add_argument("--input", default=DOWNLOAD_DIR, help="download directory")
+    parser.add_argument("--db", default=database.sqlite_db)
+    parser.add_argument("--workers", type=int, help="parsing processes (default: all cores)")
+    parser.add_argument("--full", action="store_true", help="re-parse every document")
+    args = parser.parse_args()
+
+    parse_downloads(args.input, args.db, args.workers, args.full)
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+import enrichment
+import llmm
+
+COMPANIES = ["c1", "c2", "c3", "c4", "c5"]
+DEALS = ["d1", "d2", "d3"]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "startups_clean.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE startupticker_companies (_key TEXT, _row_hash TEXT, Title TEXT, Industry TEXT, "
+                 "Vertical TEXT, Canton TEXT, Year INTEGER, Highlights TEXT, Comment TEXT, _deleted_at TEXT)")
+    conn.execute("CREATE TABLE startupticker_deals (_key TEXT, _row_hash TEXT, Company TEXT, Phase TEXT, "
+                 "Type TEXT, Amount REAL, Investors TEXT, Comment TEXT, _deleted_at TEXT)")
+    # inserted out of key order, the rows are still sent in key order
+    conn.executemany("INSERT INTO startupticker_companies VALUES (?, 'h1', ?, 'cleantech', NULL, 'VD', 2020, "
+                     "NULL, '[\"solar\", \"panels\"]', NULL)", [(key, f"company {key}") for key in COMPANIES[::-1]])
+    conn.executemany("INSERT INTO startupticker_deals VALUES (?, 'h1', 'company c1', 'seed', 'vc', 2.5, NULL, "
+                     "NULL, NULL)", [(key,) for key in DEALS])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def enrichments(db_path, table_name):
+    """{_key: (model, labels)} of llm_enrichment."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT _key, model, labels FROM llm_enrichment WHERE table_name = ?", (table_name,))
+    result = {key: (model, json.loads(labels)) for key, model, labels in rows}
+    conn.close()
+    return result
+
+
+def labels(db_path, table_name):
+    """{_key: {dimension: sorted labels}} of llm_labels."""
+    conn = sqlite3.connect(db_path)
+    result = {}
+    for key, dimension, label in conn.execute(
+            "SELECT _key, dimension, label FROM llm_labels WHERE table_name = ? ORDER BY label", (table_name,)):
+        result.setdefault(key, {}).setdefault(dimension, []).append(label)
+    conn.close()
+    return result
+
+
+def run_table(db_path, responses, model, table_name="startupticker_companies", **kwargs):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        enrichment.create_tables(conn)
+    llm = llmm.FakeChatModel(responses=responses)
+    stats = asyncio.run(enrichment.enrich_table(conn, table_name, llm, model, concurrency=1, **kwargs))
+    conn.close()
+    return stats
+
+
+def test_fake_run_resumes_in_key_order_and_writes_every_batch(db_path, monkeypatch):
+    written = []
+    write_batch = enrichment.write_batch
+
+    def recording_write_batch(conn, table_name, version, model, results):
+        write_batch(conn, table_name, version, model, results)
+        # committed, so visible from another connection
+        written.append((table_name, sorted(labels(db_path, table_name))))
+
+    monkeypatch.setattr(enrichment, "write_batch", recording_write_batch)
+    summary = enrichment.enrich(db_path=str(db_path), batch_size=2, limit=3, fake=True, cache_path=None)
+    assert summary == {"startupticker_companies": {"tagged": 3, "failed": 0},
+                       "startupticker_deals": {"tagged": 3, "failed": 0}}
+    assert written[:2] == [("startupticker_companies", ["c1", "c2"]),
+                           ("startupticker_companies", ["c1", "c2", "c3"])]
+    assert sorted(enrichments(db_path, "startupticker_companies")) == ["c1", "c2", "c3"]
+
+    # the known terms of the answer, in llm_labels as in the labels JSON of llm_enrichment
+    assert labels(db_path, "startupticker_companies")["c1"] == {
+        "industry": ["cleantech", "energy"], "technology": ["advanced materials"]}
+    assert labels(db_path, "startupticker_deals")["d3"] == {"deal_type": ["grant"], "stage": ["early stage"]}
+    for table_name in enrichment.ENRICH_TABLES:
+        assert {key: {d: v for d, v in value.items() if v}
+                for key, (_, value) in enrichments(db_path, table_name).items()} == labels(db_path, table_name)
+
+    # a second run only sends the rows left over
+    summary = enrichment.enrich(("startupticker_companies",), db_path=str(db_path), batch_size=2, fake=True,
+                                cache_path=None)
+    assert summary == {"startupticker_companies": {"tagged": 2, "failed": 0}}
+    assert written[-1] == ("startupticker_companies", COMPANIES)
+
+
+def test_failed_rows_stay_pending(db_path):
+    answer = '{"industry": ["biotech"], "technology": []}'
+    stats = run_table(db_path, [answer, "not json", answer, answer, "no labels"], "fake", batch_size=10)
+    assert stats == {"tagged": 3, "failed": 2}
+    assert sorted(enrichments(db_path, "startupticker_companies")) == ["c1", "c3", "c4"]
+    assert sorted(labels(db_path, "startupticker_companies")) == ["c1", "c3", "c4"]
+
+    assert run_table(db_path, [answer], "fake") == {"tagged": 2, "failed": 0}
+    assert sorted(enrichments(db_path, "startupticker_companies")) == COMPANIES
+
+
+def test_a_real_model_tags_again_the_rows_of_the_fake_one(db_path):
+    enrichment.enrich(("startupticker_companies",), db_path=str(db_path), fake=True, cache_path=None)
+    assert {model for model, _ in enrichments(db_path, "startupticker_companies").values()} == {"fake"}
+    # the fake model does not send its own rows again
+    assert run_table(db_path, ['{"industry": ["medtech"]}'], "fake") == {"tagged": 0, "failed": 0}
+
+    stats = run_table(db_path, ['{"industry": ["medtech"], "technology": ["robotics"]}'], "gemini-x")
+    assert stats == {"tagged": 5, "failed": 0}
+    assert {model for model, _ in enrichments(db_path, "startupticker_companies").values()} == {"gemini-x"}
+    assert labels(db_path, "startupticker_companies")["c2"] == {"industry": ["medtech"], "technology": ["robotics"]}
+
+    # rows of a real model are kept by the next runs, fake or real
+    assert run_table(db_path, ['{"industry": ["biotech"]}'], "fake") == {"tagged": 0, "failed": 0}
+    assert run_table(db_path, ['{"industry": ["biotech"]}'], "gemini-x") == {"tagged": 0, "failed": 0}
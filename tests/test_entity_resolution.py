@@ -0,0 +1,89 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from entity_resolution import THRESHOLD, blocking_keys, candidate_pairs, link_companies, score_pairs
+
+
+def frame(keys, names, cities, domains):
+    return pd.DataFrame({"_key": keys, "_row_hash": keys, "name": names, "city": cities, "domain": domains})
+
+
+def scored(left, right):
+    return score_pairs(candidate_pairs(blocking_keys(left), blocking_keys(right)), left, right).set_index("_key_r")
+
+
+def test_exact_name_without_city_or_domain_links():
+    left = frame(["l1"], ["proxeus"], [""], [""])
+    right = frame(["r1"], ["proxeus"], [""], [""])
+    assert scored(left, right).loc["r1", "score"] >= THRESHOLD
+
+
+def test_city_and_domain_only_add_evidence():
+    left = frame(["l1"], ["proxeus"], ["zug"], [""])
+    right = frame(["r1", "r2", "r3"], ["proxeus"] * 3, ["zug", "", "geneve"], ["proxeus", "", ""])
+    scores = scored(left, right)["score"]
+    assert scores["r1"] == pytest.approx(1.0)
+    assert scores["r2"] == pytest.approx(1.0)
+    assert scores["r1"] > scores["r3"]
+
+
+def test_different_name_does_not_link():
+    left = frame(["l1"], ["proxeus"], ["zug"], [""])
+    right = frame(["r1"], ["proxeus analytics labs"], ["zug"], [""])
+    assert scored(left, right).loc["r1", "score"] < THRESHOLD
+
+
+COMPANIES = [
+    ("l1", "Swiss AB AG", ""), ("l2", "Swiss CD GmbH", ""), ("l3", "Swiss EF SA", ""),
+    ("l4", "Proxeus AG", "Zug"), ("l5", "Medbot Robotics SA", "Lausanne"),
+]
+ORGANIZATIONS = [
+    ("r1", "Swiss AB", ""), ("r2", "Swiss CD", ""), ("r3", "Swiss GH", ""),
+    ("r4", "Proxeus", "Zug"), ("r5", "Medbot Robotic", "Lausanne"), ("r6", "Unrelated Labs", "Bern"),
+]
+
+
+def make_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE startupticker_companies (_key TEXT, _row_hash TEXT, Title TEXT, City TEXT, '
+                 '_deleted_at TEXT)')
+    conn.execute('CREATE TABLE crunchbase_organizations (_key TEXT, _row_hash TEXT, name TEXT, city TEXT, '
+                 'domain TEXT, _deleted_at TEXT)')
+    conn.executemany("INSERT INTO startupticker_companies VALUES (?, 'h', ?, ?, NULL)", COMPANIES)
+    conn.executemany("INSERT INTO crunchbase_organizations VALUES (?, 'h', ?, ?, NULL, NULL)", ORGANIZATIONS)
+    conn.commit()
+    return conn
+
+
+def links(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT startupticker_key, crunchbase_key, score FROM company_links ORDER BY 1").fetchall()
+    conn.close()
+    return rows
+
+
+def test_incremental_run_gives_the_links_of_a_full_run(tmp_path, monkeypatch):
+    # "swiss" pairs 3 x 3 records: too generic for a full run
+    monkeypatch.setattr("entity_resolution.MAX_BLOCK_PAIRS", 4)
+    incremental, full = str(tmp_path / "incremental.db"), str(tmp_path / "full.db")
+    for path in (incremental, full):
+        make_db(path).close()
+    link_companies(incremental)
+
+    for path in (incremental, full):
+        conn = sqlite3.connect(path)
+        conn.execute("UPDATE startupticker_companies SET _row_hash = 'h2' WHERE _key = 'l1'")
+        conn.execute("UPDATE crunchbase_organizations SET name = 'Medbot Robotics', _row_hash = 'h2' "
+                     "WHERE _key = 'r5'")
+        conn.execute("UPDATE startupticker_companies SET City = 'Zug', _row_hash = 'h2' WHERE _key = 'l4'")
+        conn.execute("INSERT INTO crunchbase_organizations VALUES ('r7', 'h', 'Proxeus', NULL, NULL, NULL)")
+        conn.commit()
+        conn.close()
+    summary = link_companies(incremental)
+    link_companies(full, full=True)
+
+    assert links(incremental) == links(full)
+    assert {l for l, _, _ in links(full)} == {"l4", "l5"}
+    assert summary["companies_rematched"] == 3
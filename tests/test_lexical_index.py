@@ -0,0 +1,102 @@
+import sqlite3
+
+import pytest
+
+from lexical_index import LexicalIndex, tokenize
+
+COMPANIES = [
+    ("c1", "Medbot", "surgical robots for knee operations", "Zürich", 2018),
+    ("c2", "Farmsense", "soil sensors for vineyards", "VD", 2020),
+    ("c3", "Robotics Lab", "robotic arms for warehouses", "GE", 2021),
+    ("c4", "Payfast", "instant payments for online shops", "Zürich", 2019),
+]
+DEALS = [
+    ("d1", "Medbot", "seed round for the robot platform", "Zürich", "seed", "2021-03-01"),
+    ("d2", "Payfast", "series A for the payment platform", "VD", "early stage", "2022-06-01"),
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "startups_clean.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE startupticker_companies (_key TEXT, _row_hash TEXT, Title TEXT, Highlights TEXT, "
+                 "Comment TEXT, Canton TEXT, Year INTEGER, _deleted_at TEXT)")
+    conn.execute('CREATE TABLE startupticker_deals (_key TEXT, _row_hash TEXT, Company TEXT, Comment TEXT, '
+                 'Investors TEXT, URL TEXT, Canton TEXT, Phase TEXT, "Date of the funding round" TEXT, '
+                 '_deleted_at TEXT)')
+    conn.executemany("INSERT INTO startupticker_companies VALUES (?, 'h1', ?, NULL, ?, ?, ?, NULL)", COMPANIES)
+    conn.executemany("INSERT INTO startupticker_deals VALUES (?, 'h1', ?, ?, NULL, NULL, ?, ?, ?, NULL)", DEALS)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def execute(db_path, sql, *params):
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def keys(hits):
+    return sorted(key for _, _, key, *_ in hits)
+
+
+def test_tokenize_folds_accents_and_drops_stopwords():
+    assert tokenize("Société für Zürich, https://www.medbot.ch") == ["societe", "zurich", "medbot"]
+
+
+def test_update_masks_changed_and_deleted_rows(db_path, tmp_path):
+    index = LexicalIndex(str(tmp_path / "index"))
+    assert index.update(db_path) == (6, 0)
+    assert keys(index.search("knee")) == ["c1"]
+
+    execute(db_path, "UPDATE startupticker_companies SET Comment = 'hip implants', _row_hash = 'h2' "
+                     "WHERE _key = 'c1'")
+    execute(db_path, "UPDATE startupticker_companies SET _deleted_at = '2024-01-01' WHERE _key = 'c2'")
+    assert index.update(db_path) == (1, 1)
+    assert index.search("knee") == [] and index.search("vineyards") == []
+    assert keys(index.search("hip")) == ["c1"]
+    assert index.live_docs() == 5 and len(index.segments) == 2
+
+    # a run without changes keeps the generation and its deletion files
+    generation = index.manifest["generation"]
+    assert index.update(db_path) == (0, 0)
+    assert index.manifest["generation"] == generation
+    assert keys(LexicalIndex(str(tmp_path / "index")).search("hip")) == ["c1"]
+
+
+def test_merge_keeps_the_results_and_drops_the_deleted_docs(db_path, tmp_path):
+    index = LexicalIndex(str(tmp_path / "index"))
+    index.update(db_path)
+    execute(db_path, "UPDATE startupticker_deals SET Comment = 'robot seed round', _row_hash = 'h2' "
+                     "WHERE _key = 'd2'")
+    index.update(db_path)
+    before = index.search("robot* platform", k=10)
+
+    index.merge()
+    assert len(index.segments) == 1 and index.segments[0].alive.all()
+    assert index.live_docs() == len(index.segments[0].lengths) == 6
+    after = index.search("robot* platform", k=10)
+    assert [hit[1:] for hit in after] == [hit[1:] for hit in before]
+    assert [hit[0] for hit in after] == pytest.approx([hit[0] for hit in before])
+
+
+def test_prefix_query_matches_every_term_of_the_prefix(db_path, tmp_path):
+    index = LexicalIndex(str(tmp_path / "index"))
+    index.update(db_path)
+    assert keys(index.search("robot")) == ["d1"]
+    assert keys(index.search("robot*")) == ["c1", "c3", "d1"]
+
+
+def test_facet_filters(db_path, tmp_path):
+    index = LexicalIndex(str(tmp_path / "index"))
+    index.update(db_path)
+    assert keys(index.search("platform", canton=["zurich"])) == ["d1"]
+    assert keys(index.search("robot*", canton=["ZÜRICH"])) == ["c1", "d1"]
+    assert keys(index.search("robot*", table="startupticker_companies")) == ["c1", "c3"]
+    assert keys(index.search("platform", phase=["early stage"])) == ["d2"]
+    assert keys(index.search("robot* payments", year_from=2019, year_to=2020)) == ["c4"]
+    hit = index.search("knee")[0]
+    assert hit[1:] == ("startupticker_companies", "c1", "zurich", "", 2018)
@@ -0,0 +1,104 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.prompts import ChatPromptTemplate
+
+import llm_cache
+import llmm
+from llm_cache import CachedChatModel, LLMCache
+
+PROMPT = ChatPromptTemplate.from_messages([("system", "Tag the record."), ("human", "{record}")])
+ANSWERS = [f"answer {i}" for i in range(10)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm_cache.db"))
+    yield cache
+    cache.close()
+
+
+def cached_model(cache, **kwargs):
+    llm = llmm.FakeChatModel(responses=ANSWERS, **kwargs)
+    return llm, CachedChatModel(llm, cache, "fake")
+
+
+def test_concurrent_identical_ainvoke_make_one_call(cache):
+    llm, model = cached_model(cache, latency=0.1)
+    prompt = PROMPT.invoke({"record": "Proxeus AG, blockchain"})
+
+    async def run():
+        return await asyncio.gather(*(model.ainvoke(prompt) for _ in range(5)))
+
+    answers = asyncio.run(run())
+    assert [a.content for a in answers] == ["answer 0"] * 5
+    assert llm.i == 1
+    assert cache.stats == {"hits": 0, "misses": 5, "deduplicated": 4}
+
+
+def test_concurrent_identical_invoke_in_threads_make_one_call(cache):
+    llm, model = cached_model(cache, sleep=0.1)
+    prompt = PROMPT.invoke({"record": "Proxeus AG, blockchain"})
+    with ThreadPoolExecutor(5) as pool:
+        answers = list(pool.map(lambda _: model.invoke(prompt), range(5)))
+    assert [a.content for a in answers] == ["answer 0"] * 5
+    assert llm.i == 1
+    assert cache.stats["deduplicated"] == 4
+
+
+def test_hit_after_put_and_same_key_for_every_input_form(cache):
+    llm, model = cached_model(cache)
+    chain = PROMPT | model
+    assert chain.invoke({"record": "a"}).content == "answer 0"
+    assert chain.invoke({"record": "a"}).content == "answer 0"
+    assert chain.invoke({"record": "b"}).content == "answer 1"
+    assert llm.i == 2 and cache.stats["hits"] == 1
+
+    messages = PROMPT.invoke({"record": "a"}).to_messages()
+    assert model.key(messages) == model.key(PROMPT.invoke({"record": "a"}))
+    assert model.key("a") == model.key([("human", "a")])
+    cache.put(model.key("c"), "stored")
+    assert model.invoke("c").content == "stored" and llm.i == 2
+
+
+def test_expired_entries_miss_and_are_evicted(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm_cache.db"), max_age_days=1)
+    cache.put(("fake", 0.0, "old"), "old answer")
+    clock.now += 0.5 * 86400
+    cache.put(("fake", 0.0, "new"), "new answer")
+    assert cache.get(("fake", 0.0, "old")) == "old answer"
+
+    clock.now += 0.6 * 86400
+    assert cache.get(("fake", 0.0, "old")) is None
+    assert cache.get(("fake", 0.0, "new")) == "new answer"
+    assert cache.evict() == 1
+    assert cache.summary()["entries"] == 1
+    cache.close()
+
+
+def test_least_recently_used_entries_go_first(tmp_path, clock):
+    cache = LLMCache(str(tmp_path / "llm_cache.db"), max_entries=2)
+    for name in ("a", "b", "c"):
+        cache.put(("fake", 0.0, name), name)
+        clock.now += 1
+    # "a" is used again, "b" is now the least recently used
+    assert cache.get(("fake", 0.0, "a")) == "a"
+    assert cache.evict() == 1
+    assert [cache.get(("fake", 0.0, name)) for name in ("a", "b", "c")] == ["a", None, "c"]
+    cache.close()
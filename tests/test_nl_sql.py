@@ -0,0 +1,130 @@
+import sqlite3
+
+import pytest
+
+import llmm
+from nl_sql import FAKE_SQL, QueryEngine, normalize_question
+
+DEALS = [
+    ("seed-1", "payfast", 2.0, "vd", "seed", "2021-03-01 00:00:00"),
+    ("seed-2", "payfast", 4.0, "vd", "seed", "2022-06-01 00:00:00"),
+    ("seed-3", "medbot", 9.0, "vd", "seed", "2022-01-01 00:00:00"),
+    ("late-1", "payfast", 30.0, "vd", "later stage", "2023-01-01 00:00:00"),
+]
+UNSAFE = {
+    "delete in a CTE": "WITH doomed AS (SELECT _key FROM startupticker_deals) "
+                       "DELETE FROM startupticker_deals WHERE _key IN doomed",
+    "sqlite_master": "SELECT sql FROM sqlite_master",
+    "load_extension": "SELECT load_extension('/tmp/evil.so')",
+    "several statements": "SELECT 1; DROP TABLE startupticker_deals",
+    "pragma function": "SELECT * FROM pragma_database_list",
+}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "startups_clean.db")
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE startupticker_companies '
+                 '(_key TEXT, _row_hash TEXT, Title TEXT, Industry TEXT, _deleted_at TEXT)')
+    conn.execute('CREATE TABLE startupticker_deals (_key TEXT, _row_hash TEXT, Company TEXT, Amount REAL, '
+                 'Canton TEXT, Phase TEXT, "Date of the funding round" TEXT, _deleted_at TEXT)')
+    conn.executemany("INSERT INTO startupticker_companies VALUES (?, '', ?, ?, NULL)",
+                     [("c1", "payfast", "ict (fintech)"), ("c2", "medbot", "life-sciences")])
+    conn.executemany("INSERT INTO startupticker_deals VALUES (?, '', ?, ?, ?, ?, ?, NULL)", DEALS)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def make_engine(db_path, tmp_path, responses=None, **kwargs):
+    llm = llmm.get_llm(fake_responses=responses or [f"```sql\n{FAKE_SQL}\n```"])
+    return QueryEngine(db_path, llm, "fake", str(tmp_path / "nl_sql_cache.db"), **kwargs)
+
+
+@pytest.mark.parametrize("sql", UNSAFE.values(), ids=UNSAFE.keys())
+def test_unsafe_statements_are_refused(db_path, tmp_path, sql):
+    engine = make_engine(db_path, tmp_path)
+    with pytest.raises((sqlite3.Error, ValueError)):
+        engine.run_sql(sql)
+    assert engine.run_sql("SELECT COUNT(*) FROM startupticker_deals")[1] == [[len(DEALS)]]
+    engine.close()
+
+
+def test_only_select_passes_validation(db_path, tmp_path):
+    engine = make_engine(db_path, tmp_path)
+    for sql in ("DELETE FROM startupticker_deals", "PRAGMA query_only = OFF", "ATTACH 'x.db' AS x"):
+        with pytest.raises(ValueError):
+            engine.validate(sql)
+    engine.close()
+
+
+def test_runaway_recursion_hits_the_time_limit(db_path, tmp_path):
+    engine = make_engine(db_path, tmp_path, timeout=0.2)
+    with pytest.raises(sqlite3.OperationalError):
+        engine.run_sql("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n")
+    # the row cap stops an endless result without an aggregate
+    engine.max_rows = 5
+    columns, rows = engine.run_sql("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT i FROM n")
+    assert columns == ["i"] and rows == [[1], [2], [3], [4], [5]]
+    engine.close()
+
+
+def test_rephrased_questions_share_a_plan(db_path, tmp_path):
+    assert (normalize_question("Median seed round in Vaud fintech since 2020?")
+            == normalize_question("median  seed round Vaud fintech since 2020"))
+    engine = make_engine(db_path, tmp_path)
+    first = engine.ask("Median seed round in Vaud fintech since 2020?")
+    second = engine.ask("median seed round Vaud fintech since 2020")
+    assert not first["cached_plan"] and second["cached_plan"] and second["cached_result"]
+    assert first["rows"] == second["rows"] == [[3.0, 2]]
+    assert not engine.ask("median later stage round in Vaud")["cached_plan"]
+    engine.close()
+
+
+def test_a_failing_statement_is_fixed_once(db_path, tmp_path):
+    engine = make_engine(db_path, tmp_path, ["SELECT nope FROM startupticker_deals", FAKE_SQL])
+    answer = engine.ask("median seed round in Vaud fintech")
+    assert answer["sql"] == FAKE_SQL and answer["rows"] == [[3.0, 2]]
+    engine.close()
+
+
+def test_a_write_to_the_database_invalidates_the_results(db_path, tmp_path):
+    engine = make_engine(db_path, tmp_path)
+    question = "median seed round in Vaud fintech since 2020"
+    assert engine.ask(question)["rows"] == [[3.0, 2]]
+    assert engine.ask(question)["cached_result"]
+
+    # no new categorical value (the dates of the fixture are few enough to be listed), the summary holds
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO startupticker_deals VALUES "
+                 "('seed-4', '', 'payfast', 12.0, 'vd', 'seed', '2022-06-01 00:00:00', NULL)")
+    conn.commit()
+    conn.close()
+
+    answer = engine.ask(question)
+    assert answer["cached_plan"] and not answer["cached_result"]
+    assert answer["rows"] == [[4.0, 3]]
+    engine.close()
+
+
+def test_a_new_category_value_reaches_the_schema(db_path, tmp_path):
+    engine = make_engine(db_path, tmp_path)
+    question = "median seed round in Vaud fintech since 2020"
+    engine.ask(question)
+    assert "'vd'" in engine.schema and "'ge'" not in engine.schema
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO startupticker_deals VALUES "
+                 "('seed-5', '', 'medbot', 3.0, 'ge', 'seed', '2024-02-01 00:00:00', NULL)")
+    conn.commit()
+    conn.close()
+
+    # the summary of the running engine and of a new one shows the new canton, the plan is made again
+    answer = engine.ask(question)
+    assert not answer["cached_plan"] and answer["rows"] == [[3.0, 2]]
+    assert "'ge'" in engine.schema
+    other = make_engine(db_path, tmp_path)
+    assert other.schema == engine.schema
+    other.close()
+    engine.close()
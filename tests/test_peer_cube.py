@@ -0,0 +1,114 @@
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import peer_cube
+from peer_cube import ALPHA, Sketch, bucket
+
+SECTORS = ["biotech", "cleantech", "ict (fintech)"]
+CANTONS = ["vd", "zh", "ge"]
+PHASES = ["seed", "early stage", "later stage"]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    rng = np.random.default_rng(7)
+    companies = [(f"company {i}", SECTORS[i % 3], int(rng.integers(2005, 2020))) for i in range(15)]
+    # a founding year after its rounds: a negative age_at_funding
+    companies.append(("time traveller", "biotech", 2030))
+    deals = []
+    for i in range(80):
+        company = companies[int(rng.integers(len(companies)))][0]
+        date = pd.Timestamp("2012-01-01") + pd.Timedelta(days=int(rng.integers(0, 4000)))
+        deals.append((f"d{i:03d}", company, CANTONS[i % 3], PHASES[int(rng.integers(3))],
+                      date.strftime("%Y-%m-%d %H:%M:%S"), float(rng.lognormal(1, 1)),
+                      float(rng.lognormal(3, 1)) if i % 4 else None))
+    deals.append(("d999", "time traveller", "vd", "seed", "2021-05-01 00:00:00", 2.0, None))
+
+    path = str(tmp_path / "startups_clean.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE startupticker_companies (_key TEXT, Title TEXT, Industry TEXT, Year INTEGER, "
+                 "_deleted_at TEXT)")
+    conn.execute('CREATE TABLE startupticker_deals (_key TEXT, Company TEXT, Canton TEXT, Phase TEXT, '
+                 '"Date of the funding round" TEXT, Amount REAL, Valuation REAL, _deleted_at TEXT)')
+    conn.executemany("INSERT INTO startupticker_companies VALUES (?, ?, ?, ?, NULL)",
+                     [(title, title, sector, year) for title, sector, year in companies])
+    conn.executemany("INSERT INTO startupticker_deals VALUES (?, ?, ?, ?, ?, ?, ?, NULL)", deals)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def table(path, name, order):
+    conn = sqlite3.connect(path)
+    df = pd.read_sql(f"SELECT * FROM {name} ORDER BY {order}", conn)
+    conn.close()
+    return df
+
+
+def test_refresh_matches_a_full_rebuild(db_path, tmp_path):
+    peer_cube.refresh(db_path)
+    facts = table(db_path, "cube_facts", "_key").set_index("_key")
+    # the first round of "company 3", and the one that follows it
+    conn = sqlite3.connect(db_path)
+    first, second = conn.execute(
+        'SELECT _key, "Date of the funding round" FROM startupticker_deals WHERE Company = \'company 3\' '
+        'ORDER BY 2 LIMIT 2').fetchall()
+    conn.execute("UPDATE startupticker_deals SET Amount = Amount * 3, Canton = 'be' WHERE _key = 'd010'")
+    conn.execute("UPDATE startupticker_deals SET _deleted_at = '2024-01-01' WHERE _key = 'd020'")
+    # a new round a year before the first one of company 3
+    earlier = (pd.Timestamp(first[1]) - pd.Timedelta(days=365)).strftime("%Y-%m-%d %H:%M:%S")
+    conn.execute("INSERT INTO startupticker_deals VALUES ('d500', 'company 3', 'zh', 'seed', ?, 1.5, NULL, NULL)",
+                 (earlier,))
+    conn.commit()
+    conn.close()
+
+    full_path = str(tmp_path / "full.db")
+    shutil.copy(db_path, full_path)
+    summary = peer_cube.refresh(db_path)
+    peer_cube.refresh(full_path, full=True)
+
+    # the new round, the changed and the deleted deal, the old first round whose gap appears
+    # and the round after the deleted one
+    assert 4 <= summary["facts"] <= 5
+    refreshed = table(db_path, "cube_facts", "_key").set_index("_key")
+    assert np.isnan(facts.loc[first[0], "days_between_rounds"])
+    assert refreshed.loc[first[0], "days_between_rounds"] == 365
+    assert refreshed.loc[second[0], "days_between_rounds"] == facts.loc[second[0], "days_between_rounds"]
+
+    order = "sector, canton, phase, year, metric"
+    pd.testing.assert_frame_equal(table(db_path, "benchmark_cube", order), table(full_path, "benchmark_cube", order))
+    pd.testing.assert_frame_equal(refreshed.reset_index(), table(full_path, "cube_facts", "_key"))
+
+
+def test_negative_metrics_are_dropped(db_path):
+    peer_cube.refresh(db_path)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT age_at_funding FROM cube_facts WHERE _key = 'd999'").fetchone() == (None,)
+    n, _, lo, _, sketch = peer_cube.cell(conn, "age_at_funding")
+    conn.close()
+    assert lo >= 0 and sketch.n == n
+
+
+def test_sketch_quantiles_and_ranks():
+    values = np.random.default_rng(3).lognormal(2, 1.5, 5000)
+    indexes = bucket(values).astype(int)
+    sketch = Sketch({int(i): int(c) for i, c in zip(*np.unique(indexes, return_counts=True))})
+    assert sketch.n == len(values)
+    for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        expected = np.percentile(values, 100 * q, method="lower")
+        assert abs(sketch.quantile(q) - expected) <= ALPHA * expected
+
+    ordered = np.sort(values)
+    for value in np.percentile(values, [5, 30, 50, 80, 95]):
+        # the sketch cannot tell apart the values of one bucket
+        low = np.searchsorted(ordered, value / (1 + 2 * ALPHA)) / len(values)
+        high = np.searchsorted(ordered, value * (1 + 2 * ALPHA)) / len(values)
+        assert low <= sketch.rank(value) <= high
+
+    with_zeros = Sketch(sketch.buckets, zero=5000)
+    assert with_zeros.quantile(0.25) == 0.0 and with_zeros.rank(0) == 0.25
+    assert Sketch.loads(sketch.dumps()).buckets == sketch.buckets
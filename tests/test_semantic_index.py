@@ -0,0 +1,116 @@
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+from semantic_index import HashingEncoder, SemanticIndex
+
+COMPANIES = [
+    ("c1", "Dronelink", "drone delivery of medicines to hospitals"),
+    ("c2", "Solarfab", "thin film solar panels for facades"),
+    ("c3", "Payfast", "instant payments for online shops"),
+    ("c4", "Medbot", "surgical robots for knee operations"),
+    ("c5", "Aquaclean", "water filtration membranes for villages"),
+    ("c6", "Farmsense", "soil sensors for vineyards and orchards"),
+]
+DEALS = [
+    ("d1", "Dronelink", "seed round led by a hospital group"),
+    ("d2", "Payfast", "series A for the payment platform"),
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "startups_clean.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE startupticker_companies "
+                 "(_key TEXT, _row_hash TEXT, Title TEXT, Highlights TEXT, Comment TEXT, _deleted_at TEXT)")
+    conn.execute("CREATE TABLE startupticker_deals "
+                 "(_key TEXT, _row_hash TEXT, Company TEXT, Comment TEXT, _deleted_at TEXT)")
+    conn.executemany("INSERT INTO startupticker_companies VALUES (?, 'h1', ?, NULL, ?, NULL)", COMPANIES)
+    conn.executemany("INSERT INTO startupticker_deals VALUES (?, 'h1', ?, ?, NULL)", DEALS)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def open_index(tmp_path):
+    return SemanticIndex(str(tmp_path / "index"), HashingEncoder(256))
+
+
+def live_keys(index):
+    return sorted(key for i, (_, key, _) in enumerate(index.ids) if index.alive[i])
+
+
+def execute(db_path, sql, *params):
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def test_update_adds_and_retires(db_path, tmp_path):
+    index = open_index(tmp_path)
+    assert index.update(db_path) == (8, 0)
+    assert index.update(db_path) == (0, 0)
+
+    execute(db_path, "UPDATE startupticker_companies SET Comment = 'drone inspection of bridges', "
+                     "_row_hash = 'h2' WHERE _key = 'c1'")
+    execute(db_path, "UPDATE startupticker_deals SET _deleted_at = '2024-01-01' WHERE _key = 'd2'")
+    assert index.update(db_path) == (1, 2)
+    assert index.search("drone inspection of bridges", 1)[0][2] == "c1"
+
+    # a row whose text became empty is retired, not kept with its old text
+    execute(db_path, "UPDATE startupticker_deals SET Company = NULL, Comment = NULL, _row_hash = 'h2' "
+                     "WHERE _key = 'd1'")
+    assert index.update(db_path) == (0, 1)
+    assert live_keys(index) == ["c1", "c2", "c3", "c4", "c5", "c6"]
+    assert {key for _, _, key in index.search("seed round led by a hospital group", 10)} <= set(live_keys(index))
+
+    # reopened from disk
+    assert live_keys(open_index(tmp_path)) == live_keys(index)
+
+
+def test_exact_and_approximate_top_hit(db_path, tmp_path):
+    index = open_index(tmp_path)
+    index.build_ann()  # empty index: nothing to build
+    assert index.ann is None
+    index.update(db_path)
+    index.build_ann(n_lists=3)
+    for key, title, comment in COMPANIES:
+        query = f"{title}. {comment}"
+        exact = index.search(query, 1, approximate=False)
+        approximate = index.search(query, 1, nprobe=1)
+        assert exact[0][2] == approximate[0][2] == key
+    assert all(table == "startupticker_deals" for _, table, _ in index.search("payment", 5, "startupticker_deals"))
+
+
+def test_interrupted_update_is_recovered(db_path, tmp_path, monkeypatch):
+    index = open_index(tmp_path)
+    index.update(db_path)
+    n = index.meta["count"]
+
+    # an add() that died after writing the vectors but before meta.json
+    with open(index._file("vectors.bin"), "ab") as f:
+        f.write(np.zeros(3 * index.dim, dtype=index.dtype).tobytes())
+    with open(index._file("alive.u8"), "ab") as f:
+        f.write(b"\x01" * 3)
+    with open(index._file("ids.tsv"), "a", encoding="utf-8") as f:
+        f.write("startupticker_companies\tc9\th1\n" * 3)
+    index = open_index(tmp_path)
+    assert index.meta["count"] == n and len(index.ids) == n
+    assert os.path.getsize(index._file("vectors.bin")) == n * index.dim * index.dtype.itemsize
+    assert os.path.getsize(index._file("alive.u8")) == n
+
+    # an update that died between add() and remove(): the old vector is still alive
+    execute(db_path, "UPDATE startupticker_companies SET Comment = 'drone inspection', _row_hash = 'h2' "
+                     "WHERE _key = 'c1'")
+    monkeypatch.setattr(SemanticIndex, "remove", lambda self, positions: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        index.update(db_path)
+    monkeypatch.undo()
+    index = open_index(tmp_path)
+    assert live_keys(index).count("c1") == 2
+    assert index.update(db_path) == (0, 1)
+    assert live_keys(index).count("c1") == 1
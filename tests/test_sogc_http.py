@@ -0,0 +1,133 @@
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import sogc_crawl
+from sogc_http import HttpEngine, combine_exports
+
+OK_UID = "CHE-111.111.111"
+FLAKY_UID = "CHE-222.222.222"  # the first search fails with 503
+BROKEN_UID = "CHE-333.333.333"  # the export always fails with 500
+EMPTY_UID = "CHE-444.444.444"
+
+PUBLICATIONS = {
+    OK_UID: ["ok-1", "ok-2", "ok-3"],
+    FLAKY_UID: ["flaky-1"],
+    BROKEN_UID: ["broken-1"],
+    EMPTY_UID: [],
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """The two endpoints of the SOGC API, paged by 2."""
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body=b"", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        calls = self.server.calls
+        if url.path == "/api/v1/publications":
+            query = parse_qs(url.query)
+            uid, page = query["uid"][0], int(query["pageRequest.page"][0])
+            calls[("search", uid)] += 1
+            if uid == FLAKY_UID and calls[("search", uid)] == 1:
+                return self.send(503)
+            ids = PUBLICATIONS[uid][2 * page:2 * page + 2]
+            body = {"content": [{"meta": {"id": i}} for i in ids], "total": len(PUBLICATIONS[uid])}
+            return self.send(200, json.dumps(body).encode())
+        publication_id = url.path.split("/")[-2]
+        calls[("export", publication_id)] += 1
+        if publication_id.startswith("broken"):
+            return self.send(500)
+        xml = f'<?xml version="1.0" encoding="UTF-8"?>\n<publication id="{publication_id}"/>'
+        self.send(200, xml.encode(), "application/xml")
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr("sogc_http.PAGE_SIZE", 2)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    httpd.calls = Counter()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def base_url(httpd):
+    return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def test_combine_exports_wraps_the_xml_of_every_publication():
+    data = combine_exports(OK_UID, [b'<?xml version="1.0"?>\n<a/>', b"<b/>"], "xml")
+    assert data.count(b"<?xml") == 1
+    assert b'<publications uid="CHE-111.111.111">\n<a/>\n<b/>\n</publications>' in data
+    # nothing to export is a result, not an error
+    assert combine_exports(OK_UID, [], "pdf") == b""
+    with pytest.raises(ValueError):
+        combine_exports(OK_UID, [], "csv")
+
+
+def test_engine_pages_through_search_and_reports_errors(server, tmp_path):
+    results = HttpEngine(4, str(tmp_path), base_url(server)).download([OK_UID, BROKEN_UID, EMPTY_UID])
+
+    with open(results[OK_UID], "rb") as f:
+        data = f.read()
+    assert [data.count(f'id="ok-{i}"'.encode()) for i in (1, 2, 3)] == [1, 1, 1]
+    assert server.calls[("search", OK_UID)] == 2
+    # an error status fails the UID without leaving a partial file
+    assert results[BROKEN_UID] is None
+    assert not (tmp_path / f"{BROKEN_UID}.xml").exists()
+    assert not list(tmp_path.glob("*.part"))
+    with open(results[EMPTY_UID], "rb") as f:
+        assert f.read().endswith(b'<publications uid="CHE-444.444.444">\n\n</publications>\n')
+
+
+def test_crawl_retries_failed_uids(server, tmp_path):
+    manifest = tmp_path / "manifest.jsonl"
+    counts = sogc_crawl.crawl([FLAKY_UID, BROKEN_UID], download_dir=str(tmp_path), manifest_path=str(manifest),
+                              rate=0, retries=2, backoff=0.01, base_url=base_url(server))
+
+    assert counts == {"ok": 1, "skipped": 0, "failed": 1}
+    assert server.calls[("search", FLAKY_UID)] == 2
+    assert server.calls[("export", "broken-1")] == 3
+    last = {}
+    with open(manifest, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            last[record["uid"]] = record
+    assert last[FLAKY_UID]["status"] == "ok" and last[FLAKY_UID]["attempt"] == 2
+    assert last[BROKEN_UID]["status"] == "failed" and last[BROKEN_UID]["attempt"] == 3
+
+    # a second run skips the fresh download and only retries the failure
+    counts = sogc_crawl.crawl([FLAKY_UID, BROKEN_UID], download_dir=str(tmp_path), manifest_path=str(manifest),
+                              rate=0, retries=0, base_url=base_url(server))
+    assert counts == {"ok": 0, "skipped": 1, "failed": 1}
+    assert server.calls[("search", FLAKY_UID)] == 2
+
+
+def test_crawl_does_not_retry_a_uid_without_publications_as_pdf(server, tmp_path):
+    manifest = tmp_path / "manifest.jsonl"
+    counts = sogc_crawl.crawl([EMPTY_UID], output_format="pdf", download_dir=str(tmp_path),
+                              manifest_path=str(manifest), rate=0, retries=2, backoff=0.01, base_url=base_url(server))
+    assert counts == {"ok": 1, "skipped": 0, "failed": 0}
+    assert server.calls[("search", EMPTY_UID)] == 1
+    assert (tmp_path / f"{EMPTY_UID}.pdf").read_bytes() == b""
+
+    counts = sogc_crawl.crawl([EMPTY_UID], output_format="pdf", download_dir=str(tmp_path),
+                              manifest_path=str(manifest), rate=0, base_url=base_url(server))
+    assert counts == {"ok": 0, "skipped": 1, "failed": 0}
+    assert server.calls[("search", EMPTY_UID)] == 1
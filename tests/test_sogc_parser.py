@@ -0,0 +1,98 @@
+import os
+import shutil
+
+import pytest
+
+import sogc_parser
+from sogc_parser import parse_document, parse_person, parse_publication_text, publications_from_pdf
+
+PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   "sogc_downloads", "CHE-215.350.964.pdf")
+UID = "CHE-215.350.964"
+
+
+def test_pdf_publications():
+    publications = publications_from_pdf(PDF)
+    assert len(publications) == 6
+    assert {p["kind"] for p in publications} == {"change"}
+    assert publications[0]["publication_id"] == "2061/2020-04-06"
+    # the renaming publication: the header wraps over two lines
+    assert [p["company"] for p in publications[:3]] == ["Saiba GmbH", "Saiba AG", "Saiba AG"]
+    assert all(p["text"].startswith(("Saiba GmbH, in Freienbach", "Saiba AG, in Freienbach")) for p in publications)
+
+
+def test_empty_pdf_of_a_uid_without_publications(tmp_path):
+    path = tmp_path / "CHE-444.444.444.pdf"
+    path.write_bytes(b"")
+    uid, rows, error = parse_document(("CHE-444.444.444", str(path), "pdf"))
+    assert error is None and not any(rows.values())
+
+
+def test_pdf_rows():
+    uid, rows, error = parse_document((UID, PDF, "pdf"))
+    assert error is None
+    assert {table: len(r) for table, r in rows.items()} == {
+        "sogc_publications": 6, "sogc_people": 19, "sogc_address_changes": 1, "sogc_liquidations": 0}
+    assert rows["sogc_address_changes"][0][1:] == (
+        "2274/2020-04-20", "2020-04-20", "Bahnhofstrasse 13, 8808 Pfäffikon SZ")
+    people = {(r[1], r[3], r[4]): r for r in rows["sogc_people"]}
+    bachmann = people[("2061/2020-04-06", "registered", "Bachmann, Martin Fabian")]
+    assert bachmann[6:11] == ("Matzingen und Winterthur", "Zell (ZH)", "Gesellschafter und Geschäftsführer",
+                              "management", "mit Einzelunterschrift")
+    assert people[("2061/2020-04-06", "removed", "TYLOCC Trust Holding AG")][5] == "CHE-101.598.894"
+
+
+@pytest.mark.parametrize("entry, expected", [
+    ("Bachmann, Prof. Dr. Martin Fabian, von Matzingen, in Zell (ZH), Präsident, mit Einzelunterschrift",
+     {"name": "Bachmann, Martin Fabian", "origin": "Matzingen", "residence": "Zell (ZH)", "role": "Präsident",
+      "role_type": "board", "signature": "mit Einzelunterschrift", "entity_uid": None}),
+    ("Jennings, Gary, australischer Staatsangehöriger, in Zürich, Gesellschafter, mit 20 Stammanteilen "
+     "[bisher: ohne Stammanteil]",
+     {"name": "Jennings, Gary", "origin": "australischer Staatsangehöriger", "residence": "Zürich",
+      "role": "Gesellschafter", "role_type": "partner", "signature": None, "entity_uid": None}),
+    ("RevisionsPartner AG (CHE-148.393.425), in Chur, Revisionsstelle",
+     {"name": "RevisionsPartner AG", "entity_uid": "CHE-148.393.425", "origin": None, "residence": "Chur",
+      "role": "Revisionsstelle", "role_type": "auditor", "signature": None}),
+    ("Dupont, Jean, de Genève, à Lausanne, administrateur, avec signature individuelle",
+     {"name": "Dupont, Jean", "origin": "Genève", "residence": "Lausanne", "role": "administrateur",
+      "role_type": "board", "signature": "avec signature individuelle", "entity_uid": None}),
+])
+def test_parse_person(entry, expected):
+    assert parse_person(entry) == expected
+
+
+def test_address_change_outside_the_people_sections():
+    people, addresses, events = parse_publication_text(
+        "Muster AG, in Zug, CHE-123.456.789, Aktiengesellschaft. Sitz neu: Baar. Domizil neu: St. Gallerstrasse 4, "
+        "6340 Baar. Eingetragene Personen neu oder mutierend: Muster, Hans, von Bern, in Baar, Mitglied, "
+        "mit Kollektivunterschrift zu zweien.")
+    assert addresses == ["Baar", "St. Gallerstrasse 4, 6340 Baar"]
+    assert [(p["action"], p["name"], p["residence"]) for p in people] == [("registered", "Muster, Hans", "Baar")]
+    assert events == []
+
+
+def test_liquidation_events():
+    _, _, events = parse_publication_text(
+        "Muster GmbH in Liquidation, in Bern, CHE-123.456.789. Die Gesellschaft ist mit Entscheid des "
+        "Konkursgerichts vom 01.02.2024 infolge Konkurses aufgelöst. Ausgeschiedene Personen und erloschene "
+        "Unterschriften: Muster, Hans, von Bern, in Bern, Geschäftsführer, mit Einzelunterschrift.")
+    assert [event for event, _ in events] == ["bankruptcy", "dissolution"]
+    assert events[0][1].startswith("Die Gesellschaft ist mit Entscheid")
+
+    _, _, events = parse_publication_text("Exemple Sàrl en liquidation, à Genève. La société est radiée.")
+    assert events == [("deletion", "La société est radiée.")]
+
+
+def test_unchanged_document_is_skipped(tmp_path):
+    downloads, db_path = tmp_path / "downloads", str(tmp_path / "startups_clean.db")
+    downloads.mkdir()
+    shutil.copy(PDF, downloads)
+
+    def parse():
+        return sogc_parser.parse_downloads(str(downloads), db_path, workers=1)
+
+    assert parse() == {"parsed": 1, "skipped": 0, "failed": 0}
+    assert parse() == {"parsed": 0, "skipped": 1, "failed": 0}
+    # touched but not changed: the digest is the same
+    os.utime(downloads / os.path.basename(PDF), ns=(0, 0))
+    assert parse() == {"parsed": 0, "skipped": 1, "failed": 0}
@@ -0,0 +1,153 @@
+"""
+Persistent triple store of the startup graph.
+
+The N-Triples written by rdf_converter.py are bulk-loaded once into an
+embedded, indexed store on disk (Oxigraph, RocksDB based). Consumers then open
+the store in milliseconds and run SPARQL directly, instead of re-parsing
+startups_graph.ttl into memory before every query.
+
+    python rdf_converter.py --stream --store     # convert and load
+    python rdf_converter.py --incremental --store   # apply the changes since the last export
+    python triple_store.py --query canton_industry
+"""
+import argparse
+import os
+import shutil
+import time
+
+try:
+    import pyoxigraph
+    HAS_OXIGRAPH = True
+except ImportError:
+    HAS_OXIGRAPH = False
+
+STORE_DIR = "startups_graph.store"
+# the closure written by ontology.py, next to this module whatever the working directory
+ONTOLOGY_NT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ontology.nt")
+
+PREFIXES = """
+PREFIX ex: <http://example.org/ontology#>
+PREFIX res: <http://example.org/resource/>
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+"""
+
+# representative queries, also used by benchmarks/bench_sparql.py
+QUERIES = {
+    "canton_industry": PREFIXES + """
+        SELECT ?canton ?industry (COUNT(?startup) AS ?startups) WHERE {
+            ?startup a ex:Startup ;
+                     ex:hasLocation ?location ;
+                     ex:hasIndustry ?industry .
+            ?location ex:name ?canton .
+        }
+        GROUP BY ?canton ?industry
+        ORDER BY DESC(?startups)""",
+    "phase_year": PREFIXES + """
+        SELECT ?phase ?year (COUNT(?event) AS ?events) (SUM(COALESCE(?amount, 0)) AS ?total) WHERE {
+            ?event a ex:FundingEvent ;
+                   ex:Phase ?phase ;
+                   ex:round_date ?date .
+            OPTIONAL { ?event ex:amount ?amount }
+            BIND (YEAR(?date) AS ?year)
+        }
+        GROUP BY ?phase ?year
+        ORDER BY ?phase ?year""",
+    "deals_under_cleantech": PREFIXES + """
+        SELECT ?event ?startup ?amount WHERE {
+            ?industry ex:hasAncestor res:Industry_cleantech .
+            ?startup ex:hasIndustry ?industry .
+            ?event ex:belongsTo ?startup .
+            OPTIONAL { ?event ex:amount ?amount }
+        }""",
+    "venture_exits": PREFIXES + """
+        SELECT ?stage (COUNT(?event) AS ?exits) WHERE {
+            ?type ex:hasAncestor res:DealType_exit .
+            ?event ex:hasDealType ?type ;
+                   ex:hasStage ?stageNode .
+            ?stageNode ex:hasAncestor res:Stage_venture ;
+                       ex:name ?stage .
+        }
+        GROUP BY ?stage""",
+    "startups_of_canton": PREFIXES + """
+        SELECT ?startup ?name WHERE {
+            ?startup ex:hasLocation ?location ;
+                     ex:name ?name .
+            ?location ex:name "zh" .
+        }""",
+}
+
+
+def _require_oxigraph():
+    if not HAS_OXIGRAPH:
+        raise ImportError("pyoxigraph is not installed: pip install pyoxigraph")
+
+
+def load_store(source, path=STORE_DIR, replace=True, extra_sources=()):
+    """
+    Bulk-load an N-Triples (or Turtle) file into the store at `path`, then the
+    `extra_sources` (e.g. [ONTOLOGY_NT]); a missing extra source is reported.
+    """
+    _require_oxigraph()
+    start = time.perf_counter()
+    if replace:
+        shutil.rmtree(path, ignore_errors=True)
+    store = pyoxigraph.Store(path)
+    store.bulk_load(path=source)
+    for extra in extra_sources:
+        if os.path.exists(extra):
+            store.bulk_load(path=extra)
+        else:
+            print(f"⚠️ {extra} not found, not loaded into the store")
+    store.optimize()
+    n_triples = len(store)
+    del store
+    print(f"🗄️ {n_triples} triples loaded into {path} in {time.perf_counter() - start:.1f} s")
+    return n_triples
+
+
+def apply_delta(added, removed, path=STORE_DIR):
+    """Apply the N-Triples delta files of an incremental export to the store."""
+    _require_oxigraph()
+    start = time.perf_counter()
+    store = pyoxigraph.Store(path)
+    n_removed = 0
+    for quad in pyoxigraph.parse(path=removed, format=pyoxigraph.RdfFormat.N_TRIPLES):
+        store.remove(quad)
+        n_removed += 1
+    quads = list(pyoxigraph.parse(path=added, format=pyoxigraph.RdfFormat.N_TRIPLES))
+    store.extend(quads)
+    store.flush()
+    del store
+    print(f"🗄️ +{len(quads)} / -{n_removed} triples applied to {path} in {time.perf_counter() - start:.2f} s")
+    return len(quads), n_removed
+
+
+def open_store(path=STORE_DIR, read_only=True):
+    """Open an existing store, read-only by default so several readers can share it."""
+    _require_oxigraph()
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"{path} not found, run `python rdf_converter.py --stream --store` first")
+    return pyoxigraph.Store.read_only(path) if read_only else pyoxigraph.Store(path)
+
+
+def run_query(store, sparql):
+    """Rows of a SELECT query as tuples of plain Python strings/values."""
+    results = store.query(sparql)
+    return [tuple(None if term is None else term.value for term in solution) for solution in results]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load or query the persistent triple store")
+    parser.add_argument("--load", metavar="FILE", help="N-Triples/Turtle file to (re)load into the store")
+    parser.add_argument("--store", default=STORE_DIR, help="directory of the store")
+    parser.add_argument("--extra", metavar="FILE", action="append",
+                        help=f"file loaded after --load, repeatable (default: {os.path.basename(ONTOLOGY_NT)})")
+    parser.add_argument("--query", help=f"name of a query ({', '.join(QUERIES)}) or a SPARQL string")
+    args = parser.parse_args()
+
+    if args.load:
+        load_store(args.load, args.store, extra_sources=[ONTOLOGY_NT] if args.extra is None else args.extra)
+    if args.query:
+        store = open_store(args.store)
+        for row in run_query(store, QUERIES.get(args.query, args.query)):
+            print(*row, sep="\t")
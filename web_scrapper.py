@@ -13,29 +13,41 @@ from selenium.webdriver.common.keys import Keys
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 import os
+import queue
+import shutil
+import tempfile
+import threading
+from functools import lru_cache
 import requests
 from selenium.webdriver.common.action_chains import ActionChains
 
+from scraper_metrics import Trace
 
-def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=None):
-    """
-    Download data from Swiss Official Gazette of Commerce (SOGC) for a specific UID
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    HAS_WATCHDOG = True
+except ImportError:
+    FileSystemEventHandler = object
+    HAS_WATCHDOG = False
 
-    Args:
-        uid (str): UID number to search for (default: CHE-236.101.881)
-        output_format (str): Format to download - "pdf", "word", "xml", or "csv"
-        download_dir (str): Directory to save downloaded files
-    """
-    # Set up download directory
-    if download_dir is None:
-        download_dir = os.path.join(os.getcwd(), "sogc_downloads")
 
-    if not os.path.exists(download_dir):
-        os.makedirs(download_dir)
+SOGC_URL = "https://www.shab.ch/#!/search/publications"
+# names of downloads still being written (Chrome, Firefox)
+PARTIAL_SUFFIXES = (".crdownload", ".part")
+POLL_INTERVAL = 0.2  # seconds, only without watchdog
+
 
-    # Configure Chrome options
+def make_driver(download_dir, headless=False):
+    """
+    Chrome session downloading into `download_dir`, with performance logging
+    enabled to capture network requests.
+    """
     chrome_options = Options()
     chrome_options.add_argument("--window-size=1920,1080")
+    if headless:
+        # the "new" headless mode is the one that honours download prefs
+        chrome_options.add_argument("--headless=new")
 
     # Enable performance logging to capture network requests
     chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
@@ -49,10 +61,150 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
     }
     chrome_options.add_experimental_option("prefs", prefs)
 
-    # Initialize the WebDriver with WebDriverManager for automatic driver management
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()), options=chrome_options
-    )
+    driver = webdriver.Chrome(service=Service(chromedriver_path()), options=chrome_options)
+    driver.sogc_download_dir = os.path.abspath(download_dir)
+    return driver
+
+
+@lru_cache(maxsize=None)
+def chromedriver_path():
+    # WebDriverManager for automatic driver management, resolved once per process
+    return ChromeDriverManager().install()
+
+
+class DownloadWatcher(FileSystemEventHandler):
+    """
+    Downloads landing in one directory, from filesystem events (inotify on
+    Linux) instead of listing the directory every second.
+
+    Chrome writes <name>.crdownload and renames it to <name> once the
+    transfer is done: that rename is the completion. The directory is
+    polled every POLL_INTERVAL when watchdog is not installed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.events = queue.Queue()
+        self.known = set(os.listdir(directory))
+        self.observer = None
+        self.started = False
+        self.completed = None
+
+    def start(self):
+        if HAS_WATCHDOG:
+            self.observer = Observer()
+            self.observer.schedule(self, self.directory)
+            self.observer.start()
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+
+    # watchdog callbacks, on the observer thread
+    def on_created(self, event):
+        if not event.is_directory:
+            self.events.put(("started", event.src_path))
+
+    def on_moved(self, event):
+        if not event.is_directory and not event.dest_path.endswith(PARTIAL_SUFFIXES):
+            self.events.put(("completed", event.dest_path))
+
+    def on_closed(self, event):
+        # a browser writing the final name directly
+        if not event.is_directory and not event.src_path.endswith(PARTIAL_SUFFIXES):
+            self.events.put(("completed", event.src_path))
+
+    def wait(self, timeout, until="completed"):
+        """
+        Block until a download started (until="started") or completed, at most
+        `timeout` seconds. Returns whether it started / the completed path (or None).
+        """
+        deadline = time.monotonic() + timeout
+        while self.completed is None and not (until == "started" and self.started):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if self.observer is None:
+                time.sleep(min(POLL_INTERVAL, remaining))
+                self._poll()
+                continue
+            try:
+                kind, path = self.events.get(timeout=remaining)
+            except queue.Empty:
+                break
+            self._record(kind, path)
+        return self.started if until == "started" else self.completed
+
+    def _record(self, kind, path):
+        self.started = True
+        if kind == "completed" and self.completed is None and os.path.exists(path):
+            self.completed = path
+
+    def _poll(self):
+        for name in set(os.listdir(self.directory)) - self.known:
+            path = os.path.join(self.directory, name)
+            if name.endswith(PARTIAL_SUFFIXES):
+                self._record("started", path)
+            else:
+                self.known.add(name)
+                self._record("completed", path)
+
+
+def download_sogc_data(
+    uid="CHE-236.101.881",
+    output_format="pdf",
+    download_dir=None,
+    driver=None,
+    base_url=SOGC_URL,
+    metrics=None,
+):
+    """
+    Download data from Swiss Official Gazette of Commerce (SOGC) for a specific UID
+
+    Args:
+        uid (str): UID number to search for (default: CHE-236.101.881)
+        output_format (str): Format to download - "pdf", "word", "xml", or "csv"
+        download_dir (str): Directory to save downloaded files
+        driver: Open Chrome session to reuse (see BrowserPool), left open.
+            A new browser is started and closed when None.
+        base_url (str): Search page, e.g. a local stand-in page for testing
+        metrics: scraper_metrics.MetricsLog receiving the phase timings and
+            the fallback paths taken
+
+    Returns:
+        str: Path of the downloaded file, None if nothing was downloaded
+    """
+    # Set up download directory
+    if download_dir is None:
+        download_dir = os.path.join(os.getcwd(), "sogc_downloads")
+
+    if not os.path.exists(download_dir):
+        os.makedirs(download_dir)
+
+    trace = Trace(metrics, uid)
+    owns_driver = driver is None
+    if owns_driver:
+        trace.phase("driver_start")
+        driver = make_driver(download_dir)
+    downloaded = None
+
+    # A fresh directory per UID: whatever lands in it is this UID's export,
+    # even with several sessions downloading at once or a late file of the
+    # previous UID still arriving in the session's own directory.
+    session_dir = getattr(driver, "sogc_download_dir", os.path.abspath(download_dir))
+    fetch_dir = tempfile.mkdtemp(prefix=f".{uid}-", dir=session_dir)
+    try:
+        driver.execute_cdp_cmd(
+            "Browser.setDownloadBehavior",
+            {"behavior": "allow", "downloadPath": fetch_dir},
+        )
+    except Exception as e:
+        print(f"Could not set the download directory, watching {session_dir}: {e}")
+        trace.fallback("shared_download_dir")
+        fetch_dir = None
+    watcher = DownloadWatcher(fetch_dir or session_dir)
+    watcher.start()
 
     # Define wait
     wait = WebDriverWait(
@@ -65,8 +217,13 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
     try:
         print(f"Searching for UID: {uid}")
 
-        # Navigate to SOGC search page - this initial load is necessary
-        driver.get("https://www.shab.ch/#!/search/publications")
+        # Navigate to SOGC search page - this initial load is necessary.
+        # A reused session goes through about:blank first so the single page
+        # app is really reloaded and no results of the previous UID remain.
+        trace.phase("page_load")
+        if not owns_driver:
+            driver.get("about:blank")
+        driver.get(base_url)
 
         # Wait for page to load by checking for a common element
         print("Waiting for page to load...")
@@ -87,6 +244,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
             )
         except TimeoutException:
             print("Search interface didn't load completely, continuing anyway...")
+            trace.fallback("search_interface_timeout")
 
         # Select "No restrictions" for period using JavaScript
         print("Setting 'No restrictions' for period...")
@@ -99,6 +257,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
         """)
 
         # Find the UID input field
+        trace.phase("uid_search")
         print("Looking for UID input field...")
         uid_input = None
 
@@ -120,6 +279,8 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
                 if elements:
                     print(f"  Found {len(elements)} elements with selector: {selector}")
                     uid_input = elements[0]
+                    if selector != selectors[0]:
+                        trace.fallback(f"uid_selector: {selector}")
                     break
                 else:
                     print("  No elements found")
@@ -129,6 +290,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
         if not uid_input:
             # Try JavaScript as a last resort to find the field
             print("Trying JavaScript to find UID field...")
+            trace.fallback("uid_field_js")
             input_found = driver.execute_script("""
                 var input = document.querySelector('input[name="uid"]');
                 if (!input) {
@@ -171,7 +333,8 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
 
             if not input_found:
                 print("ERROR: Could not find the UID input field")
-                return
+                trace.fallback("no_uid_field")
+                return None
 
         # Clear the UID field and enter the UID
         if uid_input:
@@ -184,6 +347,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
             uid_input.send_keys(Keys.ENTER)  # Send Enter directly to input field
 
             # Wait for search results to appear
+            trace.phase("result_wait")
             print("Waiting for search results...")
             try:
                 # Wait for any indication that results have loaded
@@ -202,6 +366,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
                 print(
                     "Timed out waiting for search results, trying alternative methods..."
                 )
+                trace.fallback("result_timeout")
 
             # Verify that search results are displayed
             try:
@@ -215,6 +380,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
                 else:
                     # Try an alternative method to trigger search if direct Enter didn't work
                     print("No results found, trying search button...")
+                    trace.fallback("search_button")
                     search_buttons = driver.find_elements(
                         By.XPATH,
                         "//button[contains(@class, 'search') or contains(text(), 'Search') or contains(text(), 'Suche')]",
@@ -243,6 +409,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
                     else:
                         # Try JavaScript approach as last resort
                         print("Using JavaScript to trigger search...")
+                        trace.fallback("search_js")
                         driver.execute_script(
                             """
                             // Try to trigger search via form submission
@@ -297,6 +464,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
                 print("Warning: Page may not contain specific UID search results")
 
             # Directly look for "Hits as PDF" button
+            trace.phase("pdf_button")
             print("Looking for 'Hits as PDF' button...")
             pdf_found = False
 
@@ -315,6 +483,8 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
                     pdf_buttons = driver.find_elements(By.XPATH, selector)
                     if pdf_buttons:
                         print(f"Found PDF button with selector: {selector}")
+                        if selector != pdf_button_selectors[0]:
+                            trace.fallback(f"pdf_selector: {selector}")
                         pdf_buttons[0].click()
                         # Wait for a dialog or response after clicking PDF button
                         try:
@@ -337,6 +507,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
             # If direct approach fails, try JavaScript with more detailed debugging
             if not pdf_found:
                 print("Using JavaScript to find and click PDF button...")
+                trace.fallback("pdf_button_js")
                 js_result = driver.execute_script("""
                     // First log all buttons for debugging
                     var allButtons = document.querySelectorAll('button');
@@ -393,6 +564,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
                 if not pdf_found:
                     # If we still can't find the button, try clicking anything that might be PDF-related
                     print("Trying to find any PDF-related elements...")
+                    trace.fallback("pdf_element_js")
                     pdf_elements_js = driver.execute_script("""
                         // Try to find any element that might be related to PDF
                         var allElements = document.querySelectorAll('*');
@@ -451,6 +623,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
 
             # Handle PDF save dialog if it appears
             if pdf_found:
+                trace.phase("pdf_dialog")
                 print("Looking for PDF save dialog...")
                 try:
                     # Wait for the dialog to appear
@@ -468,6 +641,7 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
                         print(
                             "Timed out waiting for text input dialog, proceeding anyway..."
                         )
+                        trace.fallback("dialog_timeout")
 
                     # Debugging - print all visible input fields to understand dialog structure
                     print("Analyzing dialog structure...")
@@ -601,44 +775,17 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
 
                     print(f"JavaScript result: {success}")
 
-                    # Wait for download to start - check for new PDF files
+                    # Wait for the browser to create the file, or already finish it
                     print("Waiting for download to start...")
-                    download_started = False
                     max_wait = 30  # Maximum wait time in seconds
-                    start_time = time.time()
-
-                    while time.time() - start_time < max_wait and not download_started:
-                        # Check if any PDF files appear in the download directory
-                        pdf_files = [
-                            f for f in os.listdir(download_dir) if f.endswith(".pdf")
-                        ]
-                        recent_pdfs = [
-                            f
-                            for f in pdf_files
-                            if os.path.getctime(os.path.join(download_dir, f))
-                            > start_time
-                        ]
-
-                        if recent_pdfs:
-                            download_started = True
-                            print("Download started!")
-                            break
-
-                        # Check if there's a .crdownload or .part file indicating download in progress
-                        temp_files = [
-                            f
-                            for f in os.listdir(download_dir)
-                            if f.endswith(".crdownload") or f.endswith(".part")
-                        ]
-                        if temp_files:
-                            print("Download in progress...")
-
-                        # Short pause before checking again
-                        time.sleep(1)
+                    download_started = watcher.wait(max_wait, until="started")
+                    if download_started:
+                        print("Download started!")
 
                     if not download_started:
                         # Fallback approach - try to use direct selenium WebDriver actions
                         print("Fallback method: Using direct WebDriver actions")
+                        trace.fallback("dialog_webdriver")
                         try:
                             # Try to find any visible text input
                             inputs = driver.find_elements(
@@ -668,118 +815,186 @@ def download_sogc_data(uid="CHE-236.101.881", output_format="pdf", download_dir=
                                     )
                                     print("Clicked button using direct WebDriver")
 
-                                    # Wait for the download to start
-                                    start_time = time.time()
-                                    while (
-                                        time.time() - start_time < max_wait
-                                        and not download_started
-                                    ):
-                                        pdf_files = [
-                                            f
-                                            for f in os.listdir(download_dir)
-                                            if f.endswith(".pdf")
-                                        ]
-                                        recent_pdfs = [
-                                            f
-                                            for f in pdf_files
-                                            if os.path.getctime(
-                                                os.path.join(download_dir, f)
-                                            )
-                                            > start_time
-                                        ]
-
-                                        if recent_pdfs:
-                                            download_started = True
-                                            print(
-                                                "Download started after fallback method!"
-                                            )
-                                            break
-
-                                        time.sleep(1)
+                                    if watcher.wait(max_wait, until="started"):
+                                        print("Download started after fallback method!")
                         except Exception as e:
                             print(f"Fallback method failed: {e}")
 
                 except Exception as e:
                     print(f"Error handling save dialog: {e}")
 
-                # Wait for download to complete by checking for .part or .crdownload files to disappear
+                # Chrome renames <name>.crdownload to <name> when the transfer is done
+                trace.phase("download_wait")
                 print("Waiting for PDF download to complete...")
                 max_wait_time = 60  # Maximum time to wait for download (seconds)
-                start_time = time.time()
-                download_complete = False
-
-                while (
-                    time.time() - start_time < max_wait_time and not download_complete
-                ):
-                    # Check for temporary download files
-                    temp_files = [
-                        f
-                        for f in os.listdir(download_dir)
-                        if f.endswith(".crdownload") or f.endswith(".part")
-                    ]
-
-                    if not temp_files:
-                        # No temp files means either download completed or hasn't started
-                        # Check if any new PDFs appeared since we started
-                        pdf_files = [
-                            f for f in os.listdir(download_dir) if f.endswith(".pdf")
-                        ]
-                        recent_pdfs = [
-                            f
-                            for f in pdf_files
-                            if os.path.getctime(os.path.join(download_dir, f))
-                            > start_time - max_wait_time
-                        ]  # Check for files created after we started this process
-
-                        if recent_pdfs:
-                            download_complete = True
-                            break
-
-                    # Short pause before checking again
-                    time.sleep(1)
-
-                # Final check for downloaded PDFs
-                pdf_files = [f for f in os.listdir(download_dir) if f.endswith(".pdf")]
-                recent_pdfs = [
-                    f
-                    for f in pdf_files
-                    if os.path.getctime(os.path.join(download_dir, f))
-                    > time.time() - max_wait_time
-                ]
-
-                if recent_pdfs:
-                    print("Successfully downloaded PDF files:")
-                    for file in recent_pdfs:
-                        print(f"- {file}")
-
-                    # Rename the last downloaded PDF to UID.pdf if it exists
-                    if recent_pdfs:
-                        latest_pdf = max(
-                            recent_pdfs,
-                            key=lambda f: os.path.getctime(
-                                os.path.join(download_dir, f)
-                            ),
-                        )
-                        target_filename = f"{uid}.pdf"
-                        source_path = os.path.join(download_dir, latest_pdf)
-                        target_path = os.path.join(download_dir, target_filename)
-
-                        try:
-                            os.rename(source_path, target_path)
-                            print(f"Renamed '{latest_pdf}' to '{target_filename}'")
-                        except Exception as e:
-                            print(f"Error renaming PDF file: {e}")
+                completed = watcher.wait(max_wait_time)
+
+                if completed:
+                    print(f"Successfully downloaded: {os.path.basename(completed)}")
+                    # The fetch directory only ever holds this UID's download
+                    extension = os.path.splitext(completed)[1] or ".pdf"
+                    target_filename = f"{uid}{extension}"
+                    target_path = os.path.join(download_dir, target_filename)
+                    try:
+                        # Same filesystem, the file appears complete or not at all
+                        os.replace(completed, target_path)
+                        print(f"Renamed '{os.path.basename(completed)}' to '{target_filename}'")
+                        downloaded = target_path
+                    except Exception as e:
+                        print(f"Error renaming PDF file: {e}")
                 else:
                     print("No PDF files were downloaded")
+                    trace.fallback("download_timeout")
             else:
                 print("Failed to find and click PDF button")
+                trace.fallback("no_pdf_button")
 
     except Exception as e:
         print(f"Error: {e}")
+        trace.fallback(f"error: {type(e).__name__}")
     finally:
-        print("Closing browser...")
-        driver.quit()
+        trace.phase("cleanup")
+        watcher.stop()
+        if fetch_dir:
+            shutil.rmtree(fetch_dir, ignore_errors=True)
+        if owns_driver:
+            print("Closing browser...")
+            driver.quit()
         print(f"Process completed. Check {download_dir} for downloaded files.")
+        trace.finish(downloaded is not None)
+
+    return downloaded
+
+
+class BrowserPool:
+    """
+    N warm Chrome sessions fed from one queue of UIDs.
+
+    Browsers are started once and reused for every UID, instead of paying the
+    browser startup for each company. Every session downloads into its own
+    sub-directory of `download_dir` (worker-0, worker-1, ...) so concurrent
+    downloads never mix; finished files are renamed to `download_dir`/<UID>.pdf.
+
+        with BrowserPool(size=4) as pool:
+            results = pool.download(uids)
+    """
+
+    def __init__(self, size=4, download_dir=None, headless=True, base_url=SOGC_URL, limiter=None, metrics=None):
+        self.size = size
+        self.download_dir = download_dir or os.path.join(os.getcwd(), "sogc_downloads")
+        self.headless = headless
+        self.base_url = base_url
+        # spaces out the page loads of all sessions (see sogc_crawl.RateLimiter)
+        self.limiter = limiter
+        # scraper_metrics.MetricsLog shared by the sessions
+        self.metrics = metrics
+        self.sessions = []  # [driver, worker download dir]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        chromedriver_path()
+        worker_dirs = [os.path.join(self.download_dir, f"worker-{i}") for i in range(self.size)]
+        for worker_dir in worker_dirs:
+            os.makedirs(worker_dir, exist_ok=True)
+        # browsers start in parallel, startup is mostly waiting on Chrome
+        started = [None] * self.size
+
+        def launch(i):
+            started[i] = make_driver(worker_dirs[i], self.headless)
+
+        threads = [threading.Thread(target=launch, args=(i,)) for i in range(self.size)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.sessions = [[driver, d] for driver, d in zip(started, worker_dirs) if driver is not None]
+        if not self.sessions:
+            raise RuntimeError("No browser session could be started")
+        print(f"🌐 {len(self.sessions)} browser sessions ready")
+
+    def restart(self, i):
+        """Replace a session whose browser crashed or stopped responding."""
+        driver, worker_dir = self.sessions[i]
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        self.sessions[i][0] = make_driver(worker_dir, self.headless)
+
+    def alive(self, i):
+        try:
+            self.sessions[i][0].window_handles
+            return True
+        except Exception:
+            return False
+
+    def download(self, uids, output_format="pdf", on_result=None):
+        """
+        Download every UID with the pooled sessions, calling on_result(uid, path)
+        as soon as each one is done.
+
+        Returns:
+            dict: UID -> path of the downloaded file (None when it failed)
+        """
+        todo = queue.Queue()
+        for uid in uids:
+            todo.put(uid)
+        results = {}
+        start = time.perf_counter()
+
+        def work(i):
+            while True:
+                try:
+                    uid = todo.get_nowait()
+                except queue.Empty:
+                    return
+                driver = self.sessions[i][0]
+                if self.limiter is not None:
+                    time.sleep(self.limiter.reserve())
+                path = download_sogc_data(
+                    uid, output_format, self.download_dir, driver=driver, base_url=self.base_url,
+                    metrics=self.metrics,
+                )
+                results[uid] = path
+                if on_result is not None:
+                    on_result(uid, path)
+                if not path and not self.alive(i):
+                    print(f"⚠️ Browser of worker {i} died, restarting it")
+                    try:
+                        self.restart(i)
+                    except Exception as e:
+                        print(f"⚠️ Worker {i} stopped: {e}")
+                        return
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(len(self.sessions))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        n_ok = sum(path is not None for path in results.values())
+        print(f"✅ {n_ok}/{len(results)} UIDs downloaded in {time.perf_counter() - start:.1f} s")
+        return results
+
+    def close(self):
+        for driver, _ in self.sessions:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self.sessions = []
+
+
+def download_many(uids, workers=4, output_format="pdf", download_dir=None, headless=True, base_url=SOGC_URL):
+    """Download the SOGC data of many UIDs with a pool of `workers` warm browsers."""
+    with BrowserPool(workers, download_dir, headless, base_url) as pool:
+        return pool.download(uids, output_format)
 
 
 if __name__ == "__main__":